@@ -9,6 +9,8 @@
 Usage:
   production_planner
   production_planner --data-folder=<dpath>
+  production_planner [--data-folder=<dpath>] --profile=<fpath>
+  production_planner [--data-folder=<dpath>] --migrate=<version> [--dry-run]
   production_planner (-h | --help)
   production_planner --version
 
@@ -16,143 +18,57 @@ Options:
   -h --help             Show this screen.
   --version             Show version.
   --data-folder=<dpath> Use the specified folder-path as data-folder for this session
+  --profile=<fpath>     Time the hot paths of this session and append the spans to the json-lines file
+  --migrate=<version>   Rewrite the plans made with the game data <version> (e.g. 0.8 or 0.8.3.3) for the latest one
+  --dry-run             Only list the plans which --migrate would change
 
 """
 
-from . import core
-from .core import CONFIG
-from .datatable import PlannerTable
-from .io import PlannerManager
-from .help import HelpScreen
-from .header import Header
-
-from pathlib import Path
+import importlib
 import importlib.metadata
-import traceback
-from typing import Iterable
-
-from docopt import docopt
-
-from textual.app import (
-    App,
-    SystemCommand,
-    ComposeResult
-)
-from textual.screen import Screen
-from textual.widgets import Footer
-from textual.reactive import reactive
 
 __version__ = importlib.metadata.version("production_planner")
 
 
-# The Fuel Generator, like all power generation buildings, behaves differently to power consumer buildings when overclocked. A generator overclocked to 250% only operates 202.4% faster[EA] (operates 250% faster[EX]).
-# As the fuel consumption rate is directly proportional to generator power production, verify that demand matches the production capacity to ensure that Power Shards are used to their full potential. Fuel efficiency is unchanged, but consumption and power generation rates may be unexpectedly uneven[EA].
-
-
-def planner_command(title, help, callback, discover=True) -> SystemCommand:
-    help = "   " + help
-    return SystemCommand(title, help, callback, discover)
-
-
-class Planner(App):
-    CSS_PATH = "Planner.tcss"
-    header = None
-
-    BINDINGS = [
-        ("h", "help", "Help")
-    ]
-
-    hidden_item_count = reactive(0)
-
-    def __init__(self, testrun=False, *args, **kwargs):
-        # Suppresses toasts that differ based on test environment
-        self._testrun = testrun
-        super().__init__(*args, **kwargs)
-
-    def compose(self) -> ComposeResult:
-        yield Header(icon="Menu")
-        yield PlannerTable(header_control=True)
-        yield Footer()
-
-    def get_system_commands(self, screen: Screen) -> Iterable[SystemCommand]:
-        for command in super().get_system_commands(screen):
-            if command.title.lower() == "light mode":
-                continue
-            yield planner_command(*command)
-        yield planner_command("Save As", "Save the currently active file with a new filename", self._save_as)
-        yield planner_command("Load", "Load a new file in the currently active table", self._load)
-        yield planner_command("Delete", "Delete a file from the filesystem", self._delete)
-        # 3, because the command-palette is the second screen
-        if len(self.screen_stack) < 3:
-            yield planner_command("Dataview", "Shows the corresponding yaml source of the open file", self._dataview)
-
-    def _save_as(self):
-        if not self.focused_table:
-            return
-        self.call_next(self.focused_table.action_save)
-
-    def _load(self):
-        if not self.focused_table:
-            return
-        # NOTE: directly calling `action_load` somehow causes the Screen callback not to be invoked
-        self.call_next(self.focused_table.action_load)
+# Note: nothing of the app (textual, game data, ...) is imported eagerly, so that `main` can handle
+#       `--help` and `--version` before paying for it. These names are resolved on first access instead.
+LAZY_ATTRIBUTES = {
+    "Planner":         ".app",
+    "planner_command": ".app",
+    "PlannerTable":    ".datatable",
+    "PlannerManager":  ".io",
+    "HelpScreen":      ".help",
+    "Header":          ".header",
+    "CONFIG":          ".core",
+}
 
-    def _delete(self):
-        if not self.focused_table:
-            return
-        self.call_next(self.focused_table.action_delete)
 
-    def _dataview(self):
-        if not self.focused_table or len(self.screen_stack) > 2:
-            return
-        self.call_next(self.focused_table.action_dataview)
-
-    def is_table_shown(self, table: PlannerTable) -> bool:
-        raise NotImplemented
-
-    def on_mount(self) -> None:
-        core.APP = self
-        self.app.focused_table = self.query_one(PlannerTable)
-        self.manager = PlannerManager(self, iid_name="main")
-        self.manager.load()
-        if core.CONFIG.store["app"]["startup_help"]:
-            core.CONFIG.store["app"]["startup_help"] = False
-            self.action_help(True)
-
-    def swap_active_table(self, new_table):
-        # FIXME: fix when implementing tabbed content ...
-        self.focused_table.remove()
-
-        self.focused_table = new_table
-        self.mount(self.focused_table, after=self.query_one(Header))
-        self.focused_table.sink.load()
-        self.focused_table.update()
-
-    def exit(self, *args):
-        # NOTE: saving here for shutdown since it will be missed by pytest if it's in the `def main()`
-        self.manager.staging_commit()
-        CONFIG.store.sync()
-        super().exit(*args)
-
-    def action_help(self, startup_help=False) -> None:
-        table = self.focused_table
-
-        def set_focused_table(*_):
-            self.focused_table = table
-
-        self.push_screen(HelpScreen(startup_help=startup_help), set_focused_table)
-
-    def check_action(self, action: str, parameters: tuple[object, ...]):
-        is_main_screen = len(self.app.screen_stack) == 1
-        # this is always keep inherited (?) bindings like tab switching between widgets
-        is_my_binding = action in [binding for (_, binding, _) in self.__class__.BINDINGS]
-        return is_main_screen or (not is_my_binding)
+def __getattr__(name):
+    if name in LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module(LAZY_ATTRIBUTES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def main():
+    from docopt import docopt
     arguments = docopt(__doc__, version=__version__)
+
+    from pathlib import Path
+    import traceback
+    from .core import (
+        CONFIG,
+        SPANS,
+        sync_configs,
+    )
+
     if arguments["--data-folder"]:
         CONFIG.dpath_data = Path(arguments["--data-folder"]).absolute()
+    if arguments["--profile"]:
+        SPANS.enable()
+    if arguments["--migrate"]:
+        return migrate(arguments["--migrate"], dry_run=arguments["--dry-run"])
+
+    from .app import Planner
 
     planner = Planner()
     try:
@@ -161,10 +77,31 @@ def main():
         # TODO: maybe move the try-except into the App.{run, run_test, etc} instead
         # NOTE: saving here since `App.exit` doesn't seem to run when an Exception is encountered ...
         planner.manager.staging_commit()
-        CONFIG.store.sync()
+        sync_configs()
         print(traceback.format_exc())
     finally:
-        ...
+        if arguments["--profile"]:
+            SPANS.dump(Path(arguments["--profile"]))
+
+
+def migrate(version: str, dry_run: bool = False) -> int:
+    from .core import CONFIG
+    from . import gamedata
+    from .gamedata.migrate import migrate_version
+
+    old = gamedata.get(*(int(part) for part in version.split(".")))
+    new = gamedata.get()
+    if old is None:
+        print(f"Unknown game data version: {version}")
+        return 1
+
+    diff, migrated = migrate_version(CONFIG.dpath_data, old.fpath, new.fpath,
+                                     dry_run=dry_run, fsync=CONFIG.store["app"]["fsync_writes"])
+    for line in diff.lines():
+        print(line)
+    for fpath, changed in migrated.items():
+        print(f"{fpath}: " + ("unreadable" if changed < 0 else f"{changed} nodes"))
+    return 0
 
 
 if __name__ == "__main__":
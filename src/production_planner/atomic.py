@@ -0,0 +1,35 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Atomic file writes
+
+Kept apart from `io`, so that the worker processes of `gamedata.migrate` can write files without loading the app.
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+
+def write_atomic(fpath: Path, raw: str, fsync: bool = False, mode: Optional[int] = None):
+    """Writes into a temporary file next to `fpath` and renames it into place
+
+    A crash in the middle of writing thus leaves either the previous or the new content behind, never a truncated file.
+    With `fsync` the content is also flushed to the disk before the rename, `mode` sets the permissions of the file.
+    """
+    os.makedirs(fpath.parent, exist_ok=True)
+    fpath_tmp = fpath.with_name(f".{fpath.name}.{os.getpid()}.tmp")
+    try:
+        with open(fpath_tmp, "w") as fp:
+            fp.write(raw)
+            if fsync:
+                fp.flush()
+                os.fsync(fp.fileno())
+        if mode is not None:
+            os.chmod(fpath_tmp, mode)
+        os.replace(fpath_tmp, fpath)
+    except BaseException:
+        fpath_tmp.unlink(missing_ok=True)
+        raise
@@ -4,7 +4,10 @@
 #  file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 from ._cells import SetCellValue
-from ..core import Producer
+from ..core import (
+    Producer,
+    SPANS,
+)
 
 from textual import on
 from textual.screen import Screen
@@ -149,6 +152,7 @@ class FilteredListSelector(Screen):
             self.dismiss([])
 
     @on(Input.Changed)
+    @SPANS.timed("selector.set_filt")
     def set_filt(self, event: Input.Changed) -> None:
         if event is None:
             self.data_filter.search = self.query_one(Input).value
@@ -156,7 +160,8 @@ class FilteredListSelector(Screen):
             self.data_filter.search = event.value
 
         self.data_filtered = list(filter(self.data_filter.filter_item, self.data_sorted))
-        self.update()
+        with SPANS.span("selector.update"):
+            self.update()
         self.select()
 
     def select(self):
@@ -50,7 +50,9 @@ from textual.widgets import (
 from rich.style import Style
 from rich.text import Text
 
-SELECT_PRODUCERS = [all_recipes_producer] + core.PRODUCERS
+def select_producers():
+    # Note: not computed once at import, `core.PRODUCERS` changes with the active game data version
+    return [all_recipes_producer] + core.PRODUCERS
 
 
 class RecipeFilterSetting(Enum):
@@ -167,7 +169,7 @@ class RecipeCell(EditableCell):
                 return [SetCellValue(ProducerCell, set_recipe[0].value.producer)] + set_recipe
 
             def _producer_listing(self, producer_name):
-                producer_list = [p.name for p in SELECT_PRODUCERS]
+                producer_list = [p.name for p in select_producers()]
                 del producer_list[producer_list.index(producer_name)]
                 producer_list.insert(0, producer_name)
                 return producer_list
@@ -0,0 +1,61 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Composes yaml documents in worker processes
+
+Kept apart from `core`, so that the (spawned) worker processes only import this module instead of loading the game data.
+"""
+
+import multiprocessing
+from pathlib import Path
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+
+_COMPOSE_POOL = None
+
+
+def _strip_marks(node: yaml.Node, seen: set):
+    if id(node) in seen:
+        return
+    seen.add(id(node))
+    # the marks reference the whole source text, which doesn't need to be sent back
+    node.start_mark = node.end_mark = None
+    match node:
+        case yaml.MappingNode():
+            for key, value in node.value:
+                _strip_marks(key, seen)
+                _strip_marks(value, seen)
+        case yaml.SequenceNode():
+            for item in node.value:
+                _strip_marks(item, seen)
+
+
+def compose_module_file(fpath: Path) -> Optional[yaml.Node]:
+    """Runs the scanning and parsing stage of the yaml loader, which is most of its work
+
+    Executed in worker processes, since it needs none of the game data or other modules.
+    Constructing the `NodeTree` from the composed document is left to the main process.
+    """
+    try:
+        with open(fpath, "r") as fp:
+            document = yaml.compose(fp.read(), Loader=yaml.UnsafeLoader)
+    except (OSError, yaml.YAMLError):
+        return None
+    if document is not None:
+        _strip_marks(document, set())
+    return document
+
+
+def compose_pool() -> ProcessPoolExecutor:
+    global _COMPOSE_POOL
+    if _COMPOSE_POOL is None:
+        # Note: the pool may first be needed in a worker thread (see `PlannerTable.resolve_modules`),
+        #       and forking a process with several threads can deadlock the child on a lock held by another thread
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _COMPOSE_POOL = ProcessPoolExecutor(mp_context=multiprocessing.get_context(method))
+    return _COMPOSE_POOL
@@ -10,6 +10,14 @@ from .link import (
     ModuleFile,
     ModuleFile,
     ensure_keys,
+    open_config,
+    snapshot_configs,
+    sync_configs,
+    write_configs,
+)
+from .spans import (
+    SPANS,
+    Spans,
 )
 from .recipe import (
     Ingredient,
@@ -33,8 +41,38 @@ from .node import (
 from .nodetree import (
     NodeInstance,
     SummaryNode,
+    RollupNode,
     NodeTree,
 )
+from .rollup import (
+    Rollup,
+    ROLLUP,
+    raw_resources,
+)
+from .chain import (
+    ChainGenerator,
+    generate_chain,
+    insert_tree,
+    insert_chain,
+)
+from .optimize import (
+    RecipeOptimizer,
+    optimize,
+)
+from .buildings import (
+    BuildingOption,
+    solve_counts,
+    balance_buildings,
+)
+from .propagate import (
+    flow_nodes,
+    propagate_demand,
+)
+from .power import (
+    SweepPoint,
+    PowerModel,
+    power_sweep,
+)
 from . import marshal
 
 from .edit import (
@@ -43,8 +81,6 @@ from .edit import (
     EditValue,
 )
 
-import json
-
 APP = None
 
 
@@ -69,29 +105,16 @@ def set_path(obj, path, value):
 
 
 # TODO: reorganize files
-from .. import gamedata
+from .registry import (
+    GameData,
+    GAME_DATA,
+)
 # TODO: allow anchoring to a selected game version and storing it in CONFIG
 # TODO: add selected game version to the NodeTree and store it in the yaml files too
 #       -> warning that a different version is now loaded and generate / show a diff
-data_version = gamedata.get()
+GAME_DATA.activate()
+data_version = GAME_DATA.version
 data_fpath = data_version.fpath
 
-with open(data_fpath) as fp:
-    data = json.load(fp)
-
-for k, v in data.items():
-    prod = Producer(k, **v)
-    PRODUCERS += [prod]
-
-PRODUCER_NAMES += [prod.name for prod in PRODUCERS]
-
 # FIXME
-all_recipes_producer = producer.all_recipes_producer()
-
-PRODUCER_MAP.update({p.name: p for p in ([all_recipes_producer] + PRODUCERS)})
-PRODUCER_MAP["Blueprint"] = PRODUCER_MAP["Module"]
-
-for name, aliases in PRODUCER_ALIASES.items():
-    if name in PRODUCER_MAP:
-        for alias in aliases:
-            PRODUCER_MAP[alias] = PRODUCER_MAP[name]
+all_recipes_producer = GAME_DATA.all_recipes_producer
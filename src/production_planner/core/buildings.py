@@ -0,0 +1,138 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from .edit import ceil_clock_rate
+from .node import (
+    Node,
+    node_rates,
+)
+from .nodetree import (
+    NodeInstance,
+    SummaryNode,
+)
+
+import math
+from dataclasses import dataclass
+
+
+MAX_CLOCK_RATE = 250
+# each power shard allows overclocking a building by this much more
+SHARD_CLOCK_RATE = 50
+# by default the shards only break ties between assignments with the same number of buildings
+DEFAULT_SHARD_COST = 0.01
+
+
+def shards_per_building(clock_rate: float) -> int:
+    return max(0, math.ceil((clock_rate - 100) / SHARD_CLOCK_RATE - 1e-9))
+
+
+@dataclass(frozen=True, slots=True)
+class BuildingOption:
+    count: int
+    clock_rate: float
+    shards: int
+
+    def cost(self, shard_cost: float) -> float:
+        return self.count + shard_cost * self.shards
+
+
+def building_options(buildings: float) -> [BuildingOption]:
+    """The ways to run `buildings` buildings worth of production (at 100% clock rate), fewest shards first
+
+    Only the counts between running at the maximum clock rate and running at up to 100% are useful.
+    """
+    if buildings <= 0:
+        return [BuildingOption(0, 100, 0)]
+    options = []
+    for count in range(math.ceil(buildings / (MAX_CLOCK_RATE / 100) - 1e-9), math.ceil(buildings - 1e-9) + 1):
+        count = max(count, 1)
+        clock_rate = ceil_clock_rate(buildings, count)
+        option = BuildingOption(count, clock_rate, count * shards_per_building(clock_rate))
+        if option not in options:
+            options.append(option)
+    return sorted(options, key=lambda option: (option.shards, option.count))
+
+
+def pareto(options: [BuildingOption]) -> [BuildingOption]:
+    """Drops the options which need more shards for no fewer buildings"""
+    efficient = []
+    for option in options:
+        if not efficient or option.count < efficient[-1].count:
+            efficient.append(option)
+    return efficient
+
+
+def solve_counts(buildings: [float], max_shards: int, shard_cost: float = DEFAULT_SHARD_COST) -> [BuildingOption]:
+    """Assigns a count and clock rate to each of the nodes producing `buildings` (at 100% clock rate)
+
+    Minimizes the buildings plus `shard_cost` per power shard, using at most `max_shards` shards.
+    Since the shards are few and integral, this multiple-choice knapsack is solved exactly by dynamic programming
+    over the shards used, in `O(nodes * shards * options)`.
+    """
+    options = [pareto(building_options(demand)) for demand in buildings]
+    max_shards = max(0, min(max_shards, sum(node_options[-1].shards for node_options in options)))
+
+    # the lowest cost of the nodes so far using at most `shards` shards, and the option chosen for each node
+    costs = [0.0] * (max_shards + 1)
+    choices = []
+    for node_options in options:
+        next_costs = [math.inf] * (max_shards + 1)
+        choice = [None] * (max_shards + 1)
+        for option in node_options:
+            cost = option.cost(shard_cost)
+            for shards in range(option.shards, max_shards + 1):
+                total = costs[shards - option.shards] + cost
+                if total < next_costs[shards] - 1e-9:
+                    next_costs[shards] = total
+                    choice[shards] = option
+        costs = next_costs
+        choices.append(choice)
+
+    assignment = []
+    shards = max_shards
+    for choice in reversed(choices):
+        option = choice[shards]
+        assignment.append(option)
+        shards -= option.shards
+    return assignment[::-1]
+
+
+def balanced_nodes(instance: NodeInstance) -> [Node]:
+    """The nodes of a tree whose count and clock rate can be changed"""
+    nodes = []
+    for child in instance.node_children:
+        node = child.node_main
+        if not (child.from_module or node.is_dummy or node.is_module or isinstance(node, SummaryNode)):
+            nodes.append(node)
+        nodes += balanced_nodes(child)
+    return nodes
+
+
+def node_buildings(node: Node) -> float:
+    """The buildings (at 100% clock rate) the node needs, which for clamped nodes isn't limited to 250%"""
+    if node.clamp:
+        clamp = node.clamp.value
+        _, rates, _ = node_rates(node.producer, node.recipe, 1, 100, node.mk.value, node.purity.value, None, 0)
+        if rates.get(clamp.name):
+            return abs(clamp.count / rates[clamp.name])
+    return node.count.value * node.clock_rate.value / 100
+
+
+def balance_buildings(instance: NodeInstance, max_shards: int, shard_cost: float = DEFAULT_SHARD_COST) -> int:
+    """Sets the counts and clock rates of the nodes below `instance` to the fewest buildings at the same rates
+
+    Clamped nodes only get their count set, their clock rate follows from the clamp.
+    Returns the number of shards used.
+    """
+    nodes = balanced_nodes(instance)
+    assignment = solve_counts([node_buildings(node) for node in nodes], max_shards, shard_cost)
+    for node, option in zip(nodes, assignment):
+        if option.count == 0:
+            continue
+        node.count.value = option.count
+        if not node.clamp:
+            node.clock_rate.value = option.clock_rate
+        node.update()
+    return sum(option.shards for option in assignment)
@@ -0,0 +1,165 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from .edit import ceil_clock_rate
+from .recipe import Recipe
+from .node import Node
+from .nodetree import (
+    NodeInstance,
+    NodeTree,
+)
+from .rollup import (
+    ROLLUP,
+    Rollup,
+)
+
+import math
+from typing import Optional
+
+
+class ChainGenerator:
+    """Generates the production chain of an item from raw resources
+
+    For each item the recipe needing the least raw resources (in total, per unit of the item) is chosen,
+    unless another one is configured in `Rollup.default_recipes`. Recipe cycles (e.g. packaging) are never chosen.
+    Both the chosen recipes and the resulting subchains are memoized per item, so that generating the chains of
+    deep items like `Nuclear Pasta` only resolves each item once.
+    """
+    def __init__(self, allow_alternates: bool = False, rollup: Rollup = ROLLUP):
+        self.allow_alternates = allow_alternates
+        self.rollup = rollup
+        self.reset()
+
+    def reset(self):
+        # item -> (raw resources per unit, recipe or None for raw resources)
+        self.recipes = {}
+        # item -> {(recipe, item produced by it): rate per unit of item}
+        self.subchains = {}
+
+    def candidates(self, item: str) -> [Recipe]:
+        configured = self.rollup.configured_recipe(item)
+        if configured is not None:
+            return [configured]
+
+        recipes = [recipe for recipe in self.rollup.producing.get(item, []) if recipe.inputs]
+        if not self.allow_alternates:
+            standard = [recipe for recipe in recipes if not is_alternate(recipe)]
+            recipes = standard or recipes
+        return recipes
+
+    def best_recipe(self, item: str, _resolving: Optional[set] = None) -> (float, Optional[Recipe]):
+        if item in self.recipes:
+            return self.recipes[item]
+        if item in self.rollup.raw or not self.rollup.producing.get(item):
+            return (1, None)
+
+        resolving = _resolving or set()
+        if item in resolving:
+            return (math.inf, None)
+        resolving.add(item)
+
+        best = (math.inf, None)
+        for recipe in sorted(self.candidates(item), key=lambda recipe: recipe.name):
+            produced = sum(ingredient.count for ingredient in recipe.outputs if ingredient.name == item)
+            cost = sum(self.best_recipe(ingredient.name, resolving)[0] * ingredient.count / produced
+                       for ingredient in recipe.inputs)
+            if cost < best[0]:
+                best = (cost, recipe)
+        resolving.discard(item)
+
+        if best[1] is None:
+            # only reachable through a cycle
+            return (math.inf, None)
+        # Note: the choice of items on a cycle depends on where it was entered, but only ever excludes the cycle
+        self.recipes[item] = best
+        return best
+
+    def extractor_recipe(self, item: str) -> Optional[Recipe]:
+        """The recipe extracting the most of the raw resource `item` per building"""
+        recipes = [recipe for recipe in self.rollup.producing.get(item, []) if not recipe.inputs]
+        return max(recipes, key=lambda recipe: building_rate(recipe, item), default=None)
+
+    def subchain(self, item: str) -> dict[tuple[Recipe, str], float]:
+        """The rate of each recipe (and the item it's used for) needed for one unit of `item`"""
+        if item in self.subchains:
+            return self.subchains[item]
+
+        _, recipe = self.best_recipe(item)
+        if recipe is None:
+            recipe = self.extractor_recipe(item)
+            # Note: the items which can't be produced at all are left out, they show up in the summary
+            chain = {(recipe, item): 1} if recipe else {}
+        else:
+            produced = sum(ingredient.count for ingredient in recipe.outputs if ingredient.name == item)
+            chain = {}
+            for ingredient in recipe.inputs:
+                for key, rate in self.subchain(ingredient.name).items():
+                    chain[key] = chain.get(key, 0) + rate * ingredient.count / produced
+            # the consumers come after the producers of their inputs
+            chain[(recipe, item)] = chain.get((recipe, item), 0) + 1
+        self.subchains[item] = chain
+        return chain
+
+    def nodes(self, item: str, rate: float) -> [Node]:
+        """The nodes of the subchain of `item`, from the producers to the consumers
+
+        Each node is sized from the rates of its already rounded consumers (rather than the exact rates
+        of the subchain), so that rounding up the consumers doesn't leave small deficits upstream.
+        """
+        needed = {item: rate}
+        nodes = []
+        # Note: the subchains list the producers before their consumers
+        for recipe, output in reversed(self.subchain(item)):
+            node = building_node(recipe, needed.get(output, 0) / building_rate(recipe, output))
+            for name, quantity in node.ingredients.items():
+                if quantity < 0:
+                    needed[name] = needed.get(name, 0) - quantity
+            nodes.append(node)
+        return nodes[::-1]
+
+    def generate(self, item: str, rate: float) -> NodeTree:
+        """A tree of the nodes producing `rate` per minute of `item`"""
+        return NodeTree.from_nodes(self.nodes(item, rate))
+
+
+def is_alternate(recipe: Recipe) -> bool:
+    return recipe.is_alternate or recipe.name.startswith("Alternate: ")
+
+
+def building_rate(recipe: Recipe, item: str) -> float:
+    """The rate per minute of `item` of a single building at 100% clock rate (at the default purity and mk)"""
+    node = Node(recipe.producer, recipe)
+    return node.ingredients.get(item, 0)
+
+
+def building_node(recipe: Recipe, buildings: float) -> Node:
+    """A node of `recipe` running as fast as `buildings` buildings at 100% clock rate"""
+    count = max(1, math.ceil(buildings - 1e-9))
+    return Node(recipe.producer, recipe, count=count, clock_rate=ceil_clock_rate(buildings, count))
+
+
+def generate_chain(item: str, rate: float, allow_alternates: bool = False) -> NodeTree:
+    return CHAIN_GENERATORS[allow_alternates].generate(item, rate)
+
+
+CHAIN_GENERATORS = {
+    False: ChainGenerator(allow_alternates=False),
+    True: ChainGenerator(allow_alternates=True),
+}
+
+
+def insert_tree(root: NodeTree, tree: NodeTree, after: Optional[NodeInstance] = None) -> [NodeInstance]:
+    """Inserts the nodes of `tree` into `root` after `after` (by default at the end) and returns them
+
+    The nodes are inserted as siblings rather than as one subtree, so that each of them gets a row of its own in the table.
+    """
+    instances = tree.node_children[:]
+    root.add_children(instances, at_idx=None if after is None or after is root else after)
+    return instances
+
+
+def insert_chain(root: NodeTree, item: str, rate: float, after: Optional[NodeInstance] = None, allow_alternates: bool = False) -> [NodeInstance]:
+    """Generates the chain of `item` and inserts its nodes into `root`, see `insert_tree`"""
+    return insert_tree(root, generate_chain(item, rate, allow_alternates), after)
@@ -3,7 +3,8 @@
 #  License, v. 2.0. If a copy of the MPL was not distributed with this
 #  file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-from dataclasses import dataclass, field
+import math
+from dataclasses import dataclass
 from numbers import Number
 
 # TODO: add some ~IGNORED_AMOUNT variable to CONFIG and use that instead of hardcoded 0.01
@@ -15,17 +16,37 @@ def smartround(value: float | int):
     else:
         return round(value, 2)
 
-@dataclass
+
+def ceil_clock_rate(buildings: float, count: int) -> float | int:
+    """The clock rate of `count` buildings doing the work of `buildings` at 100%, rounded up to two decimals
+
+    Never below the exact clock rate, so that the rounding doesn't leave small deficits,
+    also not once `smartround` truncated it (e.g. a `87.01` clock rate would run at 87%).
+    """
+    clock_rate = math.ceil(10000 * buildings / count - 1e-6) / 100
+    if smartround(clock_rate) < clock_rate:
+        clock_rate = (math.ceil(clock_rate * 100 - 1e-6) + 1) / 100
+    return smartround(clock_rate)
+
+@dataclass(frozen=True, slots=True)
 class Bounds:
     lower: int = 0
     upper: int = 999_999
 
 
-@dataclass
+# shared by all values of the same kind, which is why `Bounds` is frozen
+DEFAULT_BOUNDS = Bounds()
+COUNT_BOUNDS = Bounds(0, 999)
+CLOCK_RATE_BOUNDS = Bounds(0, 250)
+MK_BOUNDS = Bounds(1, 3)
+PURITY_BOUNDS = Bounds(1, 3)
+
+
+@dataclass(slots=True)
 class EditValue:
     _value: int | float
     edit_input: str = None
-    bounds: Bounds = field(default_factory=Bounds)
+    bounds: Bounds = DEFAULT_BOUNDS
     # necessary ?
     # num_sign_is_pos: bool = True
 
@@ -4,6 +4,7 @@
 #  file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import os
+import json
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Self
@@ -11,6 +12,8 @@ from typing import Self
 import platformdirs
 import json_store
 
+from ..atomic import write_atomic
+
 
 def static(fn):
     return fn()
@@ -31,6 +34,49 @@ def ensure_keys(store, key_def_pairings={}):
         ensure_key(store, k, v)
 
 
+# fullpath -> (store, serialized content as last read or written)
+CONFIG_STORES = {}
+
+
+def open_config(fpath: Path) -> json_store.JSONStore:
+    """Opens a json config file, which is then written together with all others by `sync_configs`"""
+    store = json_store.open(fpath, json_kw={ "indent": 4 })
+    CONFIG_STORES[Path(fpath)] = (store, config_content(store))
+    return store
+
+
+def config_content(store: json_store.JSONStore) -> str:
+    # Note: the same as `JSONStore.sync` writes
+    return json.dumps(dict(store), **store.json_kw)
+
+
+def snapshot_configs() -> [(Path, str)]:
+    """The content of the config files which changed since they were last written, for `write_configs`
+
+    Note: `JSONStore` marks itself as changed on every assignment, even of an equal value,
+          and misses changes of nested values, so the content is compared instead.
+          Serialized by the caller, so that only the writes can be left to another thread (see `PlannerManager.autosave`).
+    """
+    snapshot = []
+    for fpath, (store, synced) in list(CONFIG_STORES.items()):
+        content = config_content(store)
+        if content != synced:
+            snapshot += [(fpath, content)]
+    return snapshot
+
+
+def write_configs(snapshot: [(Path, str)]):
+    for fpath, content in snapshot:
+        store, _ = CONFIG_STORES[fpath]
+        write_atomic(fpath, content, mode=store.mode)
+        CONFIG_STORES[fpath] = (store, content)
+
+
+def sync_configs():
+    """Writes all config files in one pass, skipping those whose content is unchanged"""
+    write_configs(snapshot_configs())
+
+
 @static
 def CONFIG():
     class ConfigStore:
@@ -65,14 +111,37 @@ def CONFIG():
         @fpath_config.setter
         def fpath_config(self, value):
             self._fpath_config = Path(value)
-            self.store = json_store.open(self.fpath_config, json_kw={ "indent": 4 })
+            self.store = open_config(self.fpath_config)
             ensure_keys(self.store, {
                 "app": {
                     "startup_help": True,
+                    "fsync_writes": False,
                 },
                 "select_producer": {
                     "show_sidebar": True,
-                }
+                },
+                "rollup": {
+                    "default_recipes": {},
+                },
+                "chain": {
+                    "allow_alternates": False,
+                },
+                "optimize": {
+                    "allow_alternates": True,
+                    "weights": {
+                        "raw": 1,
+                        "power": 0,
+                        "buildings": 0,
+                    },
+                },
+                "balance": {
+                    "max_shards": 0,
+                    "shard_cost": 0.01,
+                    "auto_balance": False,
+                },
+                "propagate": {
+                    "auto_propagate": False,
+                },
             })
 
     return ConfigStore()
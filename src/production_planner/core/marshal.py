@@ -9,7 +9,6 @@ from .recipe import (
     Recipe,
 )
 from .producer import PRODUCER_MAP
-from .module import MODULE_PRODUCER
 from .node import (
     Purity,
     Node,
@@ -41,11 +40,7 @@ def node_representer(dumper, data):
     return dumper.represent_mapping(u"!node", buf)
 
 
-SEEN_MODULES = set()
-
-
 def node_constructor(loader, node):
-    global SEEN_MODULES
     data = loader.construct_mapping(node, deep=True)
     prod = PRODUCER_MAP[data["producer"]]
 
@@ -62,14 +57,11 @@ def node_constructor(loader, node):
                 purity     = Purity(data["purity"]),
                 clamp      = clamp)
     if prod.is_module:
-        if not data["recipe"] in SEEN_MODULES:
-            SEEN_MODULES.add(data["recipe"])
-            module_file = ModuleFile(data["recipe"])
-
-            MODULE_PRODUCER.update_module(module_file)
-            prod.update_recipe_map()
+        # Note: the module files aren't parsed here, they are resolved later by `NodeTree.reload_modules`
         if data["recipe"] in prod.recipe_map:
             node.recipe = prod.recipe_map[data["recipe"]]
+        elif ModuleFile(data["recipe"]).fullpath.is_file():
+            node.recipe = Recipe.empty(data["recipe"])
         else:
             node.recipe = Recipe.empty("! " + data["recipe"])
     else:
@@ -90,6 +82,17 @@ yaml.add_representer(Node, node_representer)
 yaml.add_constructor(u'!node', node_constructor)
 
 
+_ignore_aliases = yaml.Dumper.ignore_aliases
+
+
+def ignore_aliases(dumper, data):
+    # Note: all instances of a module share the same nodes, which shouldn't show up as anchors in the yaml
+    return isinstance(data, Node) or _ignore_aliases(dumper, data)
+
+
+yaml.Dumper.ignore_aliases = ignore_aliases
+
+
 def ingredient_representer(dumper, ingredient):
     # FIXME: why does the yaml dumper reverse the list sequence.... WHY ???
     return dumper.represent_sequence(u"!ingredient", [ingredient.count, ingredient.name])
@@ -7,74 +7,278 @@ from . import CONFIG
 from .recipe import Recipe
 from .producer import Producer
 from .link import ModuleFile
+from .spans import SPANS
+from ..compose import (
+    compose_module_file,
+    compose_pool,
+)
 
 import os
 from pathlib import Path
 from typing import Optional
 
+import json_store
+
+
+# bump when the layout of the entries in the module index changes
+MODULE_INDEX_VERSION = 2
+
+
+# below this many files the startup of the worker processes costs more than it saves
+PARALLEL_COMPOSE_MIN_FILES = 8
 
 class _ModuleProducer(Producer):
     module_index = {}
+    # id -> the (mtime, size) of the module file and the trees of its nested modules when it was loaded,
+    # see `is_current`
+    _loaded = {}
+    _index = None
+    # fullpath -> composed yaml document, filled by `prefetch_modules`
+    _composed = {}
+    # ids of the modules currently being loaded, to break up recursive modules
+    _loading = set()
 
     @property
     def is_module(self):
         return True
 
     @classmethod
-    def register_module(cls, module_id, tree):
+    def register_module(cls, module_id, recipe, tree):
         # TODO: change from tuple to simple Nodetree, in combination with new tree.recipe property
-        cls.module_index[module_id] = (tree.node_main.recipe, tree)
+        cls.module_index[module_id] = (recipe, tree)
+
+    @classmethod
+    def get_module_recipe(cls, module_id):
+        return cls.module_index[module_id][0]
 
     @classmethod
     def get_module_tree(cls, module_id):
         return cls.module_index[module_id][1]
 
-    def rescan_modules(self, subroot=None):
-        if not subroot:
-            self.recipes = [Recipe.empty()]
-            root = CONFIG.dpath_data
-        else:
-            root = subroot
+    @staticmethod
+    def file_stat(modulefile: ModuleFile) -> Optional[tuple[int, int]]:
+        try:
+            stat = modulefile.fullpath.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def is_current(self, module_id: str, visiting: Optional[set] = None) -> bool:
+        """Whether the loaded tree of the module is up to date with its file, and with the modules nested in it
+
+        A module whose file was removed keeps its loaded tree, since it can't be loaded again anyway.
+        """
+        if module_id not in self.module_index or module_id not in self._loaded:
+            return False
+        stat, nested = self._loaded[module_id]
+        current = self.file_stat(ModuleFile(module_id))
+        if current is not None and current != stat:
+            return False
+
+        visiting = set() if visiting is None else visiting
+        visiting.add(module_id)
+        for nested_id, tree in nested.items():
+            if nested_id in visiting:
+                continue
+            # the summary of the module was computed with the tree of the nested module at that time
+            if self.module_index.get(nested_id, (None, None))[1] is not tree \
+                    or (tree is not None and not self.is_current(nested_id, visiting)):
+                return False
+        return True
+
+    def get_module(self, modulefile: ModuleFile) -> Optional:
+        """Returns the shared tree of the module, loading it if it isn't loaded or its file changed since"""
+        if self.is_current(modulefile.id):
+            return self.get_module_tree(modulefile.id)
+        if modulefile.id in self._loading:
+            return None
+        return self.update_module(modulefile)
+
+    @property
+    def fpath_index(self) -> Path:
+        return CONFIG.dpath_data / ".module_index.json"
+
+    def open_index(self) -> json_store.JSONStore:
+        """The persistent index of the module summaries, so that unchanged modules needn't be parsed on a rescan"""
+        if self._index is None or Path(self._index.path) != self.fpath_index:
+            self._index = json_store.open(self.fpath_index, json_kw={ "indent": 4 })
+            if self._index.get("version") != MODULE_INDEX_VERSION:
+                self._index.clear()
+                self._index["version"] = MODULE_INDEX_VERSION
+                self._index["modules"] = {}
+        return self._index
 
+    def scan_module_files(self, root: Path):
         for entry in os.scandir(root):
             if not entry.name.startswith("."):
                 if entry.is_file() and Path(entry.name).suffix == ".yaml":
-                    self.update_module(ModuleFile(entry.path))
+                    yield entry
                 elif entry.is_dir():
-                    self.rescan_modules(entry.path)
+                    yield from self.scan_module_files(entry.path)
 
-        if not subroot:
-            self.update_recipe_map()
+    def rescan_modules(self):
+        index = self.open_index()
+        indexed = index["modules"]
+        modules = {}
+        recipes = [Recipe.empty()]
 
-    def update_module(self, modulefile: ModuleFile) -> Optional:
+        modulefiles = {}
+        stats = {}
+        for entry in self.scan_module_files(CONFIG.dpath_data):
+            modulefile = ModuleFile(entry.path)
+            modulefiles[modulefile.id] = modulefile
+            stats[modulefile.id] = entry.stat()
+
+        valid = {}
+
+        def is_valid(module_id: str, visiting: set) -> bool:
+            """Whether the indexed summary of the module is up to date, including the modules nested in it"""
+            if module_id in valid:
+                return valid[module_id]
+            cached = indexed.get(module_id)
+            stat = stats[module_id]
+            result = bool(cached) and cached["mtime"] == stat.st_mtime_ns and cached["size"] == stat.st_size
+            if result:
+                visiting.add(module_id)
+                for nested, mtime in cached["modules"].items():
+                    nested_stat = stats.get(nested)
+                    if (nested_stat.st_mtime_ns if nested_stat else None) != mtime \
+                            or nested in visiting \
+                            or (nested_stat and not is_valid(nested, visiting)):
+                        result = False
+                        break
+                visiting.discard(module_id)
+            valid[module_id] = result
+            return result
+
+        changed = []
+        for module_id, modulefile in modulefiles.items():
+            if is_valid(module_id, set()):
+                modules[module_id] = indexed[module_id]
+                recipes += [Recipe(module_id, *indexed[module_id]["recipe"])]
+            else:
+                changed += [(len(recipes), modulefile, stats[module_id])]
+                # placeholder to keep the listing in the order of the scan
+                recipes += [None]
+                # loaded again, also when another changed module nests it
+                self.module_index.pop(module_id, None)
+
+        self.prefetch_modules([modulefile for _, modulefile, _ in changed])
+        for idx, modulefile, stat in changed:
+            if modulefile.id in self.module_index:
+                # already loaded as nested module of a changed module before it
+                recipe, tree = self.module_index[modulefile.id]
+            else:
+                loaded = self.load_module(modulefile)
+                if loaded is None:
+                    continue
+                recipe, tree = loaded
+            nested = self.nested_modules(tree)
+            modules[modulefile.id] = {
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "recipe": [recipe.cycle_rate,
+                           [ingredient.to_json_schema() for ingredient in recipe.inputs],
+                           [ingredient.to_json_schema() for ingredient in recipe.outputs]],
+                # the summary also depends on these, see `is_valid`
+                "modules": {module_id: stats[module_id].st_mtime_ns if module_id in stats else None
+                            for module_id in sorted(nested)},
+            }
+            recipes[idx] = recipe
+
+        self.clear_prefetched()
+        self.recipes = [recipe for recipe in recipes if recipe is not None]
+
+        if modules != indexed:
+            index["modules"] = modules
+            index.sync()
+
+    @staticmethod
+    def nested_modules(tree) -> set[str]:
+        """The ids of the modules used directly in `tree` (the nested ones aren't attached to module trees)"""
+        modules = set()
+        pending = list(tree.node_children)
+        while pending:
+            instance = pending.pop()
+            if instance.node_main.is_module:
+                modules.add(ModuleFile(instance.node_main.recipe.name).id)
+            pending += instance.node_children
+        return modules
+
+    def prefetch_modules(self, modulefiles: [ModuleFile], compose_all=False):
+        """Composes the yaml documents of the modules in parallel, to be picked up by `load_module`
+
+        With `compose_all` small batches are composed in the calling thread instead of being left to `load_module`,
+        which is meant for callers running off the event loop.
+        """
+        fpaths = [modulefile.fullpath for modulefile in modulefiles
+                  if modulefile.fullpath not in self._composed and modulefile.fullpath.is_file()]
+        if len(fpaths) >= PARALLEL_COMPOSE_MIN_FILES:
+            documents = compose_pool().map(compose_module_file, fpaths)
+        elif compose_all:
+            documents = map(compose_module_file, fpaths)
+        else:
+            return
+
+        for fpath, document in zip(fpaths, documents):
+            if document is not None:
+                self._composed[fpath] = document
+
+    def clear_prefetched(self):
+        self._composed.clear()
+
+    def load_module(self, modulefile: ModuleFile) -> Optional[tuple]:
+        """Parses and registers the module, without adding it to the listed `recipes`"""
         if not modulefile.fullpath.is_file():
             return None
 
         from .. import io
-        tree = io.load_data(modulefile.fullpath)
+        stat = self.file_stat(modulefile)
+        document = self._composed.pop(modulefile.fullpath, None)
+        if document is not None:
+            tree = io.construct_yaml(document)
+        else:
+            # Note: the nested modules are resolved below, also breaking up recursive modules
+            tree = io.load_data(modulefile.fullpath, resolve_modules=False)
         if tree is None:
             # FIXME
             from . import APP
             APP.notify(f"Failed loading module: {modulefile.id}")
             return None
 
+        # Note: the tree is shared by all instances of the module and must not be modified afterwards
+        self._loading.add(modulefile.id)
+        try:
+            tree.resolve_nested_modules()
+        finally:
+            self._loading.discard(modulefile.id)
         tree.update_summaries()
         tree.mark_from_module()
 
-        tree.node_main.recipe.name = modulefile.id
+        recipe = tree.node_main.recipe.renamed(modulefile.id)
+
+        self.register_module(modulefile.id, recipe, tree)
+        self._loaded[modulefile.id] = (stat, {module_id: self.module_index.get(module_id, (None, None))[1]
+                                              for module_id in self.nested_modules(tree)})
+        return (recipe, tree)
 
-        self.register_module(modulefile.id, tree)
+    @SPANS.timed("module.update_module")
+    def update_module(self, modulefile: ModuleFile) -> Optional:
+        loaded = self.load_module(modulefile)
+        if loaded is None:
+            return None
+        recipe, tree = loaded
 
         idx_delete = None
         idx_insert = len(self.recipes)
         # FIXME: refer to the actual MODULE PRODUCER
         # FIXME: move update module listing / register module into an appropriate location
-        for idx, recipe in enumerate(self.recipes):
-            if recipe.name == tree.node_main.recipe.name:
+        for idx, existing in enumerate(self.recipes):
+            if existing.name == recipe.name:
                 idx_delete = idx_insert = idx
         if idx_delete is not None:
             del self.recipes[idx_delete]
-        self.recipes.insert(idx_insert, tree.node_main.recipe)
+        self.recipes.insert(idx_insert, recipe)
         self.update_recipe_map()
         return tree
 
@@ -3,19 +3,30 @@
 #  License, v. 2.0. If a copy of the MPL was not distributed with this
 #  file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-from .edit import EditValue, Bounds
+from .edit import (
+    smartround,
+    EditValue,
+    COUNT_BOUNDS,
+    CLOCK_RATE_BOUNDS,
+    MK_BOUNDS,
+    PURITY_BOUNDS,
+)
 
 from .recipe import (
     Recipe,
     Ingredient,
 )
-from .producer import EMPTY_PRODUCER
 
 import math
 from enum import Enum
+from functools import lru_cache
 from typing import Self
 
 
+# the power draw of consumers grows with the clock rate to this power
+POWER_EXPONENT = 1.321928
+
+
 class Purity(Enum):
     NA     = 0
     PURE   = 1
@@ -31,6 +42,7 @@ class Purity(Enum):
 
 
 class EditPurityValue(EditValue):
+    __slots__ = ()
     purity_map = list(reversed(Purity.__members__))
 
     def get_num(self):
@@ -42,11 +54,14 @@ class EditPurityValue(EditValue):
 
 
 class EditClampValue(EditValue):
+    __slots__ = ()
+
     def get_num(self):
         return self.value.count
 
     def set_num(self, value):
-        self.value.count = value
+        # Note: `Ingredient` is immutable and `edit_input` must stay as typed
+        self._value = Ingredient(self._value.name, value)
 
 
 # class EditProducerValue(EditValue):
@@ -65,32 +80,107 @@ class EditClampValue(EditValue):
 #         self.value.count = value
 
 
+@lru_cache(maxsize=4096)
+def node_rates(producer, recipe, count, clock_rate, mk, purity, clamp, energy_module) -> (float | None, dict, float):
+    """Calculates the ingredient rates and power of a node
+
+    Shared between all nodes, since e.g. expanded modules produce many identical ones.
+    The returned ingredient dict is cached and must not be mutated.
+
+    Returns
+    * the clock rate derived from `clamp` or None if it isn't changed
+    * the ingredient rates per minute
+    * the power draw
+    """
+    ingredients = {}
+    clamped_clock_rate = None
+    rate_mult = 60 / recipe.cycle_rate
+
+    if clamp and count:
+
+        for ingredient in recipe.inputs:
+            if ingredient.name == clamp.name:
+                # clamped_clock_rate = ((abs(int(clamped.count.value)) * 100) / (rate_mult / count)) / ingredient.count.value
+                clamped_clock_rate = 5 * recipe.cycle_rate * abs(clamp.count) / (3 * ingredient.count * count)
+                break
+        for ingredient in recipe.outputs:
+            if ingredient.name == clamp.name:
+                if producer.is_miner:
+                    clamped_clock_rate = 5 * recipe.cycle_rate * purity.value * abs(clamp.count) / (3 * pow(2, mk) * ingredient.count * count)
+                else:
+                    clamped_clock_rate = 5 * recipe.cycle_rate * abs(clamp.count) / (3 * ingredient.count * count)
+
+        if clamped_clock_rate is not None:
+            clock_rate = smartround(clamped_clock_rate)
+
+        if clock_rate > 250:
+            clamped_clock_rate = clock_rate = 250
+
+    ingredient_mult = rate_mult * (clock_rate * count) / 100
+    for inp in recipe.inputs:
+        total = inp.count * ingredient_mult * -1
+        ingredients[inp.name] = total
+
+    for out in recipe.outputs:
+        if producer.is_miner:
+            total = (out.count / purity.value) * (pow(2, mk)) * ingredient_mult
+            ingredients[out.name] = total
+        else:
+            total = out.count * ingredient_mult
+            ingredients[out.name] = total
+
+    if producer.is_pow_gen:
+        # the power produced counts against the draw, so that the summaries add up to the net draw of a plan
+        energy = -ingredients.get("+Power", 0)
+    elif producer.is_module:
+        energy = energy_module * count
+    else:
+        energy = producer.base_power * math.pow((clock_rate / 100), POWER_EXPONENT) * count
+
+    return (clamped_clock_rate, ingredients, energy)
+
+
 class Node:
+    __slots__ = (
+        "is_dummy",
+        "_producer",
+        "recipe",
+        "purity",
+        "recipe_cache",
+        "purity_cache",
+        "clamp",
+        "count",
+        "clock_rate",
+        "mk",
+        "energy",
+        "energy_module",
+        "ingredients",
+        "signature",
+        "rates",
+    )
     yaml_tag = "!Node"
 
-    # defaults to be shadowed (avoiding AttributeError's)
-    producer = EMPTY_PRODUCER
-
     def __init__(self, producer, recipe, count=1, clock_rate=100, mk=1, purity=Purity.NORMAL, clamp=None, is_dummy=False):
         # a dummy is a read-only, non-interactable, row - for example expanded from a module
         # (can't shift it, can't delete it)
         self.is_dummy = is_dummy
-        # remembers the last selected recipe for each producer
-        self.recipe_cache = {}
-        self.purity_cache = {}
-        self.module_children = []
+        # remember the last selected recipe/purity for each producer
+        # (only created once the producer of this node gets changed)
+        self.recipe_cache = None
+        self.purity_cache = None
         self.producer = producer
         self.recipe = recipe
         self.clamp = EditClampValue(clamp) if clamp else None
-        self.count = EditValue(count, bounds=Bounds(0, 999))
-        self.clock_rate = EditValue(clock_rate, bounds=Bounds(0, 250))
-        self.mk = EditValue(mk, bounds=Bounds(1, 3))
-        self.purity = EditPurityValue(purity if producer.is_miner else Purity.NA, bounds=Bounds(1, 3))
-        self.uirow = None
-        self.ui_elems = []
+        self.count = EditValue(count, bounds=COUNT_BOUNDS)
+        self.clock_rate = EditValue(clock_rate, bounds=CLOCK_RATE_BOUNDS)
+        self.mk = EditValue(mk, bounds=MK_BOUNDS)
+        self.purity = EditPurityValue(purity if producer.is_miner else Purity.NA, bounds=PURITY_BOUNDS)
         self.energy = 0
         self.energy_module = 0
         self.ingredients = {}
+        # inputs and results of the last `update` call
+        self.signature = None
+        self.rates = None
         self.update()
 
     def duplicate_partially(self) -> Self:
@@ -99,83 +189,56 @@ class Node:
                     mk=self.mk.value)
 
     @property
-    def recipe(self):
-        return self._recipe
-
-    @recipe.setter
-    def recipe(self, value):
-        if not hasattr(self, "recipe_cache"):
-            # remembers the last selected recipe for each producer
-            self.recipe_cache = {}
-        self._recipe = value
-        if value:
-            self.recipe_cache[self.producer.name] = value
-
-    @property
-    def purity(self):
-        return self._purity
-
-    @purity.setter
-    def purity(self, value):
-        if not hasattr(self, "purity_cache"):
-            # remembers the last selected purity for each producer
-            self.purity_cache = {}
-        self._purity = value
-        self.purity_cache[self.producer.name] = value
+    def producer(self):
+        return self._producer
+
+    @producer.setter
+    def producer(self, value):
+        previous = getattr(self, "_producer", None)
+        if previous is not None and previous is not value:
+            if self.recipe_cache is None:
+                self.recipe_cache = {}
+                self.purity_cache = {}
+            if self.recipe:
+                self.recipe_cache[previous.name] = self.recipe
+            self.purity_cache[previous.name] = self.purity
+        self._producer = value
 
     def producer_reset(self):
-        if not self.recipe or self.recipe not in self.producer.recipe_map.values():
+        recipe_cache = self.recipe_cache or {}
+        purity_cache = self.purity_cache or {}
+
+        if not self.recipe or not self.producer.has_recipe(self.recipe):
             default = self.producer.recipes[0] if self.producer.recipes else Recipe.empty()
-            self.recipe = self.recipe_cache.get(self.producer.name, default)
+            self.recipe = recipe_cache.get(self.producer.name, default)
 
         if self.producer.is_miner:
-            self.purity = self.purity_cache.get(self.producer.name, EditPurityValue(Purity.NORMAL))
+            self.purity = purity_cache.get(self.producer.name, EditPurityValue(Purity.NORMAL, bounds=PURITY_BOUNDS))
         else:
-            self.purity = EditPurityValue(Purity.NA)
+            self.purity = EditPurityValue(Purity.NA, bounds=PURITY_BOUNDS)
         self.energy = 0
         self.update()
 
+    def update_signature(self) -> tuple:
+        return (self.producer,
+                self.recipe,
+                self.count.value,
+                self.clock_rate.value,
+                self.mk.value,
+                self.purity.value,
+                self.clamp.value if self.clamp else None,
+                self.energy_module if self.producer.is_module else 0)
+
     def update(self):
-        self.energy = 0
-        self.ingredients = {}
-        rate_mult = 60 / self.recipe.cycle_rate
-
-        if self.clamp and self.count.value:
-
-            for ingredient in self.recipe.inputs:
-                if ingredient.name == self.clamp.value.name:
-                    # self.clock_rate.value = ((abs(int(clamped.count.value)) * 100) / (rate_mult / self.count.value)) / ingredient.count.value
-                    self.clock_rate.value = 5 * self.recipe.cycle_rate * abs(self.clamp.value.count) / (3 * ingredient.count * self.count.value)
-                    break
-            for ingredient in self.recipe.outputs:
-                if ingredient.name == self.clamp.value.name:
-                    if self.producer.is_miner:
-                        self.clock_rate.value = 5 * self.recipe.cycle_rate * self.purity.value.value * abs(self.clamp.value.count) / (3 * pow(2, self.mk.value) * ingredient.count * self.count.value)
-                    else:
-                        self.clock_rate.value = 5 * self.recipe.cycle_rate * abs(self.clamp.value.count) / (3 * ingredient.count * self.count.value)
-
-            if self.clock_rate.value > 250:
-                self.clock_rate.value = 250
-
-        ingredient_mult = rate_mult * (self.clock_rate.value * self.count.value) / 100
-        for inp in self.recipe.inputs:
-            total = inp.count * ingredient_mult * -1
-            self.ingredients[inp.name] = total
-
-        for out in self.recipe.outputs:
-            if self.producer.is_miner:
-                total = (out.count / self.purity.value.value) * (pow(2, self.mk.value)) * ingredient_mult
-                self.ingredients[out.name] = total
-            else:
-                total = out.count * ingredient_mult
-                self.ingredients[out.name] = total
-
-        if self.producer.is_pow_gen:
-            pass  # TODO
-        elif self.is_module:
-            self.energy = self.energy_module * self.count.value
-        else:
-            self.energy = self.producer.base_power * math.pow((self.clock_rate.value / 100), 1.321928) * self.count.value
+        signature = self.update_signature()
+        if signature != self.signature:
+            self.rates = node_rates(*signature)
+        clamped_clock_rate, self.ingredients, self.energy = self.rates
+
+        if clamped_clock_rate is not None:
+            self.clock_rate.value = clamped_clock_rate
+            signature = self.update_signature()
+        self.signature = signature
 
     @property
     def is_module(self):
@@ -6,7 +6,11 @@
 from .link import ModuleFile
 from .recipe import Recipe
 from .module import MODULE_PRODUCER
-from .producer import SUMMARY_PRODUCER
+from .producer import (
+    SUMMARY_PRODUCER,
+    ROLLUP_PRODUCER,
+)
+from .rollup import ROLLUP
 from .node import Node
 
 from typing import Self
@@ -17,13 +21,23 @@ import yaml
 
 
 class SummaryNode(Node):
+    __slots__ = ("row_idx",)
+    summary_producer = SUMMARY_PRODUCER
+
     def __init__(self, nodes):
         self.row_idx = 0
-        super().__init__(SUMMARY_PRODUCER, self.update_summary(nodes), is_dummy=True)
+        super().__init__(self.summary_producer, Recipe.empty(), is_dummy=True)
+        self.update_summary(nodes)
 
     def producer_reset(self):
         ...
 
+    def update(self):
+        # the power is summed up in `update_summary` and not derived from the producer
+        energy = self.energy
+        super().update()
+        self.energy = energy
+
     def update_summary(self, nodes: [Node]) -> Recipe:
         # TODO: also handle power consumption
         power = 0
@@ -36,10 +50,40 @@ class SummaryNode(Node):
         sums = {k: v for k, v in sums.items() if v}
         self.recipe = Recipe.from_dict(sums)
         self.energy = power
+        self.update()
+        return self.recipe
+
+
+class RollupNode(SummaryNode):
+    """The net flows of a summary, with its deficits resolved down to raw resources (see `rollup.Rollup`)"""
+    __slots__ = ("summary",)
+    summary_producer = ROLLUP_PRODUCER
+
+    def __init__(self, summary: SummaryNode):
+        self.summary = summary
+        super().__init__([])
+
+    def update_summary(self, nodes: [Node] = None) -> Recipe:
+        # Note: derived from the summary instead of the nodes, which the summary already accounts for
+        self.recipe = Recipe.from_dict(ROLLUP.resolve(self.summary.ingredients))
+        self.energy = self.summary.energy
+        self.update()
         return self.recipe
 
 
 class NodeInstance:
+    __slots__ = (
+        "parent",
+        "node_main",
+        "node_children",
+        "shown",
+        "expanded",
+        "from_module",
+        "indent_str",
+        "row_idx",
+        "level",
+    )
+
     def __init__(self, node: Node, children: [Self] = None, parent: [Self] = None, shown=True, expanded=True, row_idx=None, level=0):
         self.parent = parent
         self.node_main = node
@@ -101,36 +145,37 @@ class NodeInstance:
         self.node_children.insert(max(0, idx + offset), child)
 
     def get_nodes(self, level=0, tree_root=None) -> [Self]:
+        nodes = []
+        self.collect_nodes(nodes, level=level)
+        return nodes
+
+    def collect_nodes(self, nodes: [Self], level=0, top: Self = None):
+        # Note: rows of nested nodes (level > 1) resolve to their top-level instance,
+        #       so that the table selects e.g. the whole module instead of its dummy rows
         self.indent_str = " " * max(0, level - 2)
-        if level == 0:
-            tree_root.row_to_node_index = []
 
         if not self.shown:
-            self.row_idx = tree_root.row_to_node_index[-1].row_idx if tree_root.row_to_node_index else 0
-            return []
-        else:
-            self.level = level
-            nodes = [self]
-            self.row_idx = len(tree_root.row_to_node_index)
+            self.row_idx = nodes[-1].row_idx if nodes else 0
+            return
 
-        if level < 1:
-            tree_root.row_to_node_index += [self]
+        self.level = level
+        if level < 2:
+            top = self
+            self.row_idx = len(nodes)
+        else:
+            self.row_idx = top.row_idx
+        nodes.append(self)
 
         if self.expanded:
             for cnode in self.node_children:
-                cnodes = cnode.get_nodes(level=level + 1, tree_root=tree_root)
-                nodes += cnodes
+                cnode.collect_nodes(nodes, level=level + 1, top=top)
 
-        if isinstance(self.node_main, SummaryNode):
+        if isinstance(self.node_main, SummaryNode) and not self.from_module:
             # Note: the innermost nodes get their recipe updated before the outer nodes
-            #       because of the `get_nodes` calls above
+            #       because of the `collect_nodes` calls above
+            #       (module trees are shared and their summaries are calculated once when loading them)
             self.node_main.update_summary([cinstance.node_main for cinstance in self.node_children])
 
-        if level < 2:
-            tree_root.row_to_node_index += [self] * len(nodes)
-
-        return nodes
-
     def update_summaries(self):
         for child in self.node_children:
             child.update_summaries()
@@ -149,18 +194,42 @@ class NodeInstance:
         if not self.node_main.is_module:
             return
 
-        # FIXME: guard against recursive modules here..
         if module_file:
             self.node_children.clear()
-            tree = MODULE_PRODUCER.update_module(module_file)
+            tree = MODULE_PRODUCER.get_module(module_file)
             if not tree:
                 return
 
-            self.add_children([tree])
+            self.add_children([tree.view()])
+            self.node_main.recipe = MODULE_PRODUCER.get_module_recipe(module_file.id)
+            self.node_main.energy_module = tree.node_main.energy
+            self.node_main.update()
+
+    def view(self) -> Self:
+        """Copies this subtree while sharing its nodes
+
+        Each place a module is used gets its own view of the module tree,
+        so that only the display state (`shown`, `expanded`, `row_idx`, ...) is duplicated.
+        """
+        instance = type(self)(self.node_main,
+                              [child.view() for child in self.node_children],
+                              shown=self.shown,
+                              expanded=self.expanded)
+        instance.from_module = self.from_module
+        return instance
+
+    def resolve_nested_modules(self):
+        # nested modules aren't attached to the shared module trees, only their recipe and power are needed for the summary
+        for child in self.node_children:
+            child.resolve_nested_modules()
 
-            if self.node_children:
-                # FIXME: sum with nested modules isn't always correct
-                self.node_main.energy_module = self.node_children[0].node_main.energy
+        if self.node_main.is_module:
+            module_file = ModuleFile(self.node_main.recipe.name)
+            module_tree = MODULE_PRODUCER.get_module(module_file)
+            if module_tree is not None:
+                self.node_main.recipe = MODULE_PRODUCER.get_module_recipe(module_file.id)
+                self.node_main.energy_module = module_tree.node_main.energy
+                self.node_main.update()
 
     def collect_modules(self, level=0, tree_roots=[]):
         if tree_roots[-1] is self:
@@ -198,9 +267,16 @@ class NodeInstance:
 
 
 class NodeTree(NodeInstance):
+    __slots__ = (
+        "tree_modules",
+        "row_to_node_index",
+        "rollup",
+    )
+
     def __init__(self, *args, **kwargs):
         self.tree_modules = set()
         self.row_to_node_index = []
+        self.rollup = None
         super().__init__(*args, **kwargs)
 
     def get_node(self, row_idx: int) -> None | NodeInstance:
@@ -210,10 +286,31 @@ class NodeTree(NodeInstance):
         return node  # None if isinstance(node, NodeTree) else node
 
     def get_nodes(self, level=0, tree_root=None) -> [NodeInstance]:
-        # Note: this isn't only called when self is the root of the DataTable,
-        #       but also when the root contains a module, which itself has a NodeTree
-        root = tree_root if tree_root else self
-        return super().get_nodes(level=level, tree_root=root)
+        nodes = super().get_nodes(level=level, tree_root=tree_root)
+        if tree_root is None:
+            self.collect_rollup(nodes)
+            self.update_row_index(nodes)
+        return nodes
+
+    def collect_rollup(self, nodes: [NodeInstance]):
+        """Appends the raw resources of the plan as last row, unless they're the same as its summary"""
+        if not isinstance(self.node_main, SummaryNode):
+            return
+        if self.rollup is None or self.rollup.node_main.summary is not self.node_main:
+            self.rollup = NodeInstance(RollupNode(self.node_main))
+
+        rollup = self.rollup.node_main
+        rollup.update_summary()
+        if rollup.ingredients != self.node_main.ingredients:
+            self.rollup.row_idx = len(nodes)
+            nodes.append(self.rollup)
+
+    def update_row_index(self, nodes: [NodeInstance]):
+        # every row points to the top-level instance it belongs to (see `NodeInstance.collect_nodes`)
+        index = [None] * len(nodes)
+        for row, instance in enumerate(nodes):
+            index[row] = nodes[instance.row_idx]
+        self.row_to_node_index = index
 
     def remove_node(self, row_idx: int):
         node = self.get_node(row_idx)
@@ -221,7 +318,7 @@ class NodeTree(NodeInstance):
             return
         if node is self:
             self.node_children = []
-        else:
+        elif node in self.node_children:
             self.node_children.remove(node)
 
     @property
@@ -254,8 +351,20 @@ class NodeTree(NodeInstance):
         super().collect_modules(level=level, tree_roots=roots)
 
     def reload_modules(self, instances=None, module_stack=None):
+        for module_files in self.iter_reload_modules(instances, module_stack):
+            MODULE_PRODUCER.prefetch_modules(module_files)
+
+    def iter_reload_modules(self, instances=None, module_stack=None, reloaded=None):
+        """Reloads the changed modules one level of the tree after another
+
+        Before loading a level the files of its modules are yielded, so that the caller can prefetch them
+        (see `_ModuleProducer.prefetch_modules`) and show the progress in between.
+        """
         from . import APP
         module_stack = module_stack or []
+        is_outermost = reloaded is None
+        # each module file is only parsed once per reload, all of its instances share that tree
+        reloaded = set() if reloaded is None else reloaded
 
         def reload_module(instance) -> str | bool | None:
             if instance.node_main.is_module:
@@ -271,20 +380,32 @@ class NodeTree(NodeInstance):
                     substack = module_stack[idx:] + [module]
                     log("\n".join(substack))
                     return None
+                reloaded.add(module)
+                # Note: only parsed again if its file (or a module nested in it) changed, see `_ModuleProducer.get_module`
                 instance.set_module(ModuleFile(module))
-                return True
+                return module
             else:
                 return False
 
         if instances is None:
             instances = self.node_children
 
-        for instance in instances:
-            res = reload_module(instance)
-            match res:
-                case str():
-                    self.reload_modules(instance.node_children, module_stack + res)
-                case None:
-                    log("Error reloading module")
-                case _:
-                    self.reload_modules(instance.node_children, module_stack)
+        pending = {instance.node_main.recipe.name for instance in instances if instance.node_main.is_module}
+        pending = {module for module in pending - reloaded - set(module_stack)
+                   if not MODULE_PRODUCER.is_current(ModuleFile(module).id)}
+        if pending:
+            yield [ModuleFile(module) for module in pending]
+
+        try:
+            for instance in instances:
+                res = reload_module(instance)
+                match res:
+                    case str():
+                        yield from self.iter_reload_modules(instance.node_children, module_stack + [res], reloaded)
+                    case None:
+                        log("Error reloading module")
+                    case _:
+                        yield from self.iter_reload_modules(instance.node_children, module_stack, reloaded)
+        finally:
+            if is_outermost:
+                MODULE_PRODUCER.clear_prefetched()
@@ -0,0 +1,382 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from .recipe import Recipe
+from .node import Node
+from .nodetree import NodeTree
+from .rollup import (
+    ROLLUP,
+    Rollup,
+)
+from .chain import (
+    building_node,
+    is_alternate,
+)
+
+from typing import Optional
+
+
+EPSILON = 1e-9
+# after this many pivots without progress the entering variable is chosen by Bland's rule, which can't cycle
+DEGENERATE_PIVOTS_MAX = 50
+# the right hand sides are perturbed by up to twice this, see `simplex`
+PERTURBATION = 1e-6
+# `ceil_clock_rate` adds at most 0.02% of a building to each building of a node, see `RecipeOptimizer.nodes`
+ROUNDING_MARGIN = 2e-4
+
+# how much each objective counts by default, see `RecipeOptimizer`
+DEFAULT_WEIGHTS = {
+    "raw": 1,
+    "power": 0,
+    "buildings": 0,
+}
+
+
+class Infeasible(Exception):
+    pass
+
+
+class Unbounded(Exception):
+    pass
+
+
+class DualSimplex:
+    """Minimizes `costs · x` subject to `row · x >= rhs` like `simplex`, but only for non-negative `costs`
+
+    Starts from the basis of the surpluses, which is optimal but infeasible (for positive right hand sides),
+    and pivots the deficits out row by row, following the chains of the targets down to the raw resources.
+    Unlike the primal simplex, the many rows with a zero right hand side don't lead to degenerate pivots.
+    The tableau is kept, so that after raising the right hand sides (`raise_rhs`) it's solved again
+    from the previous basis, usually within a few pivots.
+    """
+    def __init__(self, costs: dict, rows: [(dict, float)]):
+        if any(cost < 0 for cost in costs.values()):
+            raise ValueError("The dual simplex needs non-negative costs")
+        self.variables = list(dict.fromkeys([*costs, *(var for row, _ in rows for var in row)]))
+        index = {var: idx for idx, var in enumerate(self.variables)}
+        self.n_vars = len(self.variables)
+        n_cols = self.n_vars + len(rows)
+
+        # -row · x + surplus = -rhs, with the surplus as basic variable
+        self.tableau = []
+        self.values = []
+        for idx, (row, rhs) in enumerate(rows):
+            dense = [0.0] * n_cols
+            for var, coef in row.items():
+                dense[index[var]] = -coef
+            dense[self.n_vars + idx] = 1.0
+            self.tableau += [dense]
+            self.values += [-rhs]
+        self.basis = list(range(self.n_vars, n_cols))
+        # Note: most variables cost nothing (e.g. all recipes but the extractors), the perturbed costs break their ties
+        self.reduced = [float(costs.get(var, 0)) + PERTURBATION * (1 + idx * 0.6180339887 % 1)
+                        for idx, var in enumerate(self.variables)] + [0.0] * len(rows)
+
+    def raise_rhs(self, deltas: dict[int, float]):
+        """Adds `deltas` (row index -> amount) to the right hand sides"""
+        for values_idx, row in enumerate(self.tableau):
+            # the columns of the surpluses hold the inverse of the basis
+            self.values[values_idx] -= sum(row[self.n_vars + idx] * delta for idx, delta in deltas.items())
+
+    def solve(self) -> dict:
+        """Returns the value of each nonzero variable"""
+        degenerate = 0
+        while True:
+            infeasible = [idx for idx, value in enumerate(self.values) if value < -EPSILON]
+            if not infeasible:
+                return {self.variables[var]: value for value, var in zip(self.values, self.basis)
+                        if var < self.n_vars and value > EPSILON}
+            if degenerate < DEGENERATE_PIVOTS_MAX:
+                # dual steepest edge: the deficit relative to the norm of its row of the inverse of the basis,
+                # which takes a fraction of the pivots of picking the largest deficit
+                pidx = max(infeasible, key=lambda idx: self.values[idx] ** 2
+                           / sum(a * a for a in self.tableau[idx][self.n_vars:]))
+            else:
+                pidx = min(infeasible, key=self.basis.__getitem__)
+
+            best = None
+            for col, coef in enumerate(self.tableau[pidx]):
+                if coef < -EPSILON:
+                    ratio = max(self.reduced[col], 0) / -coef
+                    if best is None or ratio < best[0] - EPSILON:
+                        best = (ratio, col)
+            if best is None:
+                raise Infeasible()
+            degenerate = degenerate + 1 if best[0] <= EPSILON else 0
+            self.pivot(pidx, best[1])
+
+    def pivot(self, pidx: int, col: int):
+        factor = self.tableau[pidx][col]
+        prow = [a / factor for a in self.tableau[pidx]]
+        pvalue = self.values[pidx] / factor
+        self.tableau[pidx] = prow
+        self.values[pidx] = pvalue
+        # Note: like in `simplex`, only the nonzero entries of the pivot row are subtracted
+        nonzero = [(col_idx, b) for col_idx, b in enumerate(prow) if b]
+        for idx, row in enumerate(self.tableau):
+            mult = row[col]
+            if idx != pidx and mult:
+                for col_idx, b in nonzero:
+                    row[col_idx] -= mult * b
+                self.values[idx] -= mult * pvalue
+        mult = self.reduced[col]
+        for col_idx, b in nonzero:
+            self.reduced[col_idx] -= mult * b
+        self.basis[pidx] = col
+
+
+def simplex(costs: dict, rows: [(dict, float)]) -> dict:
+    """Minimizes `costs · x` subject to `row · x >= rhs` for each `(row, rhs)` of `rows` and `x >= 0`
+
+    Solved by the `DualSimplex` for non-negative costs, otherwise by a two-phase tableau simplex,
+    with the variables being the keys of the dicts.
+    Returns the value of each nonzero variable.
+
+    Recipe plans are highly degenerate (most rows are balances with a zero right hand side), where both pivoting
+    rules can stall for tens of thousands of pivots at the same vertex (e.g. for the Assembly Director System).
+    So the pivots are chosen with slightly (and unevenly) perturbed right hand sides, while the exact ones
+    get the same row operations, from which the values of the final basis are returned.
+    """
+    if all(cost >= 0 for cost in costs.values()):
+        return DualSimplex(costs, rows).solve()
+
+    variables = list(dict.fromkeys([*costs, *(var for row, _ in rows for var in row)]))
+    index = {var: idx for idx, var in enumerate(variables)}
+    n_vars = len(variables)
+    n_rows = len(rows)
+    targets = [idx for idx, (_, rhs) in enumerate(rows) if rhs > EPSILON]
+    # columns: the variables, a surplus per row, an artificial per row with a positive rhs
+    n_cols = n_vars + n_rows + len(targets)
+    artificial = range(n_vars + n_rows, n_cols)
+
+    tableau = []
+    rhs = []
+    exact = []
+    basis = []
+    for idx, (row, row_rhs) in enumerate(rows):
+        dense = [0.0] * n_cols
+        sign = 1 if row_rhs > EPSILON else -1
+        for var, coef in row.items():
+            dense[index[var]] = sign * coef
+        if sign > 0:
+            # row · x - surplus + artificial = rhs
+            dense[n_vars + idx] = -1.0
+            art = n_vars + n_rows + targets.index(idx)
+            dense[art] = 1.0
+            basis += [art]
+        else:
+            # -row · x + surplus = -rhs, feasible since -rhs >= 0
+            dense[n_vars + idx] = 1.0
+            basis += [n_vars + idx]
+        tableau += [dense]
+        exact += [sign * row_rhs]
+        # Note: the perturbation only grows the (non-negative) right hand side, keeping the initial basis feasible
+        rhs += [sign * row_rhs + PERTURBATION * (1 + idx * 0.6180339887 % 1)]
+
+    def reduced_costs(objective: [float]) -> [float]:
+        reduced = objective[:]
+        for row, var in zip(tableau, basis):
+            cost = objective[var]
+            if cost:
+                reduced = [r - cost * a for r, a in zip(reduced, row)]
+        return reduced
+
+    def run(objective: [float], allowed: int):
+        reduced = reduced_costs(objective)
+        degenerate = 0
+        while True:
+            if degenerate < DEGENERATE_PIVOTS_MAX:
+                col = min(range(allowed), key=reduced.__getitem__)
+            else:
+                col = next((col for col in range(allowed) if reduced[col] < -EPSILON), 0)
+            if reduced[col] >= -EPSILON:
+                return
+
+            best = None
+            for idx, row in enumerate(tableau):
+                coef = row[col]
+                if coef > EPSILON:
+                    ratio = max(rhs[idx], 0) / coef
+                    if best is None or ratio < best[0] - EPSILON or (ratio <= best[0] + EPSILON and basis[idx] < basis[best[1]]):
+                        best = (ratio, idx)
+            if best is None:
+                raise Unbounded(variables[col] if col < n_vars else col)
+            degenerate = degenerate + 1 if best[0] <= EPSILON else 0
+
+            pidx = best[1]
+            factor = tableau[pidx][col]
+            prow = [a / factor for a in tableau[pidx]]
+            prhs = rhs[pidx] / factor
+            pexact = exact[pidx] / factor
+            tableau[pidx] = prow
+            rhs[pidx] = prhs
+            exact[pidx] = pexact
+            # Note: the rows are mostly zeros, so only the nonzero entries of the pivot row are subtracted
+            nonzero = [(col_idx, b) for col_idx, b in enumerate(prow) if b]
+            for idx, row in enumerate(tableau):
+                mult = row[col]
+                if idx != pidx and mult:
+                    for col_idx, b in nonzero:
+                        row[col_idx] -= mult * b
+                    rhs[idx] -= mult * prhs
+                    exact[idx] -= mult * pexact
+            mult = reduced[col]
+            for col_idx, b in nonzero:
+                reduced[col_idx] -= mult * b
+            basis[pidx] = col
+
+    if targets:
+        run([0.0] * artificial.start + [1.0] * len(targets), n_cols)
+        if sum(value for value, var in zip(exact, basis) if var in artificial) > 1e-6:
+            raise Infeasible()
+    run([float(costs.get(var, 0)) for var in variables] + [0.0] * (n_cols - n_vars), artificial.start)
+    return {variables[var]: value for value, var in zip(exact, basis) if var < n_vars and value > EPSILON}
+
+
+class RecipeOptimizer:
+    """Chooses the mix of recipes producing the targets at the lowest weighted cost
+
+    Each recipe is a variable, counting the buildings running it at 100% clock rate. It costs
+    * `raw`: the raw resources it extracts (for the recipes without inputs)
+    * `power`: the power draw of its building (linear, since the buildings run at 100%,
+      the `1.321928` exponent only applies to the underclocked nodes of the resulting plan)
+    * `buildings`: 1 per building
+    each multiplied by the weight of the objective. Recipes needing items which can't be produced from raw resources
+    aren't used. Targets which can't be produced at all are left as deficits of the plan.
+    """
+    def __init__(self, weights: Optional[dict[str, float]] = None, allow_alternates: bool = True, rollup: Rollup = ROLLUP):
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.allow_alternates = allow_alternates
+        self.rollup = rollup
+
+    def producible(self) -> set[str]:
+        """The items which can be produced from raw resources (without e.g. `Hog Remains` or `Wood`)"""
+        producible = set(self.rollup.raw)
+        recipes = {recipe for recipes in self.rollup.producing.values() for recipe in recipes}
+        changed = True
+        while changed:
+            changed = False
+            for recipe in list(recipes):
+                if all(ingredient.name in producible for ingredient in recipe.inputs):
+                    recipes.discard(recipe)
+                    producible |= {ingredient.name for ingredient in recipe.outputs}
+                    changed = True
+        return producible
+
+    def recipes(self, items: [str]) -> [Recipe]:
+        """All recipes which could take part in producing `items`"""
+        producible = self.producible()
+        seen = set(items)
+        pending = list(items)
+        recipes = {}
+        while pending:
+            item = pending.pop()
+            for recipe in self.rollup.producing.get(item, []):
+                if recipe in recipes or (is_alternate(recipe) and not self.allow_alternates):
+                    continue
+                if not all(ingredient.name in producible for ingredient in recipe.inputs):
+                    continue
+                recipes[recipe] = None
+                for ingredient in recipe.inputs:
+                    if ingredient.name not in seen:
+                        seen.add(ingredient.name)
+                        pending.append(ingredient.name)
+        return list(recipes)
+
+    def program(self, targets: dict[str, float], margin: float = 0) -> (dict[Recipe, float], dict[str, tuple[dict, float]]):
+        """The costs and the rows (item -> `(row, rhs)`) of the linear program of `solve`"""
+        recipes = self.recipes(list(targets))
+        rows = {item: {} for item in targets}
+        costs = {}
+        for recipe in recipes:
+            node = Node(recipe.producer, recipe)
+            for item, rate in node.ingredients.items():
+                if item != "+Power":
+                    rows.setdefault(item, {})[recipe] = rate * (1 + margin) if rate < 0 else rate
+            raw = sum(rate for rate in node.ingredients.values() if rate > 0) if not recipe.inputs else 0
+            # Note: only the draw counts, the (negative) energy of generators would make free power profitable
+            costs[recipe] = (self.weights["raw"] * raw
+                             + self.weights["power"] * max(node.energy, 0)
+                             + self.weights["buildings"])
+
+        # the targets which can't be produced are left out, instead of making the whole plan infeasible
+        targets = {item: rate for item, rate in targets.items() if any(rate > 0 for rate in rows[item].values())}
+        return (costs, {item: (row, targets.get(item, 0)) for item, row in rows.items()})
+
+    def solve(self, targets: dict[str, float], margin: float = 0) -> dict[Recipe, float]:
+        """The buildings (at 100% clock rate) of each recipe to produce `targets` (item -> rate per minute)
+
+        With a `margin` the inputs of each recipe are produced that much (relatively) in excess.
+        """
+        costs, rows = self.program(targets, margin)
+        solution = simplex(costs, list(rows.values()))
+        return {var: buildings for var, buildings in solution.items() if isinstance(var, Recipe)}
+
+    def nodes(self, targets: dict[str, float]) -> [Node]:
+        """The rounded up nodes of the solution for `targets`
+
+        Rounded up, the `count <= x + 1` buildings of a node of `x` buildings consume the inputs of up to
+        `x * (1 + m) + m` buildings (with `m` the `ROUNDING_MARGIN`), which the solution leaves as slack for the recipes
+        it uses, so that the rounding can't leave deficits. Since the slack can change which recipes are used,
+        the tableau is solved again until the slack covers all of them (at most once per recipe, usually once).
+        """
+        costs, rows = self.program(targets, ROUNDING_MARGIN)
+        row_idx = {item: idx for idx, item in enumerate(rows)}
+        # Note: negative costs (e.g. of generators weighted by the power they supply) are left to the primal simplex,
+        #       which is solved from scratch each time
+        tableau = DualSimplex(costs, list(rows.values())) if all(cost >= 0 for cost in costs.values()) else None
+        slack = {}
+        covered = set()
+        while True:
+            if tableau is None:
+                solution = simplex(costs, [(row, rhs + slack.get(item, 0)) for item, (row, rhs) in rows.items()])
+            else:
+                solution = tableau.solve()
+            if solution.keys() <= covered:
+                return self.rounded_nodes(solution)
+
+            added = {}
+            for recipe in solution.keys() - covered:
+                for item, rate in Node(recipe.producer, recipe).ingredients.items():
+                    if rate < 0 and item != "+Power":
+                        added[item] = added.get(item, 0) - rate * ROUNDING_MARGIN
+            covered |= solution.keys()
+            for item, amount in added.items():
+                slack[item] = slack.get(item, 0) + amount
+            if tableau is not None:
+                tableau.raise_rhs({row_idx[item]: amount for item, amount in added.items()})
+
+    def rounded_nodes(self, solution: dict[Recipe, float]) -> [Node]:
+        # producers of the inputs first, like the generated chains
+        producing = {}
+        for recipe in solution:
+            for ingredient in recipe.outputs:
+                producing.setdefault(ingredient.name, []).append(recipe)
+
+        depths = {}
+
+        def depth(recipe, visiting):
+            if recipe in depths:
+                return depths[recipe]
+            if recipe in visiting:
+                return 0
+            visiting.add(recipe)
+            result = 1 + max((depth(producer, visiting)
+                              for ingredient in recipe.inputs
+                              for producer in producing.get(ingredient.name, [])), default=-1)
+            visiting.discard(recipe)
+            depths[recipe] = result
+            return result
+
+        ordered = sorted(solution, key=lambda recipe: (depth(recipe, set()), recipe.name))
+        return [building_node(recipe, solution[recipe]) for recipe in ordered]
+
+    def plan(self, targets: dict[str, float]) -> NodeTree:
+        """A plan producing `targets`, e.g. to be loaded with `PlannerTable.sink.load_yaml(yaml.dump(plan))`"""
+        return NodeTree.from_nodes(self.nodes(targets))
+
+
+def optimize(targets: dict[str, float], weights: Optional[dict[str, float]] = None, allow_alternates: bool = True) -> NodeTree:
+    return RecipeOptimizer(weights, allow_alternates).plan(targets)
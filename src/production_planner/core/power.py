@@ -0,0 +1,143 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from .edit import ceil_clock_rate
+from .node import (
+    POWER_EXPONENT,
+    Node,
+    node_rates,
+)
+from .nodetree import NodeInstance
+from .propagate import flow_nodes
+
+import math
+import operator
+from dataclasses import dataclass
+from typing import Optional
+
+
+# the power production of generators grows linearly with the clock rate, like their `+Power` rate in `node_rates`
+# (since 1.0, early access generators overclocked to 250% only produced 202.4%)
+GENERATOR_EXPONENT = 1
+
+# the highest clock rates evaluated by default by `PowerModel.sweep`
+SWEEP_CLOCK_RATES = tuple(range(5, 251, 5))
+
+
+@dataclass(frozen=True, slots=True)
+class SweepPoint:
+    # the highest clock rate of the nodes
+    clock_rate: float
+    buildings: int
+    # the power draw of the consumers minus the production of the generators (MW)
+    power: float
+
+
+class PowerModel:
+    """The power of a list of nodes as a function of their counts and clock rates
+
+    The throughput of each node (its buildings at 100% clock rate) stays fixed, so that the same plan is evaluated
+    with its buildings split differently: since the power draw grows faster than the clock rate, more underclocked
+    buildings draw less power than fewer overclocked ones.
+    The per-node constants are computed once, so that evaluating many settings only costs a `pow` per node.
+    Modules (and other nodes without a producer of their own) only add their current power draw.
+    """
+    def __init__(self, nodes: [Node]):
+        self.fixed = 0
+        self.nodes = []
+        # per node: the power at 100% clock rate of a single building (negative for generators), the exponent
+        # of its power curve, the buildings at 100% clock rate, and the current count
+        self.base = []
+        self.exponents = []
+        self.buildings = []
+        self.counts = []
+
+        for node in nodes:
+            if node.is_module or node.is_dummy:
+                self.fixed += node.energy
+                continue
+
+            self.nodes.append(node)
+            producer = node.producer
+            # Note: the same formula as `Node.update`, so that the power of the nodes agrees after `apply`
+            _, _, energy = node_rates(producer, node.recipe, 1, 100, node.mk.value, node.purity.value, None, 0)
+            self.base.append(energy)
+            self.exponents.append(GENERATOR_EXPONENT if producer.is_pow_gen else POWER_EXPONENT)
+            self.buildings.append(node.count.value * node.clock_rate.value / 100)
+            self.counts.append(node.count.value)
+
+    @classmethod
+    def from_tree(cls, instance: NodeInstance):
+        return cls(flow_nodes(instance))
+
+    def power(self, counts: Optional[list[int]] = None) -> float:
+        """The power with the nodes split into `counts` buildings (by default their current counts)"""
+        counts = self.counts if counts is None else counts
+        power = self.fixed
+        for base, exponent, buildings, count in zip(self.base, self.exponents, self.buildings, counts):
+            if count:
+                power += base * count * math.pow(buildings / count, exponent)
+        return power
+
+    def split(self, clock_rate: float) -> list[int]:
+        """The fewest buildings of each node running at most at `clock_rate`"""
+        return [max(1, math.ceil(100 * buildings / clock_rate - 1e-9)) if buildings else 0
+                for buildings in self.buildings]
+
+    def sweep(self, clock_rates: [float] = SWEEP_CLOCK_RATES) -> [SweepPoint]:
+        """Evaluates the split of all nodes for each of the highest clock rates `clock_rates`
+
+        Batched over the nodes of each exponent: the power `base * count * (buildings / count) ** exponent` of a node
+        is split into the factor `base * buildings ** exponent` and `count ** (1 - exponent)`, which is taken from
+        a table shared by the nodes, so that evaluating a clock rate doesn't cost a `pow` per node.
+        """
+        clock_rates = list(clock_rates)
+        if not clock_rates:
+            return []
+
+        # exponent -> (the buildings of each node times 100, the factor of each node)
+        groups = {}
+        for base, exponent, buildings in zip(self.base, self.exponents, self.buildings):
+            if buildings:
+                hundreds, factors = groups.setdefault(exponent, ([], []))
+                hundreds.append(100 * buildings)
+                factors.append(base * math.pow(buildings, exponent))
+        # exponent -> `count ** (1 - exponent)` by count, up to the count at the lowest clock rate
+        tables = {}
+        for exponent, (hundreds, _) in groups.items():
+            most = math.ceil(max(hundreds) / min(clock_rates))
+            tables[exponent] = [0.0] + [math.pow(count, 1 - exponent) for count in range(1, most + 1)]
+
+        points = []
+        for clock_rate in clock_rates:
+            buildings = 0
+            power = self.fixed
+            for exponent, (hundreds, factors) in groups.items():
+                # Note: the same rounding as `split`
+                counts = [max(1, math.ceil(hundred / clock_rate - 1e-9)) for hundred in hundreds]
+                buildings += sum(counts)
+                power += sum(map(operator.mul, factors, map(tables[exponent].__getitem__, counts)))
+            points.append(SweepPoint(clock_rate, buildings, power))
+        return points
+
+    def best(self, max_buildings: Optional[int] = None, clock_rates: [float] = SWEEP_CLOCK_RATES) -> Optional[SweepPoint]:
+        """The split drawing the least power with at most `max_buildings` buildings, None if there is none"""
+        points = [point for point in self.sweep(clock_rates) if max_buildings is None or point.buildings <= max_buildings]
+        return min(points, key=lambda point: (point.power, point.buildings), default=None)
+
+    def apply(self, counts: list[int]):
+        """Sets the counts of the nodes, and their clock rates to keep their throughput"""
+        for node, buildings, count in zip(self.nodes, self.buildings, counts):
+            if not count:
+                continue
+            node.count.value = count
+            if not node.clamp:
+                node.clock_rate.value = ceil_clock_rate(buildings, count)
+            node.update()
+        self.counts = list(counts)
+
+
+def power_sweep(instance: NodeInstance, clock_rates: [float] = SWEEP_CLOCK_RATES) -> [SweepPoint]:
+    return PowerModel.from_tree(instance).sweep(clock_rates)
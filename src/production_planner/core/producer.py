@@ -31,7 +31,8 @@ class Producer:
         self.max_mk = max_mk
         self.base_power = base_power
         self.description = description
-        self.recipes = [Recipe(k, v[0], v[1], v[2]) for k, v in recipes.items()]
+        # Note: only the newer game data files carry the `is_alternate` flag
+        self.recipes = [Recipe.intern(Recipe(k, v[0], v[1], v[2], *v[3:4])) for k, v in recipes.items()]
 
     @property
     def recipes(self):
@@ -49,6 +50,9 @@ class Producer:
             if self.is_primary:
                 recipe.recipe_to_producer_map[recipe] = self
 
+    def has_recipe(self, recipe: Recipe) -> bool:
+        return self.recipe_map.get(recipe.name) == recipe
+
     def __str__(self):
         if self.is_abstract:
             return f"<{self.name}>"
@@ -123,6 +127,17 @@ SUMMARY_PRODUCER = Producer(
     description="",
 )
 
+ROLLUP_PRODUCER = Producer(
+    "Raw Resources",
+    is_abstract=False,
+    is_miner=False,
+    is_pow_gen=False,
+    max_mk=0,
+    base_power=0,
+    recipes={"":     [60, [], []], },
+    description="",
+)
+
 # FIXME: file structure ?
 from .module import MODULE_PRODUCER
 PRODUCERS += [MODULE_PRODUCER]
@@ -0,0 +1,121 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from .edit import ceil_clock_rate
+from .node import Node
+from .nodetree import (
+    NodeInstance,
+    SummaryNode,
+)
+
+import math
+from collections import deque
+
+
+PROPAGATE_EPSILON = 1e-9
+
+
+def flow_nodes(instance: NodeInstance) -> [Node]:
+    """The nodes whose ingredients add up to the summary of `instance`, with each module as a single node"""
+    nodes = []
+    for child in instance.node_children:
+        if isinstance(child.node_main, SummaryNode):
+            nodes += flow_nodes(child)
+        else:
+            nodes.append(child.node_main)
+    return nodes
+
+
+def is_adjustable(node: Node) -> bool:
+    return not (node.clamp or node.is_module or node.is_dummy)
+
+
+def scale_node(node: Node, factor: float):
+    """Scales the rates of `node` by `factor`
+
+    The clock rate is kept below the current one (or 100% if underclocked), more buildings are added instead.
+    """
+    buildings = node.count.value * node.clock_rate.value / 100 * factor
+    max_clock_rate = max(100, node.clock_rate.value)
+    count = node.count.value
+    if buildings * 100 > count * max_clock_rate + PROPAGATE_EPSILON:
+        count = math.ceil(buildings * 100 / max_clock_rate - PROPAGATE_EPSILON)
+    if count:
+        node.count.value = count
+        node.clock_rate.value = ceil_clock_rate(buildings, count)
+    node.update()
+
+
+def propagate_demand(instance: NodeInstance) -> [Node]:
+    """Pushes the rates of the clamped nodes below `instance` upstream, to the nodes producing their inputs
+
+    Starting from the clamped nodes, each node producing an input of an already settled node gets scaled to
+    produce exactly the (net) amount its consumers need, once all of them are settled. The nodes are visited
+    in topological order (from the consumers to the producers), so that each one is scaled once.
+    * several producers of an item split its demand by their current rates
+    * producers of several needed items (e.g. by-products) are scaled to the highest demand
+    * only the nodes upstream of a clamp change, recipe cycles (e.g. packaging) are left as they are
+
+    Returns the nodes which were scaled.
+    """
+    nodes = flow_nodes(instance)
+    consumers = {}
+    producers = {}
+    for node in nodes:
+        for item, quantity in node.ingredients.items():
+            if item == "+Power":
+                continue
+            if quantity < 0:
+                consumers.setdefault(item, []).append(node)
+            elif quantity > 0:
+                producers.setdefault(item, []).append(node)
+
+    def upstream(node: Node) -> [Node]:
+        return [producer
+                for item, quantity in node.ingredients.items() if quantity < 0
+                for producer in producers.get(item, []) if producer is not node and is_adjustable(producer)]
+
+    # the nodes upstream of a clamp, and how many of their consumers (upstream of a clamp themselves) are unsettled
+    unsettled = {}
+    pending = [node for node in nodes if node.clamp]
+    while pending:
+        for producer in upstream(pending.pop()):
+            if producer not in unsettled:
+                unsettled[producer] = 0
+                pending.append(producer)
+    for node in unsettled:
+        for producer in set(upstream(node)):
+            unsettled[producer] += 1
+
+    # item -> the producers sharing its demand, and the rate they produce in total before scaling
+    shares = {}
+    totals = {}
+    for node in unsettled:
+        for item, quantity in node.ingredients.items():
+            if quantity > 0 and item in consumers:
+                shares.setdefault(item, set()).add(node)
+                totals[item] = totals.get(item, 0) + quantity
+
+    scaled = []
+    ready = deque(node for node, count in unsettled.items() if not count)
+    while ready:
+        node = ready.popleft()
+        factor = 0
+        for item in list(node.ingredients):
+            if node not in shares.get(item, ()):
+                continue
+            needed = (-sum(consumer.ingredients[item] for consumer in consumers[item] if consumer is not node)
+                      - sum(producer.ingredients[item] for producer in producers[item] if producer not in shares[item]))
+            # the same factor for all producers of the item keeps their split
+            factor = max(factor, needed / totals[item])
+        scale_node(node, max(factor, 0))
+        scaled.append(node)
+
+        for producer in set(upstream(node)):
+            if producer in unsettled:
+                unsettled[producer] -= 1
+                if not unsettled[producer]:
+                    ready.append(producer)
+    return scaled
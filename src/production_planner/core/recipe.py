@@ -9,22 +9,19 @@ from typing import Self
 import yaml
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Ingredient:
     name: str
     count: int
 
     def __post_init__(self):
         if self.name == "Energy":
-            self.name = "+Power"
-            self.count /= 60
+            object.__setattr__(self, "name", "+Power")
+            object.__setattr__(self, "count", self.count / 60)
 
     def __str__(self):
         return f"({self.count}x {self.name})"
 
-    def __hash__(self):
-        return hash((self.name, self.count))
-
     def to_json_schema(self):
         return [self.count, self.name]
 
@@ -33,16 +30,57 @@ class Ingredient:
 
 
 class Recipe(yaml.YAMLObject):
+    """Immutable after construction, so that the hash and the identity key can be cached"""
     yaml_tag = u"!recipe"
 
     recipe_to_producer_map = {}
+    # id -> recipe, for all recipes loaded from the game data
+    interned = {}
 
     def __init__(self, name, cycle_rate, inputs: [(int, str)], outputs: [(int, str)], is_alternate=False):
         self.name = name
         self.cycle_rate = cycle_rate
-        self.inputs = list(Ingredient(name, count) for count, name in inputs)
-        self.outputs = list(Ingredient(name, count) for count, name in outputs)
+        self.inputs = tuple(Ingredient(name, count) for count, name in inputs)
+        self.outputs = tuple(Ingredient(name, count) for count, name in outputs)
         self.is_alternate = is_alternate
+        self._freeze()
+
+    def _freeze(self):
+        self.id = (self.name, self.cycle_rate, self.inputs, self.outputs)
+        self._hash = hash(self.id)
+
+    def __setattr__(self, name, value):
+        if "_hash" in self.__dict__:
+            raise AttributeError(f"Recipe is immutable, can't set `{name}`: {self}")
+        super().__setattr__(name, value)
+
+    def __getstate__(self):
+        return {
+            "name": self.name,
+            "cycle_rate": self.cycle_rate,
+            "inputs": list(self.inputs),
+            "outputs": list(self.outputs),
+            "is_alternate": self.is_alternate,
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__["inputs"] = tuple(self.inputs)
+        self.__dict__["outputs"] = tuple(self.outputs)
+        self.__dict__.setdefault("is_alternate", False)
+        self._freeze()
+
+    @classmethod
+    def intern(cls, recipe: Self) -> Self:
+        """Returns the canonical instance equal to `recipe`"""
+        return cls.interned.setdefault(recipe.id, recipe)
+
+    def renamed(self, name) -> Self:
+        return type(self)(name,
+                          self.cycle_rate,
+                          [(ingredient.count, ingredient.name) for ingredient in self.inputs],
+                          [(ingredient.count, ingredient.name) for ingredient in self.outputs],
+                          self.is_alternate)
 
     def __str__(self):
         return f"{self.name}/{self.cycle_rate} {', '.join(map(str, self.inputs))} <> {', '.join(map(str, self.outputs))}"
@@ -51,7 +89,9 @@ class Recipe(yaml.YAMLObject):
         return str(self)
 
     def __eq__(self, other):
-        return type(self) is type(other) and self.name == other.name and self.cycle_rate == other.cycle_rate and self.inputs == other.inputs and self.outputs == other.outputs
+        if self is other:
+            return True
+        return type(self) is type(other) and self._hash == other._hash and self.id == other.id
 
     @property
     def producer(self):
@@ -61,7 +101,7 @@ class Recipe(yaml.YAMLObject):
             raise ValueError(f"recipe not found in recipe_to_producer_map: {self}")
 
     def __hash__(self):
-        return hash((self.name, self.cycle_rate, tuple(self.inputs), tuple(self.outputs)))
+        return self._hash
 
     @classmethod
     def empty(cls, name=""):
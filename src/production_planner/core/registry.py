@@ -0,0 +1,87 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from .producer import (
+    Producer,
+    PRODUCERS,
+    PRODUCER_NAMES,
+    PRODUCER_MAP,
+    PRODUCER_ALIASES,
+    all_recipes_producer,
+)
+from .module import MODULE_PRODUCER
+from .rollup import ROLLUP
+from .chain import CHAIN_GENERATORS
+from .. import gamedata
+from ..gamedata import GameDataFileVersion
+
+import json
+from contextlib import contextmanager
+from typing import Optional
+
+
+class GameData:
+    """The producers of each game data version, loaded on first use and kept to switch back and forth
+
+    The active version is published through `PRODUCERS`, `PRODUCER_NAMES` and `PRODUCER_MAP`,
+    which are updated in place, since they are imported by name throughout the app.
+    """
+    def __init__(self):
+        self.version: Optional[GameDataFileVersion] = None
+        # fpath -> [Producer]
+        self.loaded = {}
+        # Note: keeps its identity across versions, only its recipes are replaced
+        self.all_recipes_producer = all_recipes_producer()
+
+    def producers(self, version: GameDataFileVersion) -> [Producer]:
+        fpath = str(version.fpath)
+        if fpath not in self.loaded:
+            with open(fpath) as fp:
+                data = json.load(fp)
+            self.loaded[fpath] = [Producer(k, **v) for k, v in data.items()]
+        return self.loaded[fpath]
+
+    def activate(self, version: Optional[GameDataFileVersion] = None) -> Optional[GameDataFileVersion]:
+        """Makes `version` (by default the latest) the current game data and returns the previously active one"""
+        version = version or gamedata.get()
+        producers = self.producers(version)
+
+        PRODUCERS[:] = [MODULE_PRODUCER] + producers
+        PRODUCER_NAMES[:] = [prod.name for prod in PRODUCERS]
+        # the interned recipes are shared between versions, point them back to the producers of this one
+        for prod in producers:
+            prod.update_recipe_map()
+        self.all_recipes_producer.recipes = all_recipes_producer().recipes
+        ROLLUP.reset()
+        for generator in CHAIN_GENERATORS.values():
+            generator.reset()
+
+        PRODUCER_MAP.clear()
+        PRODUCER_MAP.update({p.name: p for p in ([self.all_recipes_producer] + PRODUCERS)})
+        PRODUCER_MAP["Blueprint"] = PRODUCER_MAP["Module"]
+
+        for name, aliases in PRODUCER_ALIASES.items():
+            if name in PRODUCER_MAP:
+                for alias in aliases:
+                    PRODUCER_MAP[alias] = PRODUCER_MAP[name]
+
+        previous, self.version = self.version, version
+        return previous
+
+    @contextmanager
+    def using(self, version: GameDataFileVersion):
+        """Temporarily activates another version, e.g. to evaluate a plan against it
+
+        Note: nodes keep the producers they were created with, so plans need to be parsed inside of the context.
+        """
+        previous = self.activate(version)
+        try:
+            yield self
+        finally:
+            if previous is not None:
+                self.activate(previous)
+
+
+GAME_DATA = GameData()
@@ -0,0 +1,135 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from .link import CONFIG
+from .recipe import Recipe
+from .producer import PRODUCERS
+
+from typing import Optional
+
+
+ROLLUP_EPSILON = 1e-9
+
+
+class Rollup:
+    """Resolves net ingredient flows down to raw resources
+
+    Each missing item is produced through a default recipe, whose inputs are resolved in turn until only raw
+    resources (the outputs of recipes without inputs, e.g. of miners and extractors) are left.
+    By-products of the default recipes aren't credited.
+
+    The expansion of each item into raw resources per unit is memoized, so that rolling up many nodes or plans
+    only costs a lookup per distinct item. `reset` has to be called when the producers change (see `GameData.activate`).
+    """
+    def __init__(self, default_recipes: Optional[dict[str, str]] = None):
+        # item -> recipe name, overriding the automatically chosen default recipes (by default from the config)
+        self.default_recipes = default_recipes
+        self.reset()
+
+    def reset(self):
+        self.raw = set()
+        # item -> [Recipe] producing it
+        self.producing = {}
+        # item -> {raw item: amount per unit of item}
+        self.expansions = {}
+
+        for producer in PRODUCERS:
+            if producer.is_abstract or producer.is_module or not producer.is_primary:
+                continue
+            for recipe in producer.recipes:
+                for ingredient in recipe.outputs:
+                    if not recipe.inputs:
+                        self.raw.add(ingredient.name)
+                    self.producing.setdefault(ingredient.name, []).append(recipe)
+        self.raw.discard("+Power")
+
+    def configured_recipe(self, item: str) -> Optional[Recipe]:
+        default_recipes = self.default_recipes
+        if default_recipes is None:
+            default_recipes = CONFIG.store["rollup"]["default_recipes"]
+        for recipe in self.producing.get(item, []):
+            if recipe.inputs and recipe.name == default_recipes.get(item):
+                return recipe
+        return None
+
+    def default_recipe(self, item: str) -> Optional[Recipe]:
+        configured = self.configured_recipe(item)
+        if configured is not None:
+            return configured
+
+        recipes = [recipe for recipe in self.producing.get(item, []) if recipe.inputs]
+
+        def rank(recipe):
+            return (recipe.name != item,
+                    recipe.is_alternate or recipe.name.startswith("Alternate: "),
+                    recipe.outputs[0].name != item,
+                    len(recipe.inputs),
+                    recipe.name)
+        return min(recipes, key=rank, default=None)
+
+    def expansion(self, item: str) -> dict[str, float]:
+        """The raw resources needed for one unit of `item`
+
+        Items which can't be resolved (no recipe, or a recipe cycle) are kept as they are.
+        """
+        return self._expand(item, set())[0]
+
+    def _expand(self, item: str, resolving: set) -> (dict[str, float], bool):
+        if item in self.expansions:
+            return (self.expansions[item], True)
+        if item in resolving:
+            return ({item: 1}, False)
+
+        recipe = None if item in self.raw else self.default_recipe(item)
+        if recipe is None:
+            return ({item: 1}, True)
+
+        resolving.add(item)
+        complete = True
+        produced = sum(ingredient.count for ingredient in recipe.outputs if ingredient.name == item)
+        expansion = {}
+        for ingredient in recipe.inputs:
+            ingredient_expansion, ingredient_complete = self._expand(ingredient.name, resolving)
+            complete &= ingredient_complete
+            for raw_item, amount in ingredient_expansion.items():
+                expansion[raw_item] = expansion.get(raw_item, 0) + amount * ingredient.count / produced
+        resolving.discard(item)
+
+        # Note: expansions cut short by a cycle depend on where the cycle was entered, so only complete ones are kept
+        if complete:
+            self.expansions[item] = expansion
+        return (expansion, complete)
+
+    def resolve(self, ingredients: dict[str, float]) -> dict[str, float]:
+        """Replaces the deficits (negative quantities) of `ingredients` with the raw resources they need"""
+        resolved = {}
+        for item, quantity in ingredients.items():
+            if quantity < 0 and item not in self.raw:
+                for raw_item, amount in self.expansion(item).items():
+                    resolved[raw_item] = resolved.get(raw_item, 0) + quantity * amount
+            else:
+                resolved[item] = resolved.get(item, 0) + quantity
+        # Note: balanced items rarely end up at exactly 0 after the divisions of the expansions
+        return {item: quantity for item, quantity in resolved.items() if abs(quantity) > ROLLUP_EPSILON}
+
+
+ROLLUP = Rollup()
+
+
+def raw_resources(nodes) -> dict[str, float]:
+    """The net raw resources of a `NodeTree` or of a list of `Node`s
+
+    Usable without the app, e.g. `raw_resources(io.parse_yaml(raw))` for a saved plan.
+    """
+    from .nodetree import NodeTree
+    if isinstance(nodes, NodeTree):
+        nodes.update_summaries()
+        ingredients = nodes.node_main.ingredients
+    else:
+        ingredients = {}
+        for node in nodes:
+            for item, quantity in node.ingredients.items():
+                ingredients[item] = ingredients.get(item, 0) + quantity
+    return ROLLUP.resolve(ingredients)
@@ -0,0 +1,120 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Timing spans around the hot paths of a session
+
+Disabled by default, where a span costs an attribute check. Once enabled (e.g. with `--profile=<fpath>`),
+the durations are aggregated per span name into a histogram, which `Spans.dump` appends to a json-lines file.
+"""
+
+import json
+import time
+import threading
+from contextlib import nullcontext
+from functools import wraps
+from pathlib import Path
+
+
+NULL_SPAN = nullcontext()
+
+
+class SpanStats:
+    """The durations of a span, with a histogram of power of two buckets (in microseconds)"""
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        # bit length of the duration in microseconds -> count
+        self.buckets = {}
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total += duration
+        self.min = duration if self.min is None else min(self.min, duration)
+        self.max = max(self.max, duration)
+        bucket = int(duration * 1e6).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1e3,
+            "mean_ms": self.total * 1e3 / self.count if self.count else 0,
+            "min_ms": (self.min or 0) * 1e3,
+            "max_ms": self.max * 1e3,
+            "histogram_us": {f"<{1 << bucket}": count for bucket, count in sorted(self.buckets.items())},
+        }
+
+
+class Span:
+    __slots__ = ("spans", "name", "start")
+
+    def __init__(self, spans, name: str):
+        self.spans = spans
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.spans.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Spans:
+    def __init__(self):
+        self.enabled = False
+        self.stats = {}
+        # Note: the autosave worker thread saves and checks the sinks concurrently to the app
+        self.lock = threading.Lock()
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+    def record(self, name: str, duration: float):
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = SpanStats()
+            stats.add(duration)
+
+    def span(self, name: str):
+        """A context manager timing its block as `name`"""
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def timed(self, name: str):
+        """A decorator timing each call of the function as `name`"""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def dump(self, fpath: Path):
+        """Appends a line per span to the json-lines file `fpath`"""
+        with self.lock:
+            stats = dict(self.stats)
+        timestamp = time.time()
+        with open(fpath, "a") as fp:
+            for name, span_stats in sorted(stats.items()):
+                fp.write(json.dumps({"time": timestamp, "span": name, **span_stats.as_dict()}) + "\n")
+
+
+SPANS = Spans()
@@ -9,12 +9,20 @@ from .core import (
     Node,
 )
 from .core import (
+    CONFIG,
     DataFile,
     ModuleFile,
     Node,
     SummaryNode,
+    RollupNode,
     NodeInstance,
-    NodeTree
+    NodeTree,
+    generate_chain,
+    optimize,
+    insert_tree,
+    balance_buildings,
+    propagate_demand,
+    SPANS,
 )
 from .cells import (
     Cell,
@@ -35,14 +43,14 @@ from .screens import (
     SaveDataFile
 )
 
-from .dataview import DataView
-
 import os
+import asyncio
 from dataclasses import dataclass
 from pathlib import Path
 from copy import copy
 from functools import partial
 from typing import (
+    Callable,
     Optional,
     Tuple
 )
@@ -54,6 +62,7 @@ from textual.screen import ModalScreen
 from textual.app import ComposeResult
 from textual.binding import Binding
 from textual import events
+from textual import work
 
 from rich.style import Style
 from rich.color import Color
@@ -171,6 +180,7 @@ class PlannerTable(DataTable):
         self.app.focused_table = self
 
     def action_dataview(self):
+        from .dataview import DataView
         self.app.push_screen(DataView(self))
 
     def action_table(self):
@@ -181,6 +191,10 @@ class PlannerTable(DataTable):
         self.app.push_screen(self.ActionSelector(self, [Binding("s", self.action_save, "Save"),
                                                         Binding("l", self.action_load, "Load"),
                                                         Binding("d", self.action_delete, "Delete"),
+                                                        Binding("g", self.action_generate_chain, "Generate Chain"),
+                                                        Binding("o", self.action_optimize_chain, "Optimize Chain"),
+                                                        Binding("b", self.action_balance_buildings, "Balance Buildings"),
+                                                        Binding("p", self.action_propagate_demand, "Propagate Demand"),
                              ]),
         run)
 
@@ -272,12 +286,40 @@ class PlannerTable(DataTable):
     def apply_data(self, tree: NodeTree | None):
         if tree is not None:
             self.nodetree = tree
-            if self.sink.sink.target:
-                modulefile = ModuleFile(self.sink.sink.target.linkpath)
-                MODULE_PRODUCER.update_module(modulefile)
-                self.nodetree.reload_modules(module_stack=[modulefile.id])
+            # Note: untitled plans have no file of their own, which their modules could include
+            modulefile = ModuleFile(self.sink.sink.target.linkpath) if self.sink.sink.target else None
+            if self.is_attached:
+                self.resolve_modules(tree, modulefile)
+            else:
+                if modulefile is not None:
+                    MODULE_PRODUCER.update_module(modulefile)
+                self.nodetree.reload_modules(module_stack=[modulefile.id] if modulefile is not None else [])
             self.update()
 
+    @work(exclusive=True, group="modules")
+    async def resolve_modules(self, tree: NodeTree, modulefile: Optional[ModuleFile]):
+        """Resolves the modules of a freshly loaded tree without blocking the event loop
+
+        The tree is shown right away with its modules as placeholders, which get filled in one level at a time.
+        The yaml documents are composed in a thread, only the construction of the trees happens on the event loop.
+        Loading another file cancels the worker (`exclusive`).
+        """
+        try:
+            module_stack = []
+            if modulefile is not None:
+                await asyncio.to_thread(MODULE_PRODUCER.prefetch_modules, [modulefile], True)
+                MODULE_PRODUCER.update_module(modulefile)
+                module_stack.append(modulefile.id)
+            for module_files in tree.iter_reload_modules(module_stack=module_stack):
+                await asyncio.to_thread(MODULE_PRODUCER.prefetch_modules, module_files, True)
+                if tree is self.nodetree:
+                    self.update(SelectionContext(self))
+        finally:
+            MODULE_PRODUCER.clear_prefetched()
+
+        if tree is self.nodetree:
+            self.update(SelectionContext(self))
+
     def action_delete(self):
         def delete_file(subpath: Path) -> None:
             if not subpath:
@@ -296,6 +338,61 @@ class PlannerTable(DataTable):
             self.app.title = self.sink.title
         self.app.push_screen(SelectDataFile(), delete_file)
 
+    def action_generate_chain(self):
+        """Inserts the production chain of the ingredient under the cursor (see `core.ChainGenerator`)"""
+        self.insert_chain(lambda item, rate: generate_chain(item, rate, CONFIG.store["chain"]["allow_alternates"]))
+
+    def action_optimize_chain(self):
+        """Like `action_generate_chain`, but with the mix of recipes chosen by `core.RecipeOptimizer`"""
+        config = CONFIG.store["optimize"]
+        self.insert_chain(lambda item, rate: optimize({item: rate}, config["weights"], config["allow_alternates"]))
+
+    def insert_chain(self, generate: Callable[[str, float], NodeTree]):
+        """Inserts the tree generated for the ingredient under the cursor
+
+        Produces the deficit of the plan if there is one, otherwise the rate shown in the cell.
+        """
+        selected = SelectionContext(self)
+        if selected.instance is None or len(self.planner_columns) <= selected.col \
+                or not issubclass(self.planner_columns[selected.col], IngredientCell):
+            self.notify("Select an ingredient column to generate its production chain", severity="warning")
+            return
+
+        item = self.planner_columns[selected.col].name
+        deficit = -self.nodetree.node_main.ingredients.get(item, 0)
+        rate = deficit if deficit > 0 else abs(selected.instance.node_main.ingredients.get(item, 0)) or 60
+        instances = insert_tree(self.nodetree,
+                                generate(item, rate),
+                                # the summary rows have no parent, their chains are appended
+                                after=selected.instance if selected.instance.parent else None)
+        selected.reselection = Reselection(at_node=True, node=instances[0] if instances else None)
+        self.update(selected)
+
+    def action_balance_buildings(self):
+        """Sets the counts and clock rates of all nodes to the fewest buildings (see `core.solve_counts`)"""
+        shards = self.balance_buildings()
+        self.notify(f"Buildings balanced, power shards used: {shards}", timeout=5)
+        self.update(SelectionContext(self))
+
+    def balance_buildings(self) -> int:
+        config = CONFIG.store["balance"]
+        return balance_buildings(self.nodetree, config["max_shards"], config["shard_cost"])
+
+    def action_propagate_demand(self):
+        """Scales the nodes upstream of the clamped ones to the rates they need (see `core.propagate_demand`)"""
+        scaled = propagate_demand(self.nodetree)
+        self.notify(f"Nodes scaled: {len(scaled)}", timeout=5)
+        self.update(SelectionContext(self))
+
+    def on_clamp_edit(self, col: Cell):
+        """Propagates and rebalances after a target (clamp) changed, if enabled in the config"""
+        if not isinstance(col, IngredientCell):
+            return
+        if CONFIG.store["propagate"]["auto_propagate"]:
+            propagate_demand(self.nodetree)
+        if CONFIG.store["balance"]["auto_balance"]:
+            self.balance_buildings()
+
     def action_show_hide(self):
         self.num_write_mode = False
         selected = SelectionContext(self, None, Reselection(offset=1))
@@ -391,11 +488,10 @@ class PlannerTable(DataTable):
         self.update(selected)
 
     def action_row_remove(self):
-        row = SelectionContext(self).row
         selected = SelectionContext(self, None, Reselection(offset=0))
         if not selected:
             return
-        del self.nodetree[row]
+        del self.nodetree[selected.row]
         self.update(selected)
 
     def maybe_dirtied(self):
@@ -403,24 +499,28 @@ class PlannerTable(DataTable):
             self.app.title = self.sink.title
             self.app.hidden_item_count = self.nodetree.count_hidden_items()
 
+    def selected_cell(self, sel_ctxt: SelectionContext) -> Optional[Cell]:
+        """Returns the editable cell under the cursor of `sel_ctxt` or None"""
+        if sel_ctxt.instance is None or len(self.planner_columns) <= sel_ctxt.col:
+            return None
+
+        Column = self.planner_columns[sel_ctxt.col]
+        if Column.read_only:
+            return None
+
+        cell = Column(sel_ctxt.instance)
+        return cell if cell.access_guard() else None
+
     def _offset_cell(self, offset: int):
         self.num_write_mode = False
         sel_ctxt = SelectionContext(self)
 
-        if len(self.planner_columns) > sel_ctxt.col:
-            col = self.planner_columns[sel_ctxt.col]
-        else:
-            col = None
-
-        instance = sel_ctxt.instance
-        if instance is None:
-            return
-
-        if (col is None) or (not col(instance).access_guard() or col.read_only):
+        col = self.selected_cell(sel_ctxt)
+        if col is None:
             return
 
-        col = col(instance)
         col.edit_offset(offset)
+        self.on_clamp_edit(col)
         self.update(sel_ctxt)
 
     def action_decrement(self):
@@ -434,21 +534,14 @@ class PlannerTable(DataTable):
             return
 
         sel_ctxt = SelectionContext(self)
-
-        if len(self.planner_columns) > sel_ctxt.col:
-            col = self.planner_columns[sel_ctxt.col]
-        else:
-            col = None
-
-        instance = sel_ctxt.instance
-        if instance is None:
+        if sel_ctxt.instance is None:
             return
 
-        if (col is None) or (not col(instance).access_guard() or col.read_only):
+        col = self.selected_cell(sel_ctxt)
+        if col is None:
             self.num_write_mode = False
             return
 
-        col = col(instance)
         match event.key:
             case "delete":
                 self.num_write_mode = col.edit_delete()
@@ -463,6 +556,7 @@ class PlannerTable(DataTable):
             case _:
                 self.num_write_mode = False
                 return
+        self.on_clamp_edit(col)
         self.update(sel_ctxt)
 
     def on_data_table_cell_highlighted(self, event):
@@ -481,6 +575,10 @@ class PlannerTable(DataTable):
 
         for node_instance in nodes:
             node = node_instance.node_main
+            if isinstance(node, RollupNode):
+                # the raw resources aren't necessarily used by any node
+                inputs_mixed |= set(i.name for i in node.recipe.inputs)
+                outputs_mixed |= set(o.name for o in node.recipe.outputs)
             if isinstance(node, SummaryNode):
                 continue
             inputs_mixed |= set(i.name for i in node.recipe.inputs)
@@ -540,19 +638,50 @@ class PlannerTable(DataTable):
                     row_highlight += [style_empty]
             self.highlight_cols += [row_highlight]
 
+    @SPANS.timed("table.update")
     def update(self, selected: SelectionContext = None):
         self.maybe_dirtied()
         instance = selected.instance if selected else None
 
-        nodes, ingredients = self.update_columns(instance)
+        with SPANS.span("table.update.columns"):
+            nodes, ingredients = self.update_columns(instance)
 
-        rows = []
+        with SPANS.span("table.update.nodes"):
+            self.update_nodes(nodes)
+
+        with SPANS.span("table.update.rows"):
+            rows = self.create_rows(nodes, ingredients)
+
+        with SPANS.span("table.update.highlight"):
+            self._update_highlight_info(rows)
+
+        with SPANS.span("table.update.styling"):
+            rows = [[cell.get_styled() for cell in row] for row in rows]
+
+        with SPANS.span("table.update.add_rows"):
+            self.clear(columns=True)
+            self.add_columns(*(ingredients.name for ingredients in self.planner_columns))
+            self.fixed_columns = 3
+            self.add_rows(rows)
+        if selected:
+            selected.reselect()
+
+    def update_nodes(self, nodes: [NodeInstance]):
         for node_instance in nodes:
+            # Note: module trees are shared between their instances and already up to date
+            if node_instance.from_module:
+                continue
             node = node_instance.node_main
-            node.update()
-            is_summary = isinstance(node, SummaryNode)
-            if is_summary:
-                node.update_summary(inst.node_main for inst in node_instance.node_children)
+            if isinstance(node, SummaryNode):
+                node.update_summary([inst.node_main for inst in node_instance.node_children])
+            else:
+                node.update()
+
+    def create_rows(self, nodes: [NodeInstance], ingredients: [str]) -> [[Cell]]:
+        """Creates the cells of the rows of the (already updated) nodes"""
+        rows = []
+        for node_instance in nodes:
+            is_summary = isinstance(node_instance.node_main, SummaryNode)
             row = [Column(node_instance) for Column in self.edit_columns]
 
             for ingredient in ingredients:
@@ -562,17 +691,7 @@ class PlannerTable(DataTable):
 
                 row += [Cell(node_instance, ingredient)]
             rows += [row]
-
-        self._update_highlight_info(rows)
-
-        rows = [[cell.get_styled() for cell in row] for row in rows]
-
-        self.clear(columns=True)
-        self.add_columns(*(ingredients.name for ingredients in self.planner_columns))
-        self.fixed_columns = 3
-        self.add_rows(rows)
-        if selected:
-            selected.reselect()
+        return rows
 
     def _render_cell(
         self,
@@ -4,9 +4,21 @@
 #  License, v. 2.0. If a copy of the MPL was not distributed with this
 #  file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-from io import StringIO
-from difflib import unified_diff
+from .core import (
+    NodeInstance,
+    NodeTree,
+    SummaryNode,
+)
+
+import asyncio
+import weakref
+from difflib import SequenceMatcher
+from typing import (
+    Iterator,
+    Optional,
+)
 
+from textual import work
 from textual.screen import Screen
 from textual.containers import Horizontal, Vertical
 from textual.widgets import (
@@ -19,6 +31,171 @@ from textual.app import ComposeResult
 import yaml
 
 
+def instance_key(instance: NodeInstance) -> tuple:
+    """The fields of the subtree of `instance` which end up in its dump (see `core.marshal`)"""
+    children = tuple(instance_key(child) for child in instance.node_children)
+    if isinstance(instance, NodeTree):
+        return ("!tree", children)
+    node = instance.node_main
+    if isinstance(node, SummaryNode):
+        # dumped with its whole recipe, never equal so that it's always dumped again
+        return (object(),)
+    clamp = (node.clamp.value.name, node.clamp.value.count) if node.clamp else None
+    return (node.producer.name,
+            node.recipe.name,
+            node.count.value,
+            node.clock_rate.value,
+            node.mk.value,
+            node.purity.value,
+            clamp,
+            instance.shown,
+            instance.expanded,
+            children)
+
+
+class StructuralMatcher(SequenceMatcher):
+    """Matches the lines of two tree dumps by comparing the keys of their top-level nodes first
+
+    Only the runs of top-level nodes which changed are compared line by line,
+    so that the cost of the diff scales with the size of the change instead of the size of the tree.
+    """
+    def __init__(self, a: [(tuple, [str])], b: [(tuple, [str])]):
+        super().__init__(None,
+                         [line for _, lines in a for line in lines],
+                         [line for _, lines in b for line in lines],
+                         autojunk=False)
+        self.opcodes = self.structural_opcodes(a, b)
+
+    def structural_opcodes(self, a: [(tuple, [str])], b: [(tuple, [str])]):
+        a_offsets = [0]
+        for _, lines in a:
+            a_offsets += [a_offsets[-1] + len(lines)]
+        b_offsets = [0]
+        for _, lines in b:
+            b_offsets += [b_offsets[-1] + len(lines)]
+
+        opcodes = []
+
+        def add(tag, i1, i2, j1, j2):
+            if opcodes and opcodes[-1][0] == tag == "equal":
+                opcodes[-1] = (tag, opcodes[-1][1], i2, opcodes[-1][3], j2)
+            elif i1 != i2 or j1 != j2:
+                opcodes.append((tag, i1, i2, j1, j2))
+
+        blocks = SequenceMatcher(None, [key for key, _ in a], [key for key, _ in b], autojunk=False)
+        for tag, i1, i2, j1, j2 in blocks.get_opcodes():
+            i1, i2, j1, j2 = a_offsets[i1], a_offsets[i2], b_offsets[j1], b_offsets[j2]
+            if tag == "replace":
+                lines = SequenceMatcher(None, self.a[i1:i2], self.b[j1:j2], autojunk=False)
+                for line_tag, k1, k2, l1, l2 in lines.get_opcodes():
+                    add(line_tag, i1 + k1, i1 + k2, j1 + l1, j1 + l2)
+            else:
+                add(tag, i1, i2, j1, j2)
+        return opcodes
+
+
+def format_range(start, stop) -> str:
+    # same as the ranges of `difflib.unified_diff`
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def unified_tree_diff(old: [(tuple, [str])], new: [(tuple, [str])], fromfile="", tofile="", n=3) -> Iterator[str]:
+    """Like `difflib.unified_diff` of two tree dumps split into their nodes (see `TreeDiff.blocks`),
+    but yields the hunks lazily from a `StructuralMatcher`"""
+    if [key for key, _ in old] == [key for key, _ in new]:
+        return
+
+    matcher = StructuralMatcher(old, new)
+    a, b = matcher.a, matcher.b
+    started = False
+    for group in matcher.get_grouped_opcodes(n):
+        if not started:
+            started = True
+            yield f"--- {fromfile}\n"
+            yield f"+++ {tofile}\n"
+        first, last = group[0], group[-1]
+        hunk = [f"@@ -{format_range(first[1], last[2])} +{format_range(first[3], last[4])} @@\n"]
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                hunk += [" " + line for line in a[i1:i2]]
+                continue
+            if tag in ("replace", "delete"):
+                hunk += ["-" + line for line in a[i1:i2]]
+            if tag in ("replace", "insert"):
+                hunk += ["+" + line for line in b[j1:j2]]
+        yield "".join(hunk)
+
+
+class TreeDiff:
+    """The diff of the saved tree of a table to its tree in the session, cached until either of them changes
+
+    The dumps of the top-level nodes are cached by their keys (see `instance_key`),
+    so that only the nodes which changed since are dumped again.
+    """
+    fromfile = "sink.yaml"
+    tofile = "staging.yaml"
+
+    def __init__(self):
+        # key of a top-level node -> the lines of its dump
+        self.dumps = {}
+        self.keys = None
+        self.session = ""
+        self.hunks = []
+        self.pending = iter(())
+
+    def blocks(self, tree: Optional[NodeTree]) -> [(tuple, [str])]:
+        """The lines of the dump of `tree` by its top-level nodes, the same as `yaml.dump(tree)` split up"""
+        if tree is None:
+            return []
+        if not tree.node_children:
+            return [(("!tree []",), ["!tree []\n"])]
+        blocks = [(("!tree",), ["!tree\n"])]
+        for child in tree.node_children:
+            key = instance_key(child)
+            lines = self.dumps.get(key)
+            if lines is None:
+                lines = yaml.dump([child]).splitlines(keepends=True)
+                self.dumps[key] = lines
+            blocks += [(key, lines)]
+        return blocks
+
+    def update(self, saved: Optional[NodeTree], session: NodeTree):
+        """Compares the trees, the hunks are only computed again (lazily, see `diff`) if either tree changed"""
+        old = self.blocks(saved)
+        new = self.blocks(session)
+        self.session = "".join(line for _, lines in new for line in lines)
+
+        keys = ([key for key, _ in old], [key for key, _ in new])
+        if keys != self.keys:
+            self.keys = keys
+            self.hunks = []
+            self.pending = unified_tree_diff(old, new, fromfile=self.fromfile, tofile=self.tofile)
+            # only the dumps of the current trees are kept
+            self.dumps = {key: lines for key, lines in old + new if key in self.dumps}
+
+    def diff(self) -> Iterator[str]:
+        """The lines of the diff headers and the hunks, computed on demand and kept for the next time"""
+        idx = 0
+        while True:
+            if idx == len(self.hunks):
+                hunk = next(self.pending, None)
+                if hunk is None:
+                    return
+                self.hunks += [hunk]
+            yield self.hunks[idx]
+            idx += 1
+
+
+# table -> its `TreeDiff`, which outlives the `DataView` screens opened on the table
+TREE_DIFFS = weakref.WeakKeyDictionary()
+
+
 class YamlEditor(TextArea):
     ...
 
@@ -35,26 +212,34 @@ class DataView(Screen):
 
     def __init__(self, table, *args, **kwargs):
         self.table = table
+        self.tree_diff = TREE_DIFFS.get(table)
+        if self.tree_diff is None:
+            self.tree_diff = TREE_DIFFS[table] = TreeDiff()
         super().__init__(*args, **kwargs)
 
     def compose(self) -> ComposeResult:
+        self.tree_diff.update(self.table.sink.sink._data, self.table.nodetree)
         with Horizontal():
             with Vertical():
                 yield Label("File in session")
                 # FIXME: when `editor.read_only == False` then the `escape` > `action_cancel` binding doesn't work anymore
-                new = yaml.dump(self.table.nodetree)
-                yield YamlEditor.code_editor(new, language="yaml", read_only=True)
+                yield YamlEditor.code_editor(self.tree_diff.session, language="yaml", read_only=True)
 
             with Vertical():
-                old = yaml.dump(self.table.sink.sink._data)
-                diff = StringIO()
-                diff.writelines(unified_diff(old.splitlines(keepends=True),
-                                             new.splitlines(keepends=True),
-                                             fromfile="sink.yaml",
-                                             tofile="staging.yaml"))
                 yield Label("Difference to saved file")
-                yield DiffEditor.code_editor(diff.getvalue(), language="yaml", read_only=True)
+                yield DiffEditor.code_editor("", language="yaml", read_only=True)
         yield Footer()
 
+    def on_mount(self):
+        self.show_diff()
+
+    @work(exclusive=True, group="diff")
+    async def show_diff(self):
+        """Appends the hunks one after another, so that the view doesn't wait for the whole diff"""
+        editor = self.query_one(DiffEditor)
+        for hunk in self.tree_diff.diff():
+            editor.insert(hunk, editor.document.end)
+            await asyncio.sleep(0)
+
     def action_cancel(self):
         self.dismiss("")
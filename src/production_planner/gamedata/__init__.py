@@ -38,9 +38,6 @@ class GameDataFileVersion:
 
     file_versions: ClassVar = []
 
-    def __post_init__(self):
-        self.file_versions += [self]
-
     def __index__(self, idx):
         return GameDataVersionFilter(self)[idx]
 
@@ -51,7 +48,7 @@ class GameDataVersionFilter:
         self.version_sequence = []
 
     def __getitem__(self, idx):
-        self.version_sequence = [(self._version_names.pop(), idx)]
+        self.version_sequence += [(self._version_names.pop(), idx)]
         return self
 
     def get(self, pool=None, selected=None) -> [GameDataFileVersion]:
@@ -95,24 +92,33 @@ class GameDataVersionFilter:
                 return version
 
 
-def get(major=None, minor=None, patch=None, postfix=None, build=None) -> GameDataFileVersion:
-    from production_planner.core import CONFIG
+def scan_versions(rescan=False) -> [GameDataFileVersion]:
+    """Lists the bundled game data files, the folder is only scanned once unless `rescan` is set"""
+    if GameDataFileVersion.file_versions and not rescan:
+        return GameDataFileVersion.file_versions
 
     re_parse_fname = re.compile("production_buildings_v(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)\.(?P<postfix>\d+)_(?P<build>\d+).json")
 
+    versions = []
     dpath = os.path.split(os.path.abspath(__file__))[0]
     for entry in os.scandir(dpath):
         match = re_parse_fname.match(entry.name)
         if entry.is_file() and match:
-            GameDataFileVersion(entry.path,
-                                int(match.group("major")),
-                                int(match.group("minor")),
-                                int(match.group("patch")),
-                                int(match.group("postfix")),
-                                int(match.group("build")))
+            versions += [GameDataFileVersion(entry.path,
+                                             int(match.group("major")),
+                                             int(match.group("minor")),
+                                             int(match.group("patch")),
+                                             int(match.group("postfix")),
+                                             int(match.group("build")))]
+    # Note: replaced in place, `GameDataVersionFilter` refers to the class attribute
+    GameDataFileVersion.file_versions[:] = versions
+    return GameDataFileVersion.file_versions
+
+
+def get(major=None, minor=None, patch=None, postfix=None, build=None) -> GameDataFileVersion:
+    scan_versions()
     if build:
-        version = GameDataVersionFilter.get_build(build)
-        return Path(version.fpath)
+        return GameDataVersionFilter.get_build(build)
     else:
         filt = GameDataVersionFilter()
         for v in [major, minor, patch, postfix]:
@@ -0,0 +1,223 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Differences between two `production_buildings_v*.json` files
+
+Works on the raw json data only, so that it can be used without loading `production_planner.core`
+(e.g. by the worker processes of `migrate.migrate_plans`).
+"""
+
+import re
+import json
+from pathlib import Path
+from difflib import SequenceMatcher
+from dataclasses import (
+    dataclass,
+    field,
+)
+from typing import Optional
+
+
+# recipes whose names are at least this similar are taken as renamed
+RENAME_MIN_RATIO = 0.9
+# ... or at least this similar, if they also share an output or one name contains the other
+RENAME_MIN_RATIO_RELATED = 0.6
+# producers sharing at least this fraction of their recipe names are taken as renamed
+PRODUCER_RENAME_MIN_SHARED = 0.5
+
+
+def normalized_name(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def recipe_key(data: list) -> tuple:
+    # Note: the newer files also carry the `is_alternate` flag as fourth element, which isn't compared
+    cycle_rate, inputs, outputs = data[:3]
+    return (cycle_rate, [list(i) for i in inputs], [list(o) for o in outputs])
+
+
+def output_names(data: list) -> set[str]:
+    return {name for _, name in data[2]}
+
+
+@dataclass
+class RecipeChange:
+    """`(before, after)` of each part of a recipe which changed, otherwise `None`"""
+    cycle_rate: Optional[tuple] = None
+    inputs: Optional[tuple] = None
+    outputs: Optional[tuple] = None
+
+    @classmethod
+    def between(cls, old: list, new: list) -> Optional["RecipeChange"]:
+        old_cycle, old_inputs, old_outputs = recipe_key(old)
+        new_cycle, new_inputs, new_outputs = recipe_key(new)
+        change = cls(cycle_rate = (old_cycle, new_cycle) if old_cycle != new_cycle else None,
+                     inputs     = (old_inputs, new_inputs) if old_inputs != new_inputs else None,
+                     outputs    = (old_outputs, new_outputs) if old_outputs != new_outputs else None)
+        return change if change != cls() else None
+
+
+@dataclass
+class GameDataDiff:
+    added_producers: list[str] = field(default_factory=list)
+    removed_producers: list[str] = field(default_factory=list)
+    # old name -> new name
+    renamed_producers: dict[str, str] = field(default_factory=dict)
+    # producer (new name) -> recipe names
+    added_recipes: dict[str, list[str]] = field(default_factory=dict)
+    removed_recipes: dict[str, list[str]] = field(default_factory=dict)
+    # producer (new name) -> old recipe name -> new recipe name
+    renamed_recipes: dict[str, dict[str, str]] = field(default_factory=dict)
+    # recipe name -> (old producer, new producer)
+    moved_recipes: dict[str, tuple[str, str]] = field(default_factory=dict)
+    # producer (new name) -> recipe name (new) -> change
+    changed_recipes: dict[str, dict[str, RecipeChange]] = field(default_factory=dict)
+    # old item name -> new item name
+    renamed_items: dict[str, str] = field(default_factory=dict)
+    # producer -> recipe names of the new version, to resolve recipes which weren't touched
+    new_recipes: dict[str, set[str]] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return any([self.added_producers, self.removed_producers, self.renamed_producers,
+                    self.added_recipes, self.removed_recipes, self.renamed_recipes,
+                    self.moved_recipes, self.changed_recipes, self.renamed_items])
+
+    def migrate_node(self, producer: str, recipe: str) -> tuple[str, str]:
+        """Maps the producer and recipe names of a node to the new version
+
+        Also resolves the `"! name"` placeholders which `marshal.node_constructor` leaves for unknown recipes.
+        Names which can't be mapped are returned unchanged.
+        """
+        producer = self.renamed_producers.get(producer, producer)
+        if producer not in self.new_recipes:
+            # modules and other pseudo producers
+            return (producer, recipe)
+
+        name = recipe.removeprefix("!").strip()
+        recipes = self.new_recipes[producer]
+        if name in recipes:
+            return (producer, name)
+        if name in self.renamed_recipes.get(producer, {}):
+            return (producer, self.renamed_recipes[producer][name])
+        if "Alternate: " + name in recipes:
+            return (producer, "Alternate: " + name)
+        if name in self.moved_recipes:
+            return (self.moved_recipes[name][1], name)
+        return (producer, recipe)
+
+    def lines(self) -> [str]:
+        """A human readable listing of the differences"""
+        lines = []
+        lines += [f"+ producer: {name}" for name in self.added_producers]
+        lines += [f"- producer: {name}" for name in self.removed_producers]
+        lines += [f"~ producer: {old} -> {new}" for old, new in self.renamed_producers.items()]
+        for producer, names in self.added_recipes.items():
+            lines += [f"+ recipe: {producer} / {name}" for name in names]
+        for producer, names in self.removed_recipes.items():
+            lines += [f"- recipe: {producer} / {name}" for name in names]
+        for producer, renames in self.renamed_recipes.items():
+            lines += [f"~ recipe: {producer} / {old} -> {new}" for old, new in renames.items()]
+        for name, (old, new) in self.moved_recipes.items():
+            lines += [f"~ recipe: {name}: {old} -> {new}"]
+        for producer, changes in self.changed_recipes.items():
+            for name, change in changes.items():
+                for part in ("cycle_rate", "inputs", "outputs"):
+                    if (before_after := getattr(change, part)) is not None:
+                        lines += [f"* recipe: {producer} / {name}: {part} {before_after[0]} -> {before_after[1]}"]
+        lines += [f"~ item: {old} -> {new}" for old, new in self.renamed_items.items()]
+        return lines
+
+
+def match_renames(removed: {str: list}, added: {str: list}) -> dict[str, str]:
+    """Pairs up removed and added recipes of a producer which are most likely the same one renamed"""
+    candidates = []
+    for old, old_data in removed.items():
+        for new, new_data in added.items():
+            old_norm, new_norm = normalized_name(old), normalized_name(new)
+            ratio = SequenceMatcher(None, old_norm, new_norm).ratio()
+            related = bool(output_names(old_data) & output_names(new_data)) or old_norm in new_norm or new_norm in old_norm
+            if ratio >= RENAME_MIN_RATIO or (related and ratio >= RENAME_MIN_RATIO_RELATED):
+                candidates += [(ratio, old, new)]
+
+    renames = {}
+    # greedy, best matches first, so that e.g. `Uranium Fuel Rods` doesn't end up as `Plutonium Fuel Rod`
+    for _, old, new in sorted(candidates, key=lambda c: (-c[0], c[1], c[2])):
+        if old not in renames and new not in renames.values():
+            renames[old] = new
+    return renames
+
+
+def diff_data(old: dict, new: dict) -> GameDataDiff:
+    diff = GameDataDiff()
+    diff.new_recipes = {name: set(producer["recipes"]) for name, producer in new.items()}
+
+    removed_producers = [name for name in old if name not in new]
+    added_producers = [name for name in new if name not in old]
+    for old_name in removed_producers:
+        old_recipes = set(old[old_name]["recipes"])
+        for new_name in added_producers:
+            if new_name in diff.renamed_producers.values():
+                continue
+            new_recipes = set(new[new_name]["recipes"])
+            shared = len(old_recipes & new_recipes) / max(len(old_recipes | new_recipes), 1)
+            if shared >= PRODUCER_RENAME_MIN_SHARED:
+                diff.renamed_producers[old_name] = new_name
+                break
+    diff.removed_producers = [name for name in removed_producers if name not in diff.renamed_producers]
+    diff.added_producers = [name for name in added_producers if name not in diff.renamed_producers.values()]
+
+    # producer (new name) -> {recipe name: data}
+    removed = {}
+    added = {}
+    for old_name, old_producer in old.items():
+        new_name = diff.renamed_producers.get(old_name, old_name)
+        if new_name not in new:
+            continue
+        old_recipes = old_producer["recipes"]
+        new_recipes = new[new_name]["recipes"]
+
+        for name, data in new_recipes.items():
+            if name in old_recipes:
+                change = RecipeChange.between(old_recipes[name], data)
+                if change:
+                    diff.changed_recipes.setdefault(new_name, {})[name] = change
+        removed[new_name] = {name: data for name, data in old_recipes.items() if name not in new_recipes}
+        added[new_name] = {name: data for name, data in new_recipes.items() if name not in old_recipes}
+
+    for producer in list(removed):
+        renames = match_renames(removed[producer], added[producer])
+        for old_name, new_name in renames.items():
+            change = RecipeChange.between(removed[producer].pop(old_name), added[producer].pop(new_name))
+            if change:
+                diff.changed_recipes.setdefault(producer, {})[new_name] = change
+            for (_, old_item), (_, new_item) in zip(change.outputs[0], change.outputs[1]) if change and change.outputs else []:
+                if old_item != new_item and len(change.outputs[0]) == len(change.outputs[1]) == 1:
+                    diff.renamed_items[old_item] = new_item
+        if renames:
+            diff.renamed_recipes[producer] = renames
+
+    # recipes which only changed their producer
+    for old_producer, recipes in removed.items():
+        for name in list(recipes):
+            for new_producer, new_recipes in added.items():
+                if name in new_recipes:
+                    diff.moved_recipes[name] = (old_producer, new_producer)
+                    del recipes[name]
+                    del new_recipes[name]
+                    break
+
+    diff.removed_recipes = {producer: list(recipes) for producer, recipes in removed.items() if recipes}
+    diff.added_recipes = {producer: list(recipes) for producer, recipes in added.items() if recipes}
+    for name in diff.added_producers:
+        diff.added_recipes[name] = list(new[name]["recipes"])
+    return diff
+
+
+def diff_files(old_fpath: Path, new_fpath: Path) -> GameDataDiff:
+    with open(old_fpath) as fp:
+        old = json.load(fp)
+    with open(new_fpath) as fp:
+        new = json.load(fp)
+    return diff_data(old, new)
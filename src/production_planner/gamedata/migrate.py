@@ -0,0 +1,128 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Rewrites the plans in the data folder for a different game data version
+
+The plans are only composed, not constructed, so that neither this process nor the worker processes
+have to load the game data: only the `producer`, `recipe` and `clamp` scalars of the `!node` mappings are changed.
+"""
+
+from ..atomic import write_atomic
+from .diff import (
+    GameDataDiff,
+    diff_files,
+)
+
+import os
+from pathlib import Path
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+
+# below this many files the startup of the worker processes costs more than it saves
+PARALLEL_MIGRATE_MIN_FILES = 8
+
+
+# hidden folders which hold plans too, the staging copies would otherwise still be loaded with the old names
+PLAN_FOLDERS_HIDDEN = {".staging"}
+
+
+def iter_plan_files(dpath: Path):
+    """All plans below `dpath`, except for hidden folders other than `PLAN_FOLDERS_HIDDEN`"""
+    for root, dnames, fnames in os.walk(dpath):
+        dnames[:] = sorted(dname for dname in dnames if not dname.startswith(".") or dname in PLAN_FOLDERS_HIDDEN)
+        for fname in sorted(fnames):
+            if fname.endswith(".yaml") and not fname.startswith("."):
+                yield Path(root) / fname
+
+
+def iter_nodes(document: yaml.Node, seen: set = None):
+    if seen is None:
+        seen = set()
+    if id(document) in seen:
+        return
+    seen.add(id(document))
+
+    if isinstance(document, yaml.MappingNode):
+        if document.tag == "!node":
+            yield document
+        for key, value in document.value:
+            yield from iter_nodes(value, seen)
+    elif isinstance(document, yaml.SequenceNode):
+        for value in document.value:
+            yield from iter_nodes(value, seen)
+
+
+def migrate_node(node: yaml.MappingNode, diff: GameDataDiff) -> bool:
+    fields = {key.value: value for key, value in node.value}
+    if not isinstance(fields.get("producer"), yaml.ScalarNode) or not isinstance(fields.get("recipe"), yaml.ScalarNode):
+        return False
+
+    changed = False
+    producer, recipe = diff.migrate_node(fields["producer"].value, fields["recipe"].value)
+    for key, value in (("producer", producer), ("recipe", recipe)):
+        if fields[key].value != value:
+            fields[key].value = value
+            # let the emitter pick the style again, e.g. `'! Coal'` was quoted only due to the placeholder prefix
+            fields[key].style = None
+            changed = True
+
+    if isinstance(fields.get("clamp"), yaml.MappingNode):
+        for item, _ in fields["clamp"].value:
+            if item.value in diff.renamed_items:
+                item.value = diff.renamed_items[item.value]
+                changed = True
+    return changed
+
+
+def migrate_plan(raw: str, diff: GameDataDiff) -> tuple[str, int]:
+    """Returns the migrated plan and the number of nodes which changed"""
+    document = yaml.compose(raw, Loader=yaml.UnsafeLoader)
+    if document is None:
+        return (raw, 0)
+
+    changed = sum(migrate_node(node, diff) for node in iter_nodes(document))
+    if not changed:
+        return (raw, 0)
+    return (yaml.serialize(document), changed)
+
+
+def migrate_plan_file(fpath: Path, diff: GameDataDiff, dry_run: bool = False, fsync: bool = False) -> int:
+    try:
+        with open(fpath, "r") as fp:
+            raw = fp.read()
+        raw, changed = migrate_plan(raw, diff)
+    except (OSError, yaml.YAMLError):
+        return -1
+
+    if changed and not dry_run:
+        write_atomic(fpath, raw, fsync=fsync)
+    return changed
+
+
+def migrate_plans(dpath: Path, diff: GameDataDiff, dry_run: bool = False, fsync: bool = False) -> dict[Path, int]:
+    """Migrates all plans below `dpath`
+
+    `fsync` is passed on to `write_atomic`, the app's setting is `CONFIG.store["app"]["fsync_writes"]`.
+    Returns the number of changed nodes of each plan which changed, or -1 for plans which couldn't be read.
+    """
+    fpaths = list(iter_plan_files(Path(dpath)))
+    migrate = partial(migrate_plan_file, diff=diff, dry_run=dry_run, fsync=fsync)
+    if len(fpaths) >= PARALLEL_MIGRATE_MIN_FILES:
+        with ProcessPoolExecutor() as pool:
+            results = list(pool.map(migrate, fpaths, chunksize=16))
+    else:
+        results = list(map(migrate, fpaths))
+    return {fpath: changed for fpath, changed in zip(fpaths, results) if changed}
+
+
+def migrate_version(dpath: Path, old_fpath: Path, new_fpath: Path, dry_run: bool = False, fsync: bool = False) -> tuple[GameDataDiff, dict[Path, int]]:
+    """Migrates all plans below `dpath` from the game data file `old_fpath` to `new_fpath`, see `migrate_plans`"""
+    diff = diff_files(old_fpath, new_fpath)
+    if not diff:
+        return (diff, {})
+    return (diff, migrate_plans(dpath, diff, dry_run=dry_run, fsync=fsync))
@@ -4,12 +4,21 @@
 #  file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 from production_planner import core
-
-import re
+from production_planner.gamedata.scan import (
+    re_produced_in,
+    re_ingredients,
+    scan_recipe,
+)
+
+import os
+import hashlib
 from typing import Optional, Self
 from pathlib import Path
 import json
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import platformdirs
 
 # Output Reference:
 #
@@ -39,8 +48,15 @@ from collections import OrderedDict
 # TODO: add Alien Power Augmenter ("Build_AlienPowerBuilding_C")
 
 
+# below this many recipes the startup of the worker processes costs more than scanning them serially
+# measured: scanning a recipe takes ~42us, sending it to a worker and back ~20us, starting the pool ~45ms,
+#           which breaks even at ~3900 recipes with 4 cores (~2700 with 8), so the ~1000 recipes of the
+#           game data are always scanned serially, the pool only pays off for (much) larger modded data
+PARALLEL_SCAN_MIN_RECIPES = 4000
+
+
 class Docs(object):
-    re_produced_in = re.compile('".*?\.(.*?)"')
+    re_produced_in = re_produced_in
     is_miner = False
     is_pow_gen = False
 
@@ -168,9 +184,18 @@ class ParseContext:
         return producers
 
     def make_recipes(self):
-        for recipe in self.parsed["Recipe"].values():
-            recip = recipe.make_recipe(self)
-            recipe.attach_producer(self)
+        recipes = list(self.parsed["Recipe"].values())
+        raw = [recipe.raw for recipe in recipes]
+        if len(raw) >= PARALLEL_SCAN_MIN_RECIPES and (os.cpu_count() or 1) > 1:
+            # Note: `map` keeps the order, the recipes are linked serially afterwards so the output stays the same
+            with ProcessPoolExecutor() as pool:
+                scanned = list(pool.map(scan_recipe, raw, chunksize=256))
+        else:
+            scanned = map(scan_recipe, raw)
+
+        for recipe, (inputs, outputs, produced_in) in zip(recipes, scanned):
+            recip = recipe.make_recipe(self, inputs, outputs)
+            recipe.attach_producer(self, produced_in)
             self.recipes += [recip]
 
 
@@ -363,7 +388,7 @@ class Descriptions(Docs):
 
 class Recipe(Docs):
     NativeClass = "/Script/CoreUObject.Class'/Script/FactoryGame.FGRecipe'"
-    re_ingredients = re.compile(r"ItemClass=(\".+?\")\s*,\s*Amount=(\d+)")
+    re_ingredients = re_ingredients
 
     def __init__(self, docs_data):
         super().__init__(docs_data)
@@ -374,15 +399,23 @@ class Recipe(Docs):
         self._producers = docs_data["mProducedIn"]
         self.core_recipe = None
 
-    def attach_producer(self, ctx: ParseContext):
-        self.producers = self._extract_classes(ctx, self._producers)
+    @property
+    def raw(self) -> tuple[str, str, str]:
+        """The strings to split with `scan.scan_recipe`"""
+        return (self._inputs, self._outputs, self._producers)
+
+    def attach_producer(self, ctx: ParseContext, produced_in: Optional[list[str]] = None):
+        if produced_in is None:
+            self.producers = self._extract_classes(ctx, self._producers)
+        else:
+            self.producers = self._extract_classes(ctx, produced_in, splitter=lambda classes: classes)
 
         for prod in self.producers:
             prod.recipes += [self.core_recipe]
 
         return self.producers
 
-    def make_recipe(self, ctx: ParseContext) -> core.Recipe:
+    def make_recipe(self, ctx: ParseContext, inputs=None, outputs=None) -> core.Recipe:
         self.is_alternate_recipe = self.display_name.startswith("Alternate:")
 
         if self.is_alternate_recipe:
@@ -390,13 +423,16 @@ class Recipe(Docs):
         else:
             recipe_name = self.display_name
 
-        self.core_recipe = core.Recipe(recipe_name, self.cycle_rate, self.make_inputs(ctx), self.make_outputs(ctx), self.is_alternate_recipe)
+        inputs = self.make_inputs(ctx) if inputs is None else self.make_ingredients(ctx, inputs)
+        outputs = self.make_outputs(ctx) if outputs is None else self.make_ingredients(ctx, outputs)
+        self.core_recipe = core.Recipe(recipe_name, self.cycle_rate, inputs, outputs, self.is_alternate_recipe)
         return self.core_recipe
 
     @classmethod
-    def make_ingredients(self, ctx: ParseContext, data) -> [core.Ingredient]:
+    def make_ingredients(self, ctx: ParseContext, data: str | list) -> [core.Ingredient]:
+        """`data` is either the raw string or its already scanned `re_ingredients` matches"""
         ingredients = []
-        raw_ingredients = self.re_ingredients.findall(data)
+        raw_ingredients = self.re_ingredients.findall(data) if isinstance(data, str) else data
         for raw_ingredient in raw_ingredients:
             name, count = raw_ingredient
             # FIXME: properly unescape '\'
@@ -463,14 +499,99 @@ def _custom_producer_order(producers):
     return ordered
 
 
-def docs_json(fpath: Path) -> Optional[list[core.Producer]]:
-    with open(fpath, "r", encoding="utf-16-le") as fp:
-        raw = fp.read().lstrip("\ufeff")
-        docs = json.loads(raw)
+# the only keys `Descriptions` needs from the classes which aren't parsed by a more specific `Docs` subclass
+DESCRIPTION_KEYS = ["ClassName", "mDisplayName", "mDescription", "mForm", "mEnergyValue"]
 
+# bump when the layout of the cached classes changes
+DOCS_CACHE_VERSION = 1
+
+
+def native_classes(root=Docs) -> set[str]:
+    """The native classes parsed by the subclasses of `root`, apart from the catch-all `Descriptions`"""
+    natives = set()
+    for cls in root.__subclasses__():
+        match cls.NativeClass:
+            case None | "*":
+                pass
+            case list():
+                natives.update(cls.NativeClass)
+            case _:
+                natives.add(cls.NativeClass)
+        natives |= native_classes(cls)
+    return natives
+
+
+def iter_docs(fp, chunk_size=1 << 20):
+    """Yields the entries of the top-level list of Docs.json one at a time, without reading the whole file at once"""
+    decoder = json.JSONDecoder()
+    buffer = fp.read(chunk_size).lstrip("\ufeff").lstrip()
+    if not buffer.startswith("["):
+        raise json.JSONDecodeError("Expecting '['", buffer, 0)
+    buffer = buffer[1:]
+
+    while True:
+        buffer = buffer.lstrip().removeprefix(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            entry, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # the entry is incomplete, retry with more of the file
+            # (doubling the buffer, so that large entries aren't decoded over and over)
+            chunk = fp.read(max(chunk_size, len(buffer)))
+            if not chunk:
+                raise
+            buffer += chunk
+            continue
+        yield entry
+        buffer = buffer[end:]
+
+
+def read_classes(fpath: Path) -> dict[str, list[dict]]:
+    """Reads the classes of Docs.json by their native class
+
+    Only the native classes parsed by a `Docs` subclass are kept whole,
+    all others are reduced to the `DESCRIPTION_KEYS`.
+    """
+    natives = native_classes()
     classes = {}
-    for data in docs:
-        classes[data["NativeClass"]] = data["Classes"]
+    with open(fpath, "r", encoding="utf-16-le") as fp:
+        for data in iter_docs(fp):
+            native = data["NativeClass"]
+            if native in natives:
+                classes[native] = data["Classes"]
+            else:
+                classes[native] = [{k: v for k, v in cls.items() if k in DESCRIPTION_KEYS} for cls in data["Classes"]]
+    return classes
+
+
+def file_hash(fpath: Path) -> str:
+    digest = hashlib.sha256()
+    with open(fpath, "rb") as fp:
+        while chunk := fp.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_classes(fpath: Path, dpath_cache: Optional[Path] = None) -> dict[str, list[dict]]:
+    """Like `read_classes`, but cached by the hash of the file"""
+    dpath_cache = Path(dpath_cache or platformdirs.user_cache_dir("production_planner", "mitaa"))
+    fpath_cache = dpath_cache / f"docs_v{DOCS_CACHE_VERSION}_{file_hash(fpath)}.json"
+    if fpath_cache.is_file():
+        with open(fpath_cache, "r") as fp:
+            return json.load(fp)
+
+    classes = read_classes(fpath)
+    os.makedirs(dpath_cache, exist_ok=True)
+    fpath_tmp = fpath_cache.with_name(f".{fpath_cache.name}.{os.getpid()}.tmp")
+    with open(fpath_tmp, "w") as fp:
+        json.dump(classes, fp)
+    os.replace(fpath_tmp, fpath_cache)
+    return classes
+
+
+def docs_json(fpath: Path) -> Optional[list[core.Producer]]:
+    classes = cached_classes(fpath)
 
     ctx = ParseContext(Docs.parse_all(classes))
     producers = ctx.make_producers()
@@ -0,0 +1,26 @@
+# -*- coding:utf-8 -*-
+#  This Source Code Form is subject to the terms of the Mozilla Public
+#  License, v. 2.0. If a copy of the MPL was not distributed with this
+#  file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""The text scanning of the Docs.json classes, which needs neither the parse context nor the game data
+
+Kept apart from `parse`, so that worker processes can import it without loading `production_planner.core`.
+"""
+
+import re
+
+
+re_produced_in = re.compile('".*?\\.(.*?)"')
+re_ingredients = re.compile(r"ItemClass=(\".+?\")\s*,\s*Amount=(\d+)")
+
+
+def scan_recipe(raw: tuple[str, str, str]) -> tuple[list, list, list]:
+    """Splits the ingredients and the producers of a `FGRecipe` class
+
+    `raw` are its `mIngredients`, `mProduct` and `mProducedIn` strings.
+    """
+    inputs, outputs, produced_in = raw
+    return (re_ingredients.findall(inputs),
+            re_ingredients.findall(outputs),
+            re_produced_in.findall(produced_in))
@@ -8,6 +8,7 @@ from ..datatable import PlannerTable
 
 import os
 from pathlib import Path
+from functools import cache
 import shutil
 import tempfile
 
@@ -118,6 +119,8 @@ POWER_UPPER = """
 
 POWER_LOWER = """
 Power-draw and power-generation are shown in separate columns: `-Power` and `+Power`
+
+The `-Power` of generators is negative, so that the `-Power` of the summary is the net draw of the plan
 """
 
 MODULES_UPPER = """
@@ -160,13 +163,32 @@ class LocationLink(Static):
 
 
 class Body(ScrollableContainer):
-    ...
+    def on_mount(self) -> None:
+        self.call_after_refresh(self.load_visible_tables)
+
+    def on_resize(self) -> None:
+        self.call_after_refresh(self.load_visible_tables)
+
+    def watch_scroll_y(self, old_value: float, new_value: float) -> None:
+        super().watch_scroll_y(old_value, new_value)
+        self.call_after_refresh(self.load_visible_tables)
+
+    def load_visible_tables(self) -> None:
+        for placeholder in self.query(LazyTable):
+            if placeholder.region.overlaps(self.region):
+                placeholder.load()
 
 
 class Section(Container):
     pass
 
 
+@cache
+def markdown(text: str) -> Markdown:
+    # the help texts are static, so they are only parsed once per session
+    return Markdown(text)
+
+
 def sandboxed_table(id=id, load_paths=[], **kwargs):
     if not load_paths:
         return
@@ -184,6 +206,28 @@ def sandboxed_table(id=id, load_paths=[], **kwargs):
     return PlannerTable(id=id, load_path=fpaths_sandboxed[0], **kwargs)
 
 
+class LazyTable(Container):
+    """Stands in for a `sandboxed_table` until it is scrolled into view (see `Body.load_visible_tables`)"""
+    def __init__(self, id, load_paths, **kwargs):
+        super().__init__()
+        self.table_id = id
+        self.load_paths = load_paths
+        self.table_kwargs = kwargs
+        self.loaded = False
+
+        # reserves roughly the space of the table, to keep the scroll position steady when it is loaded
+        fpath = load_paths[0] if isinstance(load_paths, list) else load_paths
+        row_count = fpath.read_text().count("!instance") + 1
+        self.styles.height = row_count + 1 + 4
+
+    def load(self) -> None:
+        if self.loaded:
+            return
+        self.loaded = True
+        self.mount(sandboxed_table(id=self.table_id, load_paths=self.load_paths, **self.table_kwargs))
+        self.styles.height = "auto"
+
+
 class HelpScreen(Screen):
     BINDINGS = [
         ("escape", "close", "Close"),
@@ -209,33 +253,33 @@ class HelpScreen(Screen):
                 # LocationLink("Modules", ".location-modules"),
             ),
             Section(
-                TextContent(Markdown(basic_controls)),
+                TextContent(markdown(basic_controls)),
                 classes="location-controls"
             ),
             Section(
-                TextContent(Markdown(SUMMARY_UPPER)),
-                sandboxed_table(id="summary", classes="help_plannertable", load_paths=summary_table_fpath),
-                TextContent(Markdown(SUMMARY_LOWER)),
+                TextContent(markdown(SUMMARY_UPPER)),
+                LazyTable(id="summary", classes="help_plannertable", load_paths=summary_table_fpath),
+                TextContent(markdown(SUMMARY_LOWER)),
                 classes="location-summary"
             ),
             Section(
-                TextContent(Markdown(TABLE_CONTROLS_UPPER)),
-                sandboxed_table(id="controls", classes="help_plannertable", load_paths=table_controls_fpath),
-                TextContent(Markdown(TABLE_CONTROLS_LOWER)),
-                sandboxed_table(id="clamping", classes="help_plannertable", load_paths=table_controls_clamp_fpath),
-                TextContent(Markdown(TABLE_CONTROLS_CLAMPING)),
+                TextContent(markdown(TABLE_CONTROLS_UPPER)),
+                LazyTable(id="controls", classes="help_plannertable", load_paths=table_controls_fpath),
+                TextContent(markdown(TABLE_CONTROLS_LOWER)),
+                LazyTable(id="clamping", classes="help_plannertable", load_paths=table_controls_clamp_fpath),
+                TextContent(markdown(TABLE_CONTROLS_CLAMPING)),
                 classes="location-table-controls"
             ),
             Section(
-                TextContent(Markdown(HIGHLIGHTING_UPPER)),
-                sandboxed_table(id="highlighting", classes="help_plannertable", load_paths=summary_table_fpath),
-                TextContent(Markdown(HIGHLIGHTING_LOWER)),
+                TextContent(markdown(HIGHLIGHTING_UPPER)),
+                LazyTable(id="highlighting", classes="help_plannertable", load_paths=summary_table_fpath),
+                TextContent(markdown(HIGHLIGHTING_LOWER)),
                 classes="location-highlighting"
             ),
             Section(
-                TextContent(Markdown(POWER_UPPER)),
-                sandboxed_table(id="power", classes="help_plannertable", load_paths=power_table_fpath),
-                TextContent(Markdown(POWER_LOWER)),
+                TextContent(markdown(POWER_UPPER)),
+                LazyTable(id="power", classes="help_plannertable", load_paths=power_table_fpath),
+                TextContent(markdown(POWER_LOWER)),
                 classes="location-power"
             ),
             # TODO: need actual sandboxing to have a separate module listing not referring to `CONFIG.dpath_data`
@@ -8,15 +8,24 @@ from . import core
 from .core import (
     CONFIG,
     DataFile,
+    MODULE_PRODUCER,
+    ModuleFile,
     NodeTree,
     Node,
     Recipe,
-    ensure_keys
+    SPANS,
+    ensure_keys,
+    open_config,
+    snapshot_configs,
+    write_configs,
 )
+from .atomic import write_atomic
 from .datatable import PlannerTable
 
 import os
 import re
+import time
+import threading
 from pathlib import Path
 from dataclasses import dataclass
 from typing import (
@@ -27,7 +36,12 @@ from typing import (
 from textual import log
 
 import yaml
-import json_store
+
+
+# seconds between autosaves of the staging data,
+# stretched for large plans so that writing takes at most `AUTOSAVE_MAX_LOAD` of the time
+AUTOSAVE_INTERVAL = 30
+AUTOSAVE_MAX_LOAD = 0.02
 
 
 # TODO: support multiple views into the same file (shared `staging` data, all pointing to the same NodeTree instance)
@@ -39,6 +53,11 @@ class DataChunk:
     checksum: int = hash(None)
     # TODO: actually populate and use mtime
     mtime: int = 0
+    # checksum of what was last written to or read from `target`
+    saved_checksum: int = hash(None)
+    # numbers the dumps of the data, so that an older dump can't overwrite a newer one (see `FileChunk.write`)
+    dumps: int = 0
+    written: int = 0
     _data: Optional[NodeTree] = None
     sink: None = None
 
@@ -54,8 +73,10 @@ class DataChunk:
     def reset(self) -> None:
         pass
 
-    def save(self, data=None) -> Tuple[DataFile] | bool | None:
+    def save(self, data=None, if_changed=False) -> Tuple[DataFile] | bool | None:
         """
+        With `if_changed` the write is skipped if the data is unchanged since it was last written or read.
+
         Returns
         * True  if successful
         * False if target is None
@@ -82,7 +103,7 @@ class Sink:
             staging_target = staging_root / f"{table_iid}.yaml"
 
             config_target = staging_target.with_suffix(staging_target.suffix + ".sink")
-            self.config = json_store.open(config_target, json_kw={ "indent": 4 })
+            self.config = open_config(config_target)
             ensure_keys(self.config, {
                 "target": None,
             })
@@ -92,6 +113,7 @@ class Sink:
 
         self.staging_root = staging_root
         self.iid_sink = table_iid
+        self.commit_lock = threading.Lock()
 
         self.staging = self.Chunk(DataFile.get(staging_target) if staging_target else staging_target, sink=self)
         sink_target = DataFile.get(self.config["target"]) if self.config["target"] else None
@@ -122,6 +144,7 @@ class Sink:
         return os.path.splitext(self.subpath)[0]
 
     @property
+    @SPANS.timed("sink.is_dirty")
     def is_dirty(self) -> bool:
         # TODO: hook into filesystem and watch for external changes to sink
         # NOTE: `self.staging.data` and `self.table` always point to the same table instance !
@@ -169,9 +192,9 @@ class Sink:
             if maybe_apply_staging is True:
                 # TODO: pop up a modal to confirm overwrite of `staging`
                 if self.sink.mtime > self.staging.mtime and self.sink.data:
-                    self.staging.data = parse_yaml(yaml.dump(self.sink.data))
+                    self.staging.data = parse_yaml(yaml.dump(self.sink.data), resolve_modules=False)
             else:
-                self.staging.data = parse_yaml(yaml.dump(self.sink.data))
+                self.staging.data = parse_yaml(yaml.dump(self.sink.data), resolve_modules=False)
 
         self.table.apply_data(self.staging.data)
         if not subpath:
@@ -182,15 +205,22 @@ class Sink:
         return sinkfile
 
     def load_yaml(self, data: str):
-        self.staging.data = parse_yaml(data)
+        self.staging.data = parse_yaml(data, resolve_modules=False)
         self.staging.checksum = hash(self.staging.data)
         self.table.apply_data(self.staging.data)
 
     def staging_commit(self) -> Optional[DataFile]:
         # Preserve `None` sentinel value as is (gets shown as <untitled>)
         self.config["target"] = str(self.sink.target.linkpath) if self.sink.target else self.sink.target
-        self.config.sync()
-        return self.staging.save()
+        # unchanged sinks needn't be rewritten, which keeps the exit from scaling with the number of sinks
+        return self.staging.save(if_changed=True)
+
+    def staging_dump(self) -> Optional[tuple[int, str]]:
+        """Like `staging_commit`, but leaves the write of the dump to the caller (see `PlannerManager.autosave`)"""
+        self.config["target"] = str(self.sink.target.linkpath) if self.sink.target else self.sink.target
+        if self.staging.target is None:
+            return None
+        return self.staging.dump(if_changed=True)
 
     def sink_commit(self, subpath=None) -> Optional[Tuple[DataFile]]:
         if subpath:
@@ -205,7 +235,8 @@ class Sink:
 
         # implicitly serializes and deserializes `sink.data` and assigns it to `staging.data`
         # necessary to keep `staging.data is not sink.data` true
-        self.staging.reset(self.sink)
+        with self.commit_lock:
+            self.staging.reset(self.sink)
         self.table.apply_data(self.staging.data)
         return result
 
@@ -218,15 +249,21 @@ class FileChunk(DataChunk):
     def reset(self, source_chunk=None, delete_config=False) -> None:
         if self.target and self.target.fullpath.is_file():
             self.target.fullpath.unlink()
+        self.saved_checksum = hash(None)
+        # dumps of the data before the reset which are still pending aren't written anymore
+        self.written = self.dumps
 
         if source_chunk:
-            self.data = parse_yaml(yaml.dump(source_chunk.data))
+            self.data = parse_yaml(yaml.dump(source_chunk.data), resolve_modules=False)
             self.sink.table.apply_data(self.data)
         else:
             self.data = None
 
-    def save(self, data=None) -> Tuple[DataFile] | bool | None:
+    @SPANS.timed("file_chunk.save")
+    def save(self, data=None, if_changed=False) -> Tuple[DataFile] | bool | None:
         """
+        With `if_changed` the write is skipped if the data is unchanged since it was last written or read.
+
         Returns
         * True  if successful
         * False if target invalid or uninitialized
@@ -238,14 +275,41 @@ class FileChunk(DataChunk):
         data = data if data else self.data
         datafile = self.target
         try:
-            os.makedirs(datafile.fullpath.parent, exist_ok=True)
-            with open(datafile.fullpath, "w") as fp:
-                yaml.dump(data, fp)
-            self.data = data
+            dumped = self.dump(data, if_changed)
+            if dumped is None:
+                return datafile
+            self.write(dumped)
         except (FileNotFoundError, TypeError, WindowsError, OSError):
             return None
+        # Note: same as `self.data = data`, without dumping the tree a second time for its hash
+        self._data = data
+        self.checksum = hash(dumped[1])
         return datafile
 
+    def dump(self, data=None, if_changed=False) -> Optional[tuple[int, str]]:
+        """The yaml of `data` (by default `self.data`) to be written by `write`, numbered in the order of the dumps
+
+        With `if_changed` None is returned if the data is unchanged since it was last written or read.
+        """
+        raw = yaml.dump(data if data else self.data)
+        if if_changed and hash(raw) == self.saved_checksum:
+            return None
+        self.dumps += 1
+        return (self.dumps, raw)
+
+    def write(self, dumped: tuple[int, str]):
+        """Writes a dump of `dump`, unless it or a later one was written already
+
+        Only touches the file and the checksums, so that the event loop can leave it to a thread.
+        """
+        number, raw = dumped
+        with self.sink.commit_lock:
+            if number <= self.written:
+                return
+            write_atomic(self.target.fullpath, raw, fsync=CONFIG.store["app"]["fsync_writes"])
+            self.written = number
+            self.saved_checksum = hash(raw)
+
     def load(self) -> bool | None:
         """
         Returns
@@ -256,7 +320,8 @@ class FileChunk(DataChunk):
         if self.target and self.target.fullpath.is_file():
             with open(self.target.fullpath, "r") as fp:
                 raw = fp.read()
-            self.data = parse_yaml(raw)
+            self.data = parse_yaml(raw, resolve_modules=False)
+            self.saved_checksum = self.checksum
             return True if self.data else None
         else:
             return False
@@ -274,7 +339,7 @@ class PlannerManager:
         self.active_sink = None
 
         os.makedirs(self.dpath_staging, exist_ok=True)
-        self.config = json_store.open(self.fpath_config, json_kw={ "indent": 4 })
+        self.config = open_config(self.fpath_config)
         ensure_keys(self.config, {
             "active_sink": "000.yaml",
         })
@@ -311,10 +376,57 @@ class PlannerManager:
         self.sinks += [FileSink(None, self.dpath_staging, table_iid=f"{len(self.sinks):>03}")]
 
     def staging_commit(self):
-        self.config.sync()
+        # Note: the configs are written afterwards in one pass with `core.sync_configs`
         for sink in self.sinks:
             sink.staging_commit()
 
+    def schedule_autosave(self, delay=None):
+        self.app.set_timer(delay or AUTOSAVE_INTERVAL, self.autosave)
+
+    @SPANS.timed("manager.autosave")
+    def autosave(self):
+        """Writes the staging data of the changed sinks and the changed configs
+
+        The trees and configs are only serialized here on the event loop, which edits them,
+        the thread worker just writes the dumps (see `_autosave`).
+        """
+        start = time.perf_counter()
+        dumps = []
+        for sink in list(self.sinks):
+            try:
+                dumped = sink.staging_dump()
+            except Exception as e:
+                log(f"Autosave failed for {sink.name}: {e}")
+                continue
+            if dumped is not None:
+                dumps += [(sink, dumped)]
+        try:
+            configs = snapshot_configs()
+        except Exception as e:
+            log(f"Autosave failed for the configs: {e}")
+            configs = []
+        cost = time.perf_counter() - start
+        self.app.run_worker(lambda: self._autosave(dumps, configs, cost), thread=True, exclusive=True, group="autosave")
+
+    def _autosave(self, dumps: [(Sink, tuple[int, str])], configs: [(Path, str)], cost: float):
+        start = time.perf_counter()
+        try:
+            for sink, dumped in dumps:
+                try:
+                    sink.staging.write(dumped)
+                except Exception as e:
+                    # still dirty, so it's retried next time
+                    log(f"Autosave failed for {sink.name}: {e}")
+            try:
+                write_configs(configs)
+            except Exception as e:
+                log(f"Autosave failed for the configs: {e}")
+        finally:
+            # Note: the interval adapts to the time spent on both threads, the dumps block the event loop
+            cost += time.perf_counter() - start
+            if self.app.is_running:
+                self.app.call_from_thread(self.schedule_autosave, max(AUTOSAVE_INTERVAL, cost / AUTOSAVE_MAX_LOAD))
+
     def reset_sink_from_path(self, subpath, keep_cache=True):
         target = DataFile.get(subpath)
         for sink in self.sinks:
@@ -337,8 +449,41 @@ class PlannerManager:
         return CONFIG.dpath_data
 
 
-def parse_yaml(raw: str) -> Optional[NodeTree]:
-    parsed = yaml.unsafe_load(raw)
+@SPANS.timed("io.parse_yaml")
+def parse_yaml(raw: str, resolve_modules: bool = True) -> Optional[NodeTree]:
+    """Parses a plan, by default with its modules resolved (see `resolve_tree_modules`)
+
+    The table resolves the modules itself without blocking (see `PlannerTable.apply_data`),
+    and the module files resolve their nested modules when they are loaded (see `_ModuleProducer.load_module`).
+    """
+    tree = parsed_to_tree(yaml.unsafe_load(raw))
+    if tree is not None and resolve_modules:
+        resolve_tree_modules(tree)
+    return tree
+
+
+def resolve_tree_modules(tree: NodeTree, modulefile: Optional[ModuleFile] = None) -> NodeTree:
+    """Loads the modules of `tree` in place of the placeholders left by `node_constructor`
+
+    Synchronous, for use without the app. With `modulefile` (the file of `tree`) the tree can't include itself.
+    """
+    if modulefile is not None:
+        MODULE_PRODUCER.update_module(modulefile)
+    tree.reload_modules(module_stack=[modulefile.id] if modulefile is not None else [])
+    return tree
+
+
+def construct_yaml(document: yaml.Node) -> Optional[NodeTree]:
+    """Like `parse_yaml`, but for an already composed document (see `core.module.compose_module_file`)"""
+    loader = yaml.UnsafeLoader("")
+    try:
+        parsed = loader.construct_document(document)
+    finally:
+        loader.dispose()
+    return parsed_to_tree(parsed)
+
+
+def parsed_to_tree(parsed) -> Optional[NodeTree]:
     match parsed:
         case None:
             return NodeTree.from_nodes([])
@@ -358,11 +503,11 @@ def parse_yaml(raw: str) -> Optional[NodeTree]:
     return tree
 
 
-def load_data(target: Path) -> NodeTree | None | bool:
+def load_data(target: Path, resolve_modules: bool = True) -> NodeTree | None | bool:
     if target and target.is_file():
         with open(target, "r") as fp:
             raw = fp.read()
-        tree = parse_yaml(raw)
+        tree = parse_yaml(raw, resolve_modules)
         return tree if tree else None
     else:
         return False
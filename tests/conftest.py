@@ -0,0 +1,84 @@
+import os
+import tempfile
+
+# Note: the config and cache folders are resolved when `production_planner.core` is imported,
+#       so the user's own folders have to be swapped out before any test module imports it
+os.environ["HOME"] = tempfile.mkdtemp(prefix="production_planner_home_")
+os.environ.pop("XDG_CONFIG_HOME", None)
+os.environ.pop("XDG_CACHE_HOME", None)
+os.environ.pop("XDG_DATA_HOME", None)
+
+import pytest
+
+from production_planner import core
+
+
+def pytest_addoption(parser):
+    parser.addoption("--runslow", action="store_true", default=False, help="run the tests marked as slow")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: spawns interpreters or times large inputs, only run with --runslow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--runslow"):
+        return
+    skip_slow = pytest.mark.skip(reason="needs --runslow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
+@pytest.fixture
+def data_folder(tmp_path):
+    previous = core.CONFIG.dpath_data
+    core.CONFIG.dpath_data = tmp_path
+    core.MODULE_PRODUCER.module_index.clear()
+    try:
+        yield tmp_path
+    finally:
+        core.CONFIG.dpath_data = previous
+        core.MODULE_PRODUCER.module_index.clear()
+        core.MODULE_PRODUCER.recipes = []
+
+
+def node_yaml(producer: str, recipe: str, count=1) -> str:
+    return f"""- !instance
+  children: []
+  expanded: true
+  main: !node
+    clock_rate: 100
+    count: {count}
+    mk: 1
+    producer: {producer}
+    purity: 0
+    recipe: {recipe}
+  shown: true
+"""
+
+
+def plan_yaml(*nodes: str) -> str:
+    return "!tree\n" + "".join(nodes)
+
+
+def producer(name: str) -> core.Producer:
+    return next(producer for producer in core.PRODUCERS if producer.name == name)
+
+
+def recipe(producer_name: str, recipe_name: str) -> core.Recipe:
+    return next(recipe for recipe in producer(producer_name).recipes if recipe.name == recipe_name)
+
+
+def node(producer_name: str, recipe_name: str, **kwargs) -> core.Node:
+    return core.Node(producer(producer_name), recipe(producer_name, recipe_name), **kwargs)
+
+
+def deficits(tree) -> dict[str, float]:
+    """The net consumption of the items which are produced within `tree`"""
+    tree.update_summaries()
+    produced = {item
+                for instance in tree.node_children
+                for item, quantity in instance.node_main.ingredients.items() if quantity > 0}
+    return {item: quantity
+            for item, quantity in tree.node_main.ingredients.items() if item in produced and quantity < -1e-6}
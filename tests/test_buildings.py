@@ -0,0 +1,91 @@
+import itertools
+import random
+
+import pytest
+
+from production_planner.core import (
+    Ingredient,
+    NodeTree,
+)
+from production_planner.core.buildings import (
+    balance_buildings,
+    building_options,
+    shards_per_building,
+    solve_counts,
+)
+from production_planner.core.edit import smartround
+
+from conftest import node
+
+
+def cost(assignment, shard_cost: float) -> float:
+    return sum(option.cost(shard_cost) for option in assignment)
+
+
+def brute_force(buildings: [float], max_shards: int, shard_cost: float) -> float:
+    return min(cost(assignment, shard_cost)
+               for assignment in itertools.product(*(building_options(demand) for demand in buildings))
+               if sum(option.shards for option in assignment) <= max_shards)
+
+
+def test_building_options_round_up():
+    # at 150.01% a single building would be truncated to 150% (see `ceil_clock_rate`)
+    for buildings in (1.50005, 2.00001, 0.33334):
+        for option in building_options(buildings):
+            assert option.count * smartround(option.clock_rate) >= 100 * buildings
+            assert option.shards == option.count * shards_per_building(option.clock_rate)
+
+
+@pytest.mark.parametrize("max_shards, counts", [
+    (0, [3, 3]),
+    (2, [2, 3]),
+    (3, [1, 3]),
+    # 2 + 2 buildings would need a shard more for the same number of buildings
+    (4, [1, 3]),
+    (6, [1, 1]),
+])
+def test_solve_counts_shard_limit(max_shards, counts):
+    assignment = solve_counts([2.5, 2.5], max_shards)
+    assert sorted(option.count for option in assignment) == sorted(counts)
+    assert sum(option.shards for option in assignment) <= max_shards
+    for option in assignment:
+        assert option.count * option.clock_rate >= 250
+
+
+def test_solve_counts_shard_cost():
+    # 2 buildings at 75%, or 1 at 150% with a shard
+    assert solve_counts([1.5], 1)[0].count == 1
+    assert solve_counts([1.5], 1, shard_cost=2)[0].count == 2
+
+
+def test_solve_counts_without_shards():
+    # overclocking is impossible without shards, all nodes fall back to running at up to 100%
+    for max_shards in (0, -1):
+        assignment = solve_counts([0, 0.4, 3.7, 12], max_shards)
+        assert [option.count for option in assignment] == [0, 1, 4, 12]
+        assert all(option.shards == 0 and option.clock_rate <= 100 for option in assignment)
+
+
+def test_solve_counts_optimal():
+    rng = random.Random(47)
+    for _ in range(50):
+        buildings = [round(rng.uniform(0.1, 4), 2) for _ in range(rng.randint(1, 4))]
+        max_shards = rng.randint(0, 12)
+        shard_cost = rng.choice([0.01, 0.4, 1.5])
+        assignment = solve_counts(buildings, max_shards, shard_cost)
+        assert sum(option.shards for option in assignment) <= max_shards
+        assert cost(assignment, shard_cost) == pytest.approx(brute_force(buildings, max_shards, shard_cost))
+
+
+def test_balance_buildings_clamped():
+    plate = node("Constructor", "Iron Plate", count=5, clock_rate=50)
+    clamped = node("Constructor", "Iron Rod", count=4, clamp=Ingredient("Iron Rod", 30))
+    tree = NodeTree.from_nodes([plate, clamped])
+    plate_rate = plate.ingredients["Iron Plate"]
+
+    assert balance_buildings(tree, max_shards=3) == 3
+    assert (plate.count.value, plate.clock_rate.value) == (1, 250)
+    assert plate.ingredients["Iron Plate"] == plate_rate
+    # only the count of the clamped node is set, its clock rate follows from the clamp
+    assert clamped.count.value == 2
+    assert clamped.ingredients["Iron Rod"] == 30
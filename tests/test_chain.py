@@ -0,0 +1,78 @@
+import pytest
+from textual.coordinate import Coordinate
+
+from production_planner import Planner
+from production_planner.cells import CountCell
+from production_planner.core import (
+    CONFIG,
+    NodeInstance,
+    NodeTree,
+    generate_chain,
+)
+from production_planner.core.edit import (
+    ceil_clock_rate,
+    smartround,
+)
+
+from conftest import (
+    deficits,
+    node_yaml,
+    plan_yaml,
+)
+
+
+@pytest.mark.parametrize("item, rate, allow_alternates", [
+    ("Turbo Motor", 1, False),
+    ("Turbo Motor", 1, True),
+    ("Heavy Modular Frame", 3, True),
+    ("Computer", 2.5, False),
+    ("Rubber", 10, False),
+])
+def test_chain_without_deficits(item, rate, allow_alternates):
+    tree = generate_chain(item, rate, allow_alternates)
+    assert deficits(tree) == {}
+    assert tree.node_main.ingredients[item] >= rate - 1e-6
+
+
+def test_ceil_clock_rate():
+    assert ceil_clock_rate(1, 1) == 100
+    assert ceil_clock_rate(2.5, 3) == 83.34
+    # `smartround` truncates 33.01, which would run below the exact clock rate
+    assert smartround(33.01) == 33
+    assert ceil_clock_rate(0.3301, 1) == 33.02
+    for buildings in (0.3301, 3.3001, 7.0001, 12.3456):
+        for count in (1, 2, 3, 7):
+            clock_rate = ceil_clock_rate(buildings, count)
+            assert smartround(clock_rate) == clock_rate
+            assert clock_rate * count >= 100 * buildings - 1e-6
+
+
+async def test_generated_rows_editable(data_folder, monkeypatch):
+    monkeypatch.setitem(CONFIG.store["app"], "startup_help", False)
+    app = Planner(testrun=True)
+    async with app.run_test() as pilot:
+        sink = app.manager.active_sink
+        sink.load_yaml(plan_yaml(node_yaml("Constructor", "Screw", count=2)))
+        table = sink.table
+        assert table is app.focused_table
+
+        column = next(idx for idx, Column in enumerate(table.planner_columns) if Column.name == "Iron Rod")
+        table.cursor_coordinate = Coordinate(1, column)
+        table.action_generate_chain()
+        await pilot.pause()
+
+        # each generated node is a row of its own, right after the node the chain was generated for
+        screws, *generated = table.nodetree.node_children
+        assert [instance.node_main.recipe.name for instance in generated] == ["Iron Ore", "Iron Ingot", "Iron Rod"]
+        assert all(isinstance(instance, NodeInstance) and not isinstance(instance, NodeTree) for instance in generated)
+        assert [table.nodetree.get_node(row) for row in (1, 2, 3, 4)] == [screws, *generated]
+        assert table.cursor_coordinate.row == 2
+
+        rods = generated[-1]
+        count = rods.node_main.count.value
+        table.cursor_coordinate = Coordinate(4, table.planner_columns.index(CountCell))
+        await pilot.press("]")
+        assert rods.node_main.count.value == count + 1
+        assert [instance.node_main.count.value for instance in generated[:-1]] == [1, 1]
+        assert screws.node_main.count.value == 2
+        await pilot.press("ctrl+q")
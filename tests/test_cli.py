@@ -0,0 +1,41 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from production_planner import __version__
+
+
+# runs `main` like the `production_planner` script, then reports which of the heavy modules got imported
+SCRIPT = """
+import json
+import sys
+import production_planner
+sys.argv = ["production_planner", sys.argv[1]]
+try:
+    production_planner.main()
+except SystemExit:
+    pass
+print(json.dumps(sorted(module for module in sys.modules
+                        if module.split(".")[0] == "textual" or module.startswith("production_planner."))))
+"""
+
+
+@pytest.mark.parametrize("flag", ["--help", "--version"])
+def test_cli_flags_skip_app_imports(flag):
+    result = subprocess.run([sys.executable, "-c", SCRIPT, flag], capture_output=True, text=True, check=True, timeout=60)
+    *output, modules = result.stdout.splitlines()
+    assert json.loads(modules) == []
+    if flag == "--version":
+        assert output == [__version__]
+    else:
+        assert output[0] == "Production Planner"
+
+
+@pytest.mark.slow
+def test_import_skips_app_imports():
+    script = ("import json, sys, production_planner; "
+              "print(json.dumps(sorted(module for module in sys.modules if module.split('.')[0] in ('textual', 'yaml'))))")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, timeout=60)
+    assert json.loads(result.stdout) == []
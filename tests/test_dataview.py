@@ -0,0 +1,77 @@
+import shutil
+import subprocess
+
+import pytest
+import yaml
+
+from production_planner import io
+from production_planner.datatable import PlannerTable
+from production_planner.dataview import (
+    DataView,
+    TreeDiff,
+)
+
+from conftest import (
+    node_yaml,
+    plan_yaml,
+)
+
+
+def plan(counts: [int]) -> str:
+    return plan_yaml(*(node_yaml("Constructor", "Iron Plate", count=count) for count in counts))
+
+
+def diff(tree_diff: TreeDiff, saved, session) -> str:
+    tree_diff.update(saved, session)
+    return "".join(tree_diff.diff())
+
+
+def test_diff_unchanged():
+    tree_diff = TreeDiff()
+    saved = io.parse_yaml(plan(range(1, 40)))
+    session = io.parse_yaml(plan(range(1, 40)))
+    assert diff(tree_diff, saved, session) == ""
+    assert tree_diff.session == yaml.dump(session)
+
+
+def test_diff_one_node(monkeypatch):
+    tree_diff = TreeDiff()
+    saved = io.parse_yaml(plan(range(1, 40)))
+    session = io.parse_yaml(plan(range(1, 40)))
+    session.node_children[20].node_main.count.value = 100
+
+    result = diff(tree_diff, saved, session)
+    assert result.count("@@ -") == 1
+    assert "-    count: 21\n+    count: 100\n" in result
+
+    # cached until either tree changes, with only the changed node dumped again
+    dumped = []
+    dump = yaml.dump
+    monkeypatch.setattr(yaml, "dump", lambda data, *args, **kwargs: dumped.append(data) or dump(data, *args, **kwargs))
+    assert diff(tree_diff, saved, session) == result
+    assert dumped == []
+    session.node_children[30].node_main.count.value = 200
+    assert diff(tree_diff, saved, session).count("@@ -") == 2
+    assert dumped == [[session.node_children[30]]]
+
+
+@pytest.mark.skipif(shutil.which("patch") is None, reason="needs `patch`")
+def test_diff_applies(tmp_path):
+    saved = io.parse_yaml(plan([1, 2, 3, 4, 5, 6, 7, 8, 9, 10]))
+    session = io.parse_yaml(plan([1, 2, 30, 4, 5, 6, 7, 8, 10, 11, 12]))
+    session.node_children[5].expanded = False
+    session.node_children[6].shown = False
+
+    fpath = tmp_path / "sink.yaml"
+    fpath.write_text(yaml.dump(saved))
+    (tmp_path / "staging.diff").write_text(diff(TreeDiff(), saved, session))
+    subprocess.run(["patch", "-s", str(fpath), str(tmp_path / "staging.diff")], check=True)
+    assert fpath.read_text() == yaml.dump(session)
+
+
+def test_dataview_reuses_diff():
+    first = PlannerTable()
+    second = PlannerTable()
+    # each table has a diff of its own, which outlives the views opened on it
+    assert DataView(first).tree_diff is DataView(first).tree_diff
+    assert DataView(first).tree_diff is not DataView(second).tree_diff
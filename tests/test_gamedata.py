@@ -0,0 +1,220 @@
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import production_planner
+from production_planner import gamedata
+from production_planner.core import ProducerEncoder
+from production_planner.gamedata import parse
+from production_planner.gamedata.diff import (
+    GameDataDiff,
+    diff_files,
+    match_renames,
+)
+from production_planner.gamedata.migrate import migrate_plans
+
+from conftest import (
+    node_yaml,
+    plan_yaml,
+)
+
+
+NATIVE = "/Script/CoreUObject.Class'/Script/FactoryGame.{}'"
+
+
+def item(class_name: str, name: str, form: str = "RF_SOLID") -> dict:
+    return {"ClassName": class_name, "mDisplayName": name, "mDescription": name, "mForm": form, "mEnergyValue": "0"}
+
+
+def ingredients(*amounts: tuple[str, int]) -> str:
+    return "(" + ",".join(f"(ItemClass=\"/Script/Engine.BlueprintGeneratedClass'/Game/Parts/{class_name}.{class_name}'\","
+                          f"Amount={amount})" for class_name, amount in amounts) + ")"
+
+
+def write_docs(fpath, recipes: int):
+    items = [item(f"Desc_Part{idx}_C", f"Part {idx}") for idx in range(50)] + [item("Desc_Water_C", "Water", "RF_LIQUID")]
+    classes = {native: [] for native in parse.native_classes()}
+    classes[NATIVE.format("FGItemDescriptor")] = items
+    classes[NATIVE.format("FGResourceDescriptor")] = [item("Desc_OreIron_C", "Iron Ore")]
+    classes[NATIVE.format("FGBuildableManufacturer")] = [{
+        "ClassName": "Build_ConstructorMk1_C", "mDisplayName": "Constructor", "mDescription": "",
+        "mPowerConsumption": "4.0", "mPowerConsumptionExponent": "1.321929",
+    }]
+    classes[NATIVE.format("FGRecipe")] = [{
+        "ClassName": f"Recipe_{idx}_C",
+        "mDisplayName": f"Alternate: Part {idx}" if idx % 3 else f"Part {idx}",
+        "mDescription": "",
+        "mIngredients": ingredients((f"Desc_Part{idx % 50}_C", idx % 7 + 1), ("Desc_Water_C", 1000 * (idx % 4))),
+        "mProduct": ingredients((f"Desc_Part{(idx + 1) % 50}_C", idx % 5 + 1)),
+        "mManufactoringDuration": f"{idx % 10 + 1}.0",
+        "mProducedIn": '("/Game/Factory/ConstructorMk1/Build_ConstructorMk1.Build_ConstructorMk1_C",'
+                       '"/Script/FactoryGame.FGCustomizationRecipe")',
+    } for idx in range(recipes)]
+    docs = [{"NativeClass": native, "Classes": native_classes} for native, native_classes in classes.items()]
+    fpath.write_text("\ufeff" + json.dumps(docs), encoding="utf-16-le")
+
+
+def docs_output(fpath) -> str:
+    return json.dumps(parse.docs_json(fpath), cls=ProducerEncoder, indent=2)
+
+
+def test_parallel_scan_matches_serial(tmp_path, monkeypatch):
+    fpath = tmp_path / "Docs.json"
+    write_docs(fpath, recipes=600)
+
+    monkeypatch.setattr(parse, "PARALLEL_SCAN_MIN_RECIPES", float("inf"))
+    serial = docs_output(fpath)
+
+    pools = []
+
+    class RecordingPool(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+
+    monkeypatch.setattr(parse, "PARALLEL_SCAN_MIN_RECIPES", 0)
+    monkeypatch.setattr(parse, "ProcessPoolExecutor", RecordingPool)
+    monkeypatch.setattr(parse.os, "cpu_count", lambda: 4)
+    parallel = docs_output(fpath)
+
+    assert len(pools) == 1
+    assert parallel == serial
+    assert len(json.loads(serial)[0]["Constructor"]["recipes"]) == 600
+
+
+def previous_docs_output(fpath) -> str:
+    """The output of the parser before Docs.json was streamed, which read all of the classes at once"""
+    with open(fpath, "r", encoding="utf-16-le") as fp:
+        docs = json.loads(fp.read().lstrip("\ufeff"))
+    classes = {data["NativeClass"]: data["Classes"] for data in docs}
+    ctx = parse.ParseContext(parse.Docs.parse_all(classes))
+    producers = parse._custom_producer_order(ctx.make_producers())
+    return json.dumps(producers, cls=ProducerEncoder, indent=2)
+
+
+def test_streamed_docs_match_previous_parser(tmp_path, monkeypatch):
+    fpath = tmp_path / "Docs.json"
+    write_docs(fpath, recipes=60)
+
+    with open(fpath, "r", encoding="utf-16-le") as fp:
+        docs = json.loads(fp.read().lstrip("\ufeff"))
+    # entries spanning several chunks are decoded whole
+    with open(fpath, "r", encoding="utf-16-le") as fp:
+        assert list(parse.iter_docs(fp, chunk_size=64)) == docs
+
+    monkeypatch.setattr(parse, "PARALLEL_SCAN_MIN_RECIPES", float("inf"))
+    assert docs_output(fpath) == previous_docs_output(fpath)
+    # and again from the cache
+    monkeypatch.setattr(parse, "read_classes", None)
+    assert docs_output(fpath) == previous_docs_output(fpath)
+
+
+def test_docs_cache_invalidated(tmp_path, monkeypatch):
+    fpath = tmp_path / "Docs.json"
+    dpath_cache = tmp_path / "cache"
+    write_docs(fpath, recipes=10)
+    first = parse.cached_classes(fpath, dpath_cache)
+
+    read = []
+    read_classes = parse.read_classes
+    monkeypatch.setattr(parse, "read_classes", lambda fpath: read.append(fpath) or read_classes(fpath))
+    assert parse.cached_classes(fpath, dpath_cache) == first
+    assert read == []
+
+    write_docs(fpath, recipes=20)
+    second = parse.cached_classes(fpath, dpath_cache)
+    assert read == [fpath]
+    assert len(second[NATIVE.format("FGRecipe")]) == 20
+    assert len(os.listdir(dpath_cache)) == 2
+
+
+def test_migrate_plans(tmp_path, monkeypatch):
+    fpath = tmp_path / "plan.yaml"
+    fpath.write_text(plan_yaml(node_yaml("Coal Generator", "Coal"), node_yaml("Constructor", "Iron Plate")))
+    diff = GameDataDiff(renamed_producers={"Coal Generator": "Coal-Powered Generator"},
+                        new_recipes={"Coal-Powered Generator": {"Coal"}, "Constructor": {"Iron Plate"}})
+    synced = []
+    monkeypatch.setattr(os, "fsync", synced.append)
+
+    assert migrate_plans(tmp_path, diff, dry_run=True) == {fpath: 1}
+    assert "Coal Generator" in fpath.read_text()
+
+    assert migrate_plans(tmp_path, diff, fsync=True) == {fpath: 1}
+    assert "producer: Coal-Powered Generator" in fpath.read_text()
+    assert len(synced) == 1
+    assert os.listdir(tmp_path) == ["plan.yaml"]
+    assert migrate_plans(tmp_path, diff) == {}
+
+
+def test_migrate_plans_staging(tmp_path):
+    fpath = tmp_path / ".staging" / "[main]" / "000.yaml"
+    fpath.parent.mkdir(parents=True)
+    fpath.write_text(plan_yaml(node_yaml("Coal Generator", "Coal")))
+    (tmp_path / ".cache").mkdir()
+    (tmp_path / ".cache" / "other.yaml").write_text(plan_yaml(node_yaml("Coal Generator", "Coal")))
+    diff = GameDataDiff(renamed_producers={"Coal Generator": "Coal-Powered Generator"},
+                        new_recipes={"Coal-Powered Generator": {"Coal"}})
+
+    # the staging copies are loaded in place of the plans, so they are migrated too
+    assert migrate_plans(tmp_path, diff) == {fpath: 1}
+    assert "producer: Coal-Powered Generator" in fpath.read_text()
+
+
+@pytest.fixture(scope="module")
+def shipped_diff() -> GameDataDiff:
+    return diff_files(gamedata.get(0).fpath, gamedata.get(1).fpath)
+
+
+def test_diff_shipped_versions(shipped_diff):
+    assert shipped_diff.renamed_producers == {"Coal Generator": "Coal-Powered Generator",
+                                              "Fuel Generator": "Fuel-Powered Generator"}
+    assert shipped_diff.removed_producers == []
+    assert "Quantum Encoder" in shipped_diff.added_producers
+    assert shipped_diff.renamed_recipes["Manufacturer"]["Rigour Motor"] == "Rigor Motor"
+    assert shipped_diff.renamed_recipes["Nuclear Power Plant"] == {"Uranium Fuel Rods": "Uranium Fuel Rod",
+                                                                   "Plutonium Fuel Rods": "Plutonium Fuel Rod"}
+    assert shipped_diff.renamed_items["SAM Ore"] == "SAM"
+    assert shipped_diff.moved_recipes["Automated Miner"] == ("Manufacturer", "Assembler")
+
+    assert shipped_diff.migrate_node("Coal Generator", "Coal") == ("Coal-Powered Generator", "Coal")
+    assert shipped_diff.migrate_node("Nuclear Power Plant", "Uranium Fuel Rods") == ("Nuclear Power Plant", "Uranium Fuel Rod")
+    assert shipped_diff.migrate_node("Manufacturer", "Automated Miner") == ("Assembler", "Automated Miner")
+    assert shipped_diff.migrate_node("Constructor", "Iron Plate") == ("Constructor", "Iron Plate")
+
+
+def test_match_renames_shipped_versions():
+    with open(gamedata.get(0).fpath) as fp:
+        old = json.load(fp)["Nuclear Power Plant"]["recipes"]
+    with open(gamedata.get(1).fpath) as fp:
+        new = json.load(fp)["Nuclear Power Plant"]["recipes"]
+
+    # the plutonium rods are about as similar to the uranium rods, the best match is taken first
+    assert match_renames(old, new) == {"Uranium Fuel Rods": "Uranium Fuel Rod",
+                                       "Plutonium Fuel Rods": "Plutonium Fuel Rod"}
+    assert match_renames(old, {"Ficsonium Fuel Rod": new["Ficsonium Fuel Rod"]}) == {}
+
+
+def test_migrate_cli(data_folder, monkeypatch, capsys):
+    fpath = data_folder / "plan.yaml"
+    fpath.write_text(plan_yaml(node_yaml("Coal Generator", "Coal")))
+    staged = data_folder / ".staging" / "[main]" / "000.yaml"
+    staged.parent.mkdir(parents=True)
+    staged.write_text(plan_yaml(node_yaml("Fuel Generator", "Fuel")))
+
+    def main(*args):
+        monkeypatch.setattr(sys, "argv", ["production_planner", f"--data-folder={data_folder}", *args])
+        return production_planner.main()
+
+    assert main("--migrate=0.8", "--dry-run") == 0
+    assert "~ producer: Coal Generator -> Coal-Powered Generator" in capsys.readouterr().out
+    assert "Coal Generator" in fpath.read_text()
+
+    assert main("--migrate=0.8.3.3") == 0
+    assert f"{fpath}: 1 nodes" in capsys.readouterr().out
+    assert "producer: Coal-Powered Generator" in fpath.read_text()
+    assert "producer: Fuel-Powered Generator" in staged.read_text()
+
+    assert main("--migrate=0.7") == 1
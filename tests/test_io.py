@@ -0,0 +1,87 @@
+from production_planner import (
+    Planner,
+    io,
+)
+from production_planner.core import NodeTree
+
+from conftest import (
+    node,
+    node_yaml,
+    plan_yaml,
+)
+
+
+async def test_autosave(data_folder, monkeypatch):
+    written = []
+    write_atomic = io.write_atomic
+    monkeypatch.setattr(io, "write_atomic", lambda fpath, raw, **kwargs: written.append(fpath.name) or write_atomic(fpath, raw, **kwargs))
+
+    app = Planner(testrun=True)
+    async with app.run_test() as pilot:
+        manager = app.manager
+        delays = []
+        monkeypatch.setattr(manager, "schedule_autosave", lambda delay=None: delays.append(delay))
+
+        async def autosave():
+            manager.autosave()
+            await app.workers.wait_for_complete()
+            await pilot.pause()
+
+        sink = manager.active_sink
+        sink.load_yaml(plan_yaml(node_yaml("Constructor", "Iron Plate", count=2)))
+        await autosave()
+        assert written == [sink.staging.target.fullpath.name]
+        assert "Iron Plate" in sink.staging.target.fullpath.read_text()
+        assert len(delays) == 1
+
+        # unchanged, so it isn't written again
+        written.clear()
+        await autosave()
+        assert written == []
+
+        manager.add_sink()
+        manager.add_sink()
+        failing, other = manager.sinks[1:]
+        failing.staging.data = NodeTree.from_nodes([node("Smelter", "Iron Ingot")])
+        other.staging.data = NodeTree.from_nodes([node("Smelter", "Copper Ingot")])
+
+        def fail(*args, **kwargs):
+            raise OSError("disk full")
+
+        # the other sinks are still written, and the autosave goes on
+        monkeypatch.setattr(failing.staging, "dump", fail)
+        await autosave()
+        assert written == [other.staging.target.fullpath.name]
+        assert len(delays) == 3
+
+        # also when the write itself fails in the thread
+        monkeypatch.undo()
+        monkeypatch.setattr(manager, "schedule_autosave", lambda delay=None: delays.append(delay))
+        monkeypatch.setattr(failing.staging, "write", fail)
+        sink.load_yaml(plan_yaml(node_yaml("Constructor", "Iron Rod")))
+        await autosave()
+        assert "Iron Rod" in sink.staging.target.fullpath.read_text()
+        assert not failing.staging.target.fullpath.is_file()
+        assert len(delays) == 4
+
+        # the failed sink is still dirty and written by the next autosave
+        monkeypatch.undo()
+        monkeypatch.setattr(manager, "schedule_autosave", lambda delay=None: delays.append(delay))
+        await autosave()
+        assert "Iron Ingot" in failing.staging.target.fullpath.read_text()
+        await pilot.press("ctrl+q")
+
+
+async def test_autosave_skips_older_dump(data_folder):
+    app = Planner(testrun=True)
+    async with app.run_test() as pilot:
+        sink = app.manager.active_sink
+        sink.load_yaml(plan_yaml(node_yaml("Constructor", "Iron Plate")))
+        older = sink.staging_dump()
+        sink.load_yaml(plan_yaml(node_yaml("Constructor", "Iron Rod")))
+        sink.staging_commit()
+
+        # e.g. a slow autosave thread finishing after the staging was committed on exit
+        sink.staging.write(older)
+        assert "Iron Rod" in sink.staging.target.fullpath.read_text()
+        await pilot.press("ctrl+q")
@@ -0,0 +1,152 @@
+import os
+import threading
+
+from production_planner import core
+from production_planner.core import MODULE_PRODUCER
+from production_planner.compose import compose_pool
+
+from conftest import (
+    node_yaml,
+    plan_yaml,
+)
+
+
+def write_plan(fpath, raw, mtime_ns):
+    fpath.write_text(raw)
+    # Note: explicit, since consecutive writes can end up with the same mtime
+    os.utime(fpath, ns=(mtime_ns, mtime_ns))
+
+
+def module_recipe(module_id: str) -> core.Recipe:
+    return next(recipe for recipe in MODULE_PRODUCER.recipes if recipe.name == module_id)
+
+
+def test_rescan_nested_module_changed(data_folder):
+    write_plan(data_folder / "modA.yaml", plan_yaml(node_yaml("Smelter", "Iron Ingot", count=2)), 1_000_000_000)
+    write_plan(data_folder / "modB.yaml",
+               plan_yaml(node_yaml("Module", "modA"), node_yaml("Constructor", "Iron Plate", count=2)),
+               1_000_000_000)
+
+    MODULE_PRODUCER.rescan_modules()
+    assert {ingredient.name: ingredient.count for ingredient in module_recipe("modB").outputs} == {"Iron Plate": 40}
+    assert {ingredient.name: ingredient.count for ingredient in module_recipe("modB").inputs} == {"Iron Ore": 60}
+
+    write_plan(data_folder / "modA.yaml", plan_yaml(node_yaml("Smelter", "Iron Ingot", count=5)), 2_000_000_000)
+    MODULE_PRODUCER.rescan_modules()
+    outputs = {ingredient.name: ingredient.count for ingredient in module_recipe("modB").outputs}
+    assert outputs == {"Iron Ingot": 90, "Iron Plate": 40}
+
+    # the persisted index is used after a restart
+    MODULE_PRODUCER.module_index.clear()
+    MODULE_PRODUCER._index = None
+    MODULE_PRODUCER.rescan_modules()
+    assert {ingredient.name: ingredient.count for ingredient in module_recipe("modB").outputs} == outputs
+    index = MODULE_PRODUCER.open_index()["modules"]
+    assert index["modB"]["modules"] == {"modA": 2_000_000_000}
+    assert "power" not in index["modB"]
+
+
+def test_rescan_unchanged_uses_index(data_folder, monkeypatch):
+    write_plan(data_folder / "modA.yaml", plan_yaml(node_yaml("Smelter", "Iron Ingot", count=2)), 1_000_000_000)
+    MODULE_PRODUCER.rescan_modules()
+
+    loaded = []
+    load_module = MODULE_PRODUCER.load_module
+    monkeypatch.setattr(MODULE_PRODUCER, "load_module", lambda modulefile: loaded.append(modulefile.id) or load_module(modulefile))
+    MODULE_PRODUCER.rescan_modules()
+    assert loaded == []
+    assert {ingredient.name: ingredient.count for ingredient in module_recipe("modA").outputs} == {"Iron Ingot": 60}
+
+
+def test_prefetch_modules_in_thread(data_folder):
+    modulefiles = []
+    for idx in range(12):
+        fpath = data_folder / f"mod{idx}.yaml"
+        fpath.write_text(plan_yaml(node_yaml("Smelter", "Iron Ingot", count=idx + 1)))
+        modulefiles.append(core.ModuleFile(str(fpath)))
+
+    # Note: like `PlannerTable.resolve_modules`, which may be the first to start the pool
+    thread = threading.Thread(target=MODULE_PRODUCER.prefetch_modules, args=(modulefiles,))
+    thread.start()
+    thread.join()
+    try:
+        assert compose_pool()._mp_context.get_start_method() != "fork"
+        assert set(MODULE_PRODUCER._composed) == {modulefile.fullpath for modulefile in modulefiles}
+
+        recipe, tree = MODULE_PRODUCER.load_module(modulefiles[4])
+        assert {ingredient.name: ingredient.count for ingredient in recipe.outputs} == {"Iron Ingot": 150}
+    finally:
+        MODULE_PRODUCER.clear_prefetched()
+
+
+def test_parse_yaml_resolves_modules(data_folder):
+    from production_planner import io
+    write_plan(data_folder / "modA.yaml", plan_yaml(node_yaml("Smelter", "Iron Ingot", count=2)), 1_000_000_000)
+    raw = plan_yaml(node_yaml("Module", "modA"), node_yaml("Constructor", "Iron Plate", count=2))
+
+    # the modules are left as placeholders until they are resolved
+    unresolved = io.parse_yaml(raw, resolve_modules=False)
+    assert not unresolved.node_children[0].node_main.recipe.outputs
+
+    tree = io.parse_yaml(raw)
+    module = tree.node_children[0].node_main
+    assert module.recipe.outputs and module.recipe.inputs
+    assert core.raw_resources(tree) == {"Iron Ore": -60, "Iron Plate": 40}
+
+
+def test_load_nested_module_once(data_folder, monkeypatch):
+    write_plan(data_folder / "modA.yaml", plan_yaml(node_yaml("Smelter", "Iron Ingot", count=2)), 1_000_000_000)
+    write_plan(data_folder / "modB.yaml",
+               plan_yaml(node_yaml("Module", "modA"), node_yaml("Constructor", "Iron Plate", count=2)),
+               1_000_000_000)
+    raw = plan_yaml(node_yaml("Module", "modB"))
+
+    from production_planner import io
+    loaded = []
+    load_module = MODULE_PRODUCER.load_module
+    monkeypatch.setattr(MODULE_PRODUCER, "load_module", lambda modulefile: loaded.append(modulefile.id) or load_module(modulefile))
+
+    io.parse_yaml(raw)
+    assert sorted(loaded) == ["modA", "modB"]
+
+    # neither the module nor the one nested in it changed
+    loaded.clear()
+    io.parse_yaml(raw)
+    assert loaded == []
+
+    # the nested module changed, which changes the summary of the outer one
+    write_plan(data_folder / "modA.yaml", plan_yaml(node_yaml("Smelter", "Iron Ingot", count=5)), 2_000_000_000)
+    loaded.clear()
+    tree = io.parse_yaml(raw)
+    assert sorted(loaded) == ["modA", "modB"]
+    assert core.raw_resources(tree) == {"Iron Ore": -150, "Iron Ingot": 90, "Iron Plate": 40}
+
+
+def test_module_shared_between_plans(data_folder, monkeypatch):
+    write_plan(data_folder / "modA.yaml", plan_yaml(node_yaml("Smelter", "Iron Ingot", count=2)), 1_000_000_000)
+
+    from production_planner import io
+    loaded = []
+    load_module = MODULE_PRODUCER.load_module
+    monkeypatch.setattr(MODULE_PRODUCER, "load_module", lambda modulefile: loaded.append(modulefile.id) or load_module(modulefile))
+
+    first = io.parse_yaml(plan_yaml(node_yaml("Module", "modA", count=2)))
+    second = io.parse_yaml(plan_yaml(node_yaml("Constructor", "Iron Plate"), node_yaml("Module", "modA")))
+    first_view = first.node_children[0].node_children[0]
+    second_view = second.node_children[1].node_children[0]
+    # each place has a view of its own, but the nodes are loaded once and shared
+    assert loaded == ["modA"]
+    assert first_view is not second_view
+    assert first_view.node_main is second_view.node_main is MODULE_PRODUCER.get_module_tree("modA").node_main
+    assert first.node_children[0].node_children[0].node_children[0].node_main \
+        is second.node_children[1].node_children[0].node_children[0].node_main
+    assert core.raw_resources(first) == {"Iron Ore": -120, "Iron Ingot": 120}
+
+    write_plan(data_folder / "modA.yaml", plan_yaml(node_yaml("Smelter", "Iron Ingot", count=3)), 2_000_000_000)
+    first.reload_modules()
+    second.reload_modules()
+    # parsed once more, and both plans show the edited module
+    assert loaded == ["modA", "modA"]
+    assert first.node_children[0].node_children[0].node_main is second.node_children[1].node_children[0].node_main
+    assert core.raw_resources(first) == {"Iron Ore": -180, "Iron Ingot": 180}
+    assert core.raw_resources(second) == {"Iron Ore": -90, "Iron Ingot": 60, "Iron Plate": 20}
@@ -0,0 +1,74 @@
+import tracemalloc
+
+from production_planner.core import (
+    MODULE_PRODUCER,
+    Ingredient,
+    Node,
+    NodeTree,
+    Purity,
+    Recipe,
+)
+from production_planner.core.node import node_rates
+
+from conftest import node
+
+
+# measured ~850 bytes per node (with its `NodeInstance`), ~2100 before the classes were slotted
+MAX_BYTES_PER_NODE = 1200
+
+
+def test_tree_memory():
+    nodes = 10_000
+    # warm up the shared caches (recipes, `node_rates`) outside of the measurement
+    node("Constructor", "Iron Plate")
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tree = NodeTree.from_nodes([node("Constructor", "Iron Plate", count=idx % 7 + 1) for idx in range(nodes)])
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    assert len(tree.node_children) == nodes
+    assert (after - before) / nodes < MAX_BYTES_PER_NODE
+
+
+def assert_rates_uncached(node: Node):
+    assert node.rates == node_rates.__wrapped__(*node.update_signature())
+
+
+def test_node_rates_clamped():
+    clamped = node("Constructor", "Iron Plate", count=2, clamp=Ingredient("Iron Plate", 35))
+    assert clamped.clock_rate.value == 87.5
+    assert_rates_uncached(clamped)
+
+    overclamped = node("Constructor", "Iron Plate", clamp=Ingredient("Iron Plate", 1000))
+    assert overclamped.clock_rate.value == 250
+    assert_rates_uncached(overclamped)
+
+
+def test_node_rates_miner():
+    for purity in (Purity.IMPURE, Purity.NORMAL, Purity.PURE):
+        for mk in (1, 2, 3):
+            miner = node("Miner", "Iron Ore", mk=mk, purity=purity, clock_rate=150)
+            assert_rates_uncached(miner)
+    clamped = node("Miner", "Iron Ore", mk=2, purity=Purity.PURE, clamp=Ingredient("Iron Ore", 300))
+    assert clamped.ingredients["Iron Ore"] == 300
+    assert_rates_uncached(clamped)
+
+
+def test_node_rates_module():
+    recipe = Recipe("test_module", 60, [[30, "Iron Ore"]], [[30, "Iron Ingot"]])
+    module = Node(MODULE_PRODUCER, recipe, count=3)
+    module.energy_module = 4
+    module.update()
+    assert module.energy == 12
+    assert module.ingredients == {"Iron Ore": -90, "Iron Ingot": 90}
+    assert_rates_uncached(module)
+
+
+def test_node_rates_shared():
+    first = node("Constructor", "Iron Plate", count=3)
+    second = node("Constructor", "Iron Plate", count=3)
+    assert first.rates is second.rates
@@ -0,0 +1,78 @@
+from production_planner import io
+from production_planner.core import (
+    NodeInstance,
+    NodeTree,
+    RollupNode,
+)
+
+from conftest import (
+    node,
+    node_yaml,
+    plan_yaml,
+)
+
+
+def rows(tree: NodeTree) -> [NodeInstance]:
+    """The instance each row of the table resolves to"""
+    nodes = tree.get_nodes()
+    return [tree.get_node(row) for row in range(len(nodes))]
+
+
+def test_row_index_flat():
+    tree = NodeTree.from_nodes([node("Smelter", "Iron Ingot", count=2), node("Constructor", "Iron Plate", count=2)])
+    smelter, constructor = tree.node_children
+
+    # the summary is balanced down to raw resources already, so there is no rollup row
+    assert rows(tree) == [tree, smelter, constructor]
+    assert [instance.row_idx for instance in tree.get_nodes()] == [0, 1, 2]
+    # out of bounds rows are clamped
+    assert tree.get_node(-1) is tree
+    assert tree.get_node(10) is constructor
+
+
+def test_row_index_collapsed_subtree():
+    inner = NodeTree.from_nodes([node("Smelter", "Iron Ingot"), node("Constructor", "Iron Plate")])
+    tree = NodeTree.from_nodes([node("Miner", "Iron Ore")])
+    tree.add_children([inner])
+    miner = tree.node_children[0]
+
+    # expanded, the rows of the nested nodes resolve to the subtree they belong to
+    assert rows(tree) == [tree, miner, inner, inner, inner]
+
+    inner.expanded = False
+    assert rows(tree) == [tree, miner, inner]
+
+    # hidden rows are skipped, and the instance keeps the row of the one before it
+    miner.shown = False
+    assert rows(tree) == [tree, inner]
+    assert miner.row_idx == 0
+    assert inner.row_idx == 1
+
+
+def test_row_index_module(data_folder):
+    (data_folder / "modA.yaml").write_text(plan_yaml(node_yaml("Smelter", "Iron Ingot", count=2),
+                                                     node_yaml("Constructor", "Iron Plate", count=2)))
+    tree = io.parse_yaml(plan_yaml(node_yaml("Constructor", "Iron Rod"), node_yaml("Module", "modA")))
+    rods, module = tree.node_children
+
+    # the module, the root of its tree and the two nodes in it
+    assert rows(tree)[:6] == [tree, rods, module, module, module, module]
+    assert all(instance.row_idx == module.row_idx for instance in tree.get_nodes()[2:6])
+
+    module.expanded = False
+    assert rows(tree)[:3] == [tree, rods, module]
+
+
+def test_row_index_rollup():
+    tree = NodeTree.from_nodes([node("Constructor", "Iron Plate", count=2)])
+    constructor = tree.node_children[0]
+
+    # the iron ingots are resolved to iron ore in the last row
+    nodes = tree.get_nodes()
+    assert rows(tree)[:2] == [tree, constructor]
+    rollup = rows(tree)[-1]
+    assert len(nodes) == 3 and rollup is tree.rollup
+    assert isinstance(rollup.node_main, RollupNode)
+    assert rollup.row_idx == 2
+    assert tree.node_main.ingredients == {"Iron Ingot": -60, "Iron Plate": 40}
+    assert rollup.node_main.ingredients == {"Iron Ore": -60, "Iron Plate": 40}
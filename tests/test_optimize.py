@@ -0,0 +1,135 @@
+import importlib
+import time
+
+import pytest
+
+from production_planner.core import (
+    Node,
+    NodeTree,
+    insert_tree,
+)
+from production_planner.core.optimize import (
+    DualSimplex,
+    Infeasible,
+    RecipeOptimizer,
+    Unbounded,
+    optimize,
+    simplex,
+)
+
+from conftest import (
+    deficits,
+    node,
+)
+
+
+# Note: `production_planner.core.optimize` is the function re-exported by `core`
+optimize_module = importlib.import_module("production_planner.core.optimize")
+
+
+def test_simplex():
+    solution = simplex({"x": 1, "y": 2}, [({"x": 1, "y": 1}, 4), ({"x": -1}, -3)])
+    assert solution == pytest.approx({"x": 3, "y": 1})
+
+
+def test_simplex_infeasible():
+    with pytest.raises(Infeasible):
+        simplex({"x": 1}, [({"x": 1}, 5), ({"x": -1}, -3)])
+
+
+def test_simplex_unbounded():
+    with pytest.raises(Unbounded):
+        simplex({"x": -1, "y": 1}, [({"x": 1, "y": 1}, 1)])
+
+
+@pytest.mark.parametrize("setting", [
+    # Bland's rule alone
+    ("PERTURBATION", 0),
+    # the perturbation alone
+    ("DEGENERATE_PIVOTS_MAX", float("inf")),
+])
+def test_simplex_degenerate(monkeypatch, setting):
+    # Beale's example, which cycles forever without either of them
+    monkeypatch.setattr(optimize_module, *setting)
+    costs = {"x4": -0.75, "x5": 150, "x6": -0.02, "x7": 6}
+    rows = [
+        ({"x4": -0.25, "x5": 60, "x6": 0.04, "x7": -9}, 0),
+        ({"x4": -0.5, "x5": 90, "x6": 0.02, "x7": -3}, 0),
+        ({"x6": -1}, -1),
+    ]
+    assert simplex(costs, rows) == pytest.approx({"x4": 0.04, "x6": 1})
+
+
+def test_dual_simplex_raise_rhs():
+    costs = {"x": 1, "y": 2}
+    tableau = DualSimplex(costs, [({"x": 1, "y": 1}, 4), ({"x": -1}, -3)])
+    assert tableau.solve() == pytest.approx({"x": 3, "y": 1})
+    # solved again from the previous basis, like from scratch
+    tableau.raise_rhs({0: 1, 1: 1})
+    assert tableau.solve() == pytest.approx(simplex(costs, [({"x": 1, "y": 1}, 5), ({"x": -1}, -2)]))
+    assert tableau.solve() == pytest.approx({"x": 2, "y": 3})
+
+
+def test_dual_simplex_negative_costs():
+    with pytest.raises(ValueError):
+        DualSimplex({"x": -1}, [({"x": 1}, 1)])
+
+
+def weighted_cost(solution: dict, weights: dict) -> float:
+    cost = 0
+    for recipe, buildings in solution.items():
+        node = Node(recipe.producer, recipe)
+        raw = sum(rate for rate in node.ingredients.values() if rate > 0) if not recipe.inputs else 0
+        cost += buildings * (weights.get("raw", 0) * raw + weights.get("power", 0) * node.energy + weights.get("buildings", 0))
+    return cost
+
+
+def test_optimize_weights():
+    by_raw = {"raw": 1}
+    by_power = {"raw": 0, "power": 1}
+    raw_solution = RecipeOptimizer(by_raw).solve({"Wire": 60})
+    power_solution = RecipeOptimizer(by_power).solve({"Wire": 60})
+
+    assert {recipe.name for recipe in raw_solution} != {recipe.name for recipe in power_solution}
+    assert weighted_cost(raw_solution, by_raw) < weighted_cost(power_solution, by_raw)
+    assert weighted_cost(power_solution, by_power) < weighted_cost(raw_solution, by_power)
+
+
+@pytest.mark.parametrize("targets", [
+    {"Quickwire": 10},
+    {"Rubber": 10},
+    {"Turbo Motor": 1},
+    {"Computer": 2.5, "Plastic": 7},
+    # stalled at a degenerate vertex without the perturbation
+    {"Assembly Director System": 1},
+])
+def test_optimize_without_deficits(targets):
+    tree = optimize(targets)
+    assert deficits(tree) == {}
+    for item, rate in targets.items():
+        assert tree.node_main.ingredients[item] >= rate - 1e-6
+
+
+def test_optimized_rows():
+    root = NodeTree.from_nodes([node("Constructor", "Screw")])
+    screws = root.node_children[0]
+    instances = insert_tree(root, optimize({"Iron Rod": 10}), after=screws)
+
+    # each node of the plan is a row of its own
+    assert root.node_children == [screws, *instances]
+    root.get_nodes()
+    assert [root.get_node(row) for row in range(1, len(instances) + 2)] == [screws, *instances]
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("item, rate", [
+    # the slowest plans of all items
+    ("Dark Matter Residue", 1),
+    ("Turbo Motor", 1),
+    ("Ficsonium", 123.45),
+])
+def test_optimize_time(item, rate):
+    start = time.perf_counter()
+    tree = optimize({item: rate})
+    assert time.perf_counter() - start < 1
+    assert deficits(tree) == {}
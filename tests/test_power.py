@@ -0,0 +1,66 @@
+import pytest
+
+from production_planner.core import NodeTree
+from production_planner.core.power import PowerModel
+
+from conftest import node
+
+
+def test_generator_power():
+    generator = node("Coal-Powered Generator", "Coal")
+    constructor = node("Constructor", "Iron Plate")
+    model = PowerModel([generator, constructor])
+    assert model.base == [-75, 4]
+    assert model.power() == -71
+
+
+def test_power_matches_nodes():
+    generator = node("Coal-Powered Generator", "Coal", count=3, clock_rate=150)
+    constructor = node("Constructor", "Iron Plate", count=2, clock_rate=180)
+    model = PowerModel([generator, constructor])
+    assert generator.ingredients["+Power"] == 337.5
+    assert model.power() == pytest.approx(constructor.energy - generator.ingredients["+Power"])
+
+    # at 100% the same throughput needs 5 generators (producing as much) and 4 constructors (drawing less)
+    point = model.sweep([100])[0]
+    assert point.buildings == 9
+    assert point.power == pytest.approx(4 * 4 * (3.6 / 4) ** 1.321928 - 337.5, rel=1e-3)
+
+
+def test_generator_energy():
+    generator = node("Coal-Powered Generator", "Coal", count=2, clock_rate=50)
+    assert generator.ingredients["+Power"] == 75
+    assert generator.energy == -75
+
+    tree = NodeTree.from_nodes([generator, node("Constructor", "Iron Plate", count=2)])
+    tree.update_summaries()
+    assert tree.node_main.energy == pytest.approx(2 * 4 - 75)
+
+
+def test_sweep_matches_power():
+    nodes = [node("Coal-Powered Generator", "Coal", count=3, clock_rate=150),
+             node("Constructor", "Iron Plate", count=2, clock_rate=180),
+             node("Smelter", "Iron Ingot", count=7, clock_rate=33.3),
+             node("Assembler", "Reinforced Iron Plate", count=1, clock_rate=250)]
+    model = PowerModel(nodes)
+    clock_rates = [1, 5, 33.3, 99.9, 100, 137.5, 250]
+    points = model.sweep(clock_rates)
+    assert [(point.clock_rate, point.buildings) for point in points] == [(clock_rate, sum(model.split(clock_rate)))
+                                                                         for clock_rate in clock_rates]
+    assert [point.power for point in points] == pytest.approx([model.power(model.split(clock_rate))
+                                                               for clock_rate in clock_rates])
+    assert model.sweep([]) == []
+
+
+def test_apply_matches_table():
+    tree = NodeTree.from_nodes([node("Coal-Powered Generator", "Coal", count=3, clock_rate=150),
+                                node("Constructor", "Iron Plate", count=2, clock_rate=180),
+                                node("Smelter", "Iron Ingot", count=1, clock_rate=250)])
+    model = PowerModel.from_tree(tree)
+    point = model.best()
+    model.apply(model.split(point.clock_rate))
+    tree.update_summaries()
+
+    # the clock rates are rounded up a little by `apply`
+    assert tree.node_main.energy == pytest.approx(point.power, rel=1e-3)
+    assert model.power() == pytest.approx(sum(instance.node_main.energy for instance in tree.node_children), rel=1e-3)
@@ -0,0 +1,63 @@
+from production_planner.core import (
+    Ingredient,
+    NodeTree,
+)
+from production_planner.core.propagate import propagate_demand
+
+from conftest import (
+    deficits,
+    node,
+)
+
+
+def surplus(tree, item: str) -> float:
+    tree.update_summaries()
+    return tree.node_main.ingredients.get(item, 0)
+
+
+def test_propagate_chain():
+    miner = node("Miner", "Iron Ore")
+    smelter = node("Smelter", "Iron Ingot")
+    plates = node("Constructor", "Iron Plate", count=3, clamp=Ingredient("Iron Plate", 60))
+    tree = NodeTree.from_nodes([miner, smelter, plates])
+
+    assert propagate_demand(tree) == [smelter, miner]
+    assert (smelter.count.value, smelter.clock_rate.value) == (3, 100)
+    assert deficits(tree) == {}
+    assert surplus(tree, "Iron Ingot") == 0
+    assert 0 <= surplus(tree, "Iron Ore") < 0.1
+    assert plates.ingredients["Iron Plate"] == 60
+
+
+def test_propagate_diamond():
+    # the ingots go to the plates and to the rods (for the screws), which both end up in the reinforced plates
+    smelter = node("Smelter", "Iron Ingot")
+    plates = node("Constructor", "Iron Plate")
+    rods = node("Constructor", "Iron Rod")
+    screws = node("Constructor", "Screw")
+    reinforced = node("Assembler", "Reinforced Iron Plate", count=2, clamp=Ingredient("Reinforced Iron Plate", 10))
+    tree = NodeTree.from_nodes([smelter, plates, rods, screws, reinforced])
+
+    scaled = propagate_demand(tree)
+    # each node is scaled once, after all of its consumers
+    assert sorted(scaled, key=id) == sorted([smelter, plates, rods, screws], key=id)
+    assert scaled.index(smelter) == 3
+    assert scaled.index(rods) > scaled.index(screws)
+    assert deficits(tree) == {}
+    assert plates.ingredients["Iron Plate"] == 60
+    assert screws.ingredients["Screw"] == 120
+    assert smelter.ingredients["Iron Ingot"] == 120
+
+
+def test_propagate_cycle():
+    # the packaging cycle supplies the water of the clamped node, but is left as it is
+    miner = node("Miner", "Sulfur")
+    package = node("Packager", "Packaged Water", count=2)
+    unpackage = node("Packager", "Unpackage Water", count=3, clock_rate=50)
+    acid = node("Refinery", "Sulfuric Acid", count=2, clamp=Ingredient("Sulfuric Acid", 100))
+    tree = NodeTree.from_nodes([miner, package, unpackage, acid])
+
+    assert propagate_demand(tree) == [miner]
+    assert (package.count.value, package.clock_rate.value) == (2, 100)
+    assert (unpackage.count.value, unpackage.clock_rate.value) == (3, 50)
+    assert 0 <= surplus(tree, "Sulfur") < 0.1
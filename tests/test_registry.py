@@ -0,0 +1,46 @@
+import pytest
+
+from production_planner import gamedata
+from production_planner.core import (
+    GAME_DATA,
+    PRODUCER_MAP,
+    PRODUCER_NAMES,
+)
+
+
+@pytest.fixture
+def versions():
+    latest = gamedata.get()
+    previous = gamedata.get(major=0)
+    yield previous, latest
+    GAME_DATA.activate(latest)
+
+
+def test_activate_switches_recipes(versions):
+    previous, latest = versions
+    assert GAME_DATA.version == latest
+    assert "Iron Pipe" in PRODUCER_MAP["Constructor"].recipe_map
+    assert "Color Cartridge" not in PRODUCER_MAP["Constructor"].recipe_map
+
+    assert GAME_DATA.activate(previous) == latest
+    assert "Iron Pipe" not in PRODUCER_MAP["Constructor"].recipe_map
+    assert "Color Cartridge" in PRODUCER_MAP["Constructor"].recipe_map
+    assert "Coal Generator" in PRODUCER_NAMES
+    assert "Coal-Powered Generator" not in PRODUCER_NAMES
+
+    assert GAME_DATA.activate() == previous
+    assert GAME_DATA.version == latest
+    assert "Iron Pipe" in PRODUCER_MAP["Constructor"].recipe_map
+    assert "Coal-Powered Generator" in PRODUCER_NAMES
+
+
+def test_using_restores_on_error(versions):
+    previous, latest = versions
+    with pytest.raises(RuntimeError):
+        with GAME_DATA.using(previous):
+            assert GAME_DATA.version == previous
+            assert "Iron Pipe" not in PRODUCER_MAP["Constructor"].recipe_map
+            raise RuntimeError()
+
+    assert GAME_DATA.version == latest
+    assert "Iron Pipe" in PRODUCER_MAP["Constructor"].recipe_map
@@ -0,0 +1,44 @@
+import pytest
+
+from production_planner.core import (
+    NodeTree,
+    RollupNode,
+)
+from production_planner.core.rollup import (
+    Rollup,
+    raw_resources,
+)
+
+from conftest import node
+
+
+def test_expansion_single_step():
+    rollup = Rollup(default_recipes={})
+    # 3 ingots for 2 plates, 1 ore per ingot
+    assert rollup.expansion("Iron Plate") == {"Iron Ore": 1.5}
+    assert rollup.expansion("Iron Ingot") == {"Iron Ore": 1}
+    assert rollup.expansion("Iron Ore") == {"Iron Ore": 1}
+    assert rollup.resolve({"Iron Plate": -20, "Iron Ore": -10}) == {"Iron Ore": -40}
+
+
+def test_expansion_cycle():
+    # each of the recycled recipes needs the output of the other one
+    rollup = Rollup(default_recipes={"Rubber": "Recycled Rubber", "Plastic": "Recycled Plastic"})
+    rubber = rollup.expansion("Rubber")
+    assert rubber == {"Rubber": pytest.approx(0.25), "Crude Oil": pytest.approx(1.125)}
+    assert rollup.expansion("Plastic") == {"Plastic": pytest.approx(0.25), "Crude Oil": pytest.approx(1.125)}
+
+    # cut short by the cycle, so only the fuel is memoized
+    assert set(rollup.expansions) == {"Fuel"}
+    assert rollup.expansion("Rubber") == rubber
+
+
+def test_rollup_row_matches_raw_resources():
+    tree = NodeTree.from_nodes([node("Constructor", "Iron Plate", count=2), node("Constructor", "Screw")])
+    nodes = tree.get_nodes()
+
+    rollup = nodes[-1].node_main
+    assert isinstance(rollup, RollupNode)
+    assert rollup.ingredients == raw_resources(tree)
+    assert raw_resources(tree) == raw_resources(node_instance.node_main for node_instance in tree.node_children)
+    assert set(rollup.ingredients) == {"Iron Ore", "Iron Plate", "Screw"}
@@ -0,0 +1,80 @@
+import json
+import sys
+
+import pytest
+
+import production_planner
+from production_planner import Planner
+from production_planner.core.spans import (
+    NULL_SPAN,
+    Spans,
+    SPANS,
+)
+
+from conftest import (
+    node_yaml,
+    plan_yaml,
+)
+
+
+UPDATE_SPANS = ["table.update." + name for name in ("columns", "nodes", "rows", "highlight", "styling", "add_rows")]
+
+
+def read_spans(fpath) -> dict[str, dict]:
+    return {line["span"]: line for line in map(json.loads, fpath.read_text().splitlines())}
+
+
+@pytest.fixture
+def spans():
+    yield SPANS
+    SPANS.enable(False)
+    SPANS.reset()
+
+
+def test_spans_dump(tmp_path):
+    spans = Spans()
+    assert spans.span("outer") is NULL_SPAN
+
+    @spans.timed("outer")
+    def outer():
+        for _ in range(3):
+            with spans.span("outer.inner"):
+                pass
+
+    spans.enable()
+    outer()
+    outer()
+    fpath = tmp_path / "profile.jsonl"
+    spans.dump(fpath)
+    spans.dump(fpath)
+
+    lines = fpath.read_text().splitlines()
+    assert len(lines) == 4
+    dumped = read_spans(fpath)
+    assert dumped["outer"]["count"] == 2
+    assert dumped["outer.inner"]["count"] == 6
+    assert sum(dumped["outer.inner"]["histogram_us"].values()) == 6
+    assert dumped["outer.inner"]["total_ms"] <= dumped["outer"]["total_ms"]
+
+
+def test_profile_flag(data_folder, monkeypatch, spans):
+    async def auto_pilot(pilot):
+        table = pilot.app.focused_table
+        table.sink.load_yaml(plan_yaml(node_yaml("Constructor", "Iron Plate", count=2)))
+        table.update()
+        await pilot.pause()
+        # Note: the new data folder shows the startup help, where the quit binding is disabled
+        pilot.app.exit()
+
+    run = Planner.run
+    monkeypatch.setattr(Planner, "run", lambda self: run(self, headless=True, auto_pilot=auto_pilot))
+    fpath = data_folder / "profile.jsonl"
+    monkeypatch.setattr(sys, "argv", ["production_planner", f"--data-folder={data_folder}", f"--profile={fpath}"])
+    production_planner.main()
+
+    dumped = read_spans(fpath)
+    update = dumped["table.update"]
+    assert update["count"] >= 1
+    for name in UPDATE_SPANS:
+        assert dumped[name]["count"] == update["count"]
+        assert dumped[name]["total_ms"] <= update["total_ms"]